@@ -1,14 +1,17 @@
 # MDSAPP/CasefileManagement/api/v1.py
 
-from fastapi import APIRouter, Depends, Body, HTTPException, BackgroundTasks, Header
+from fastapi import APIRouter, Depends, Body, HTTPException, BackgroundTasks, Header, Query
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 
-from MDSAPP.CasefileManagement.models.casefile import Casefile
+from MDSAPP.CasefileManagement.models.casefile import (
+    Casefile, CasefileBatchOperation, CasefileBatchResult, CasefileSummary, Event,
+)
 from MDSAPP.CasefileManagement.manager import CasefileManager
 from MDSAPP.core.dependencies import get_casefile_manager
 from MDSAPP.core.models.stix_inspired_models import Campaign, Grouping
-from MDSAPP.core.models.ontology import Role
+from MDSAPP.core.models.ontology import CasefileStatus, Role
+from MDSAPP.core.storage.base import WriteConflict
 
 
 def get_current_user_id(x_user_id: str = Header(..., alias="X-User-ID")) -> str:
@@ -40,12 +43,16 @@ class GrantAccessRequest(BaseModel):
 class RevokeAccessRequest(BaseModel):
     user_id_to_revoke: str
 
+class CasefileBatchRequest(BaseModel):
+    operations: List[CasefileBatchOperation]
+
 @router.get("/casefiles/status", response_model=List[Dict[str, Any]])
 async def get_all_casefiles_with_status(
+    status: Optional[CasefileStatus] = Query(None, description="Only list casefiles with this status."),
     casefile_manager: CasefileManager = Depends(get_casefile_manager)
 ):
-    """Retrieves a list of all casefiles, each with a calculated status."""
-    return await casefile_manager.list_all_casefiles_with_status()
+    """Retrieves a list of all casefiles, each with its stored status."""
+    return await casefile_manager.list_all_casefiles_with_status(status=status)
 
 @router.post("/casefiles", response_model=str, status_code=201)
 async def create_new_casefile(
@@ -78,13 +85,11 @@ async def get_all_casefiles(
     casefile_manager: CasefileManager = Depends(get_casefile_manager)
 ):
     """
-    Retrieves a list of all top-level casefiles (those without a parent).
+    Retrieves summaries of all top-level casefiles (those without a parent).
     """
     try:
-        all_casefiles_json = await casefile_manager.list_all_casefiles()
-        all_casefiles = [Casefile.model_validate_json(json_str) for json_str in all_casefiles_json]
-        top_level_casefiles = [casefile for casefile in all_casefiles if getattr(casefile, 'parent_id', None) is None]
-        return [casefile.model_dump_json() for casefile in top_level_casefiles]
+        summaries = await casefile_manager.list_top_level_casefile_summaries()
+        return [summary.model_dump_json() for summary in summaries]
     except Exception as e:
         # Log the exception for debugging purposes
         # In a real application, you'd use a proper logger
@@ -94,16 +99,77 @@ async def get_all_casefiles(
             detail="Could not load casefiles. This might be due to a database connection issue. Please check the server logs and ensure that the application has the correct credentials to connect to Firestore."
         )
 
+@router.post("/casefiles:batch", response_model=List[CasefileBatchResult])
+async def apply_casefile_batch(
+    request: CasefileBatchRequest,
+    casefile_manager: CasefileManager = Depends(get_casefile_manager),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Applies creates, updates, ACL changes and deletes of many casefiles in one
+    request. Each operation gets a result; failed operations do not fail the
+    request.
+    """
+    return await casefile_manager.apply_batch(request.operations, user_id)
+
+@router.get("/casefiles/accessible", response_model=List[CasefileSummary])
+async def get_accessible_casefiles(
+    role: Optional[Role] = Query(None, description="Only list casefiles where the user holds this role."),
+    casefile_manager: CasefileManager = Depends(get_casefile_manager),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Retrieves summaries of the casefiles the current user has access to."""
+    return await casefile_manager.list_casefiles_for_user(user_id, role=role)
+
 @router.get("/casefiles/{casefile_id}", response_model=str)
 async def get_casefile_by_id(
     casefile_id: str,
     casefile_manager: CasefileManager = Depends(get_casefile_manager)
 ):
     """Retrieves a specific casefile by its ID."""
-    casefile = await casefile_manager.load_casefile(casefile_id)
+    casefile = await casefile_manager.get_casefile(casefile_id)
     if not casefile:
         raise HTTPException(status_code=404, detail="Casefile not found")
-    return casefile
+    return casefile.model_dump_json()
+
+@router.get("/casefiles/{casefile_id}/events", response_model=List[Event])
+async def get_casefile_events(
+    casefile_id: str,
+    after: Optional[str] = Query(None, description="Timestamp of the last event of the previous page."),
+    after_id: Optional[str] = Query(None, description="ID of the last event of the previous page."),
+    limit: int = Query(100, ge=1, le=1000),
+    casefile_manager: CasefileManager = Depends(get_casefile_manager)
+):
+    """Retrieves a page of the event history of a casefile, oldest first."""
+    return await casefile_manager.get_events(casefile_id, after=after, limit=limit, after_id=after_id)
+
+@router.get("/casefiles/{casefile_id}/descendants", response_model=List[CasefileSummary])
+async def get_casefile_descendants(
+    casefile_id: str,
+    casefile_manager: CasefileManager = Depends(get_casefile_manager)
+):
+    """Retrieves summaries of all casefiles below a casefile, shallowest first."""
+    return await casefile_manager.get_descendants(casefile_id)
+
+@router.get("/casefiles/{casefile_id}/ancestors", response_model=List[CasefileSummary])
+async def get_casefile_ancestors(
+    casefile_id: str,
+    casefile_manager: CasefileManager = Depends(get_casefile_manager)
+):
+    """Retrieves summaries of the ancestors of a casefile, from the root down to its parent."""
+    return await casefile_manager.get_ancestors(casefile_id)
+
+@router.get("/casefiles/{casefile_id}/tree", response_model=List[CasefileSummary])
+async def get_casefile_tree(
+    casefile_id: str,
+    max_depth: Optional[int] = Query(None, ge=0, description="Levels below the casefile to include; all when omitted."),
+    casefile_manager: CasefileManager = Depends(get_casefile_manager)
+):
+    """Retrieves summaries of a casefile and its descendants, shallowest first."""
+    tree = await casefile_manager.get_tree(casefile_id, max_depth=max_depth)
+    if not tree:
+        raise HTTPException(status_code=404, detail="Casefile not found")
+    return tree
 
 @router.delete("/casefiles/{casefile_id}", status_code=204)
 async def delete_existing_casefile(
@@ -138,11 +204,13 @@ async def update_existing_casefile(
             user_id=user_id,
             updates=request.updates
         )
-        return updated_casefile
+        return updated_casefile.model_dump_json()
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except WriteConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -161,7 +229,9 @@ async def grant_casefile_access(
             role=request.role,
             current_user_id=current_user_id
         )
-        return updated_casefile
+        return updated_casefile.model_dump_json()
+    except WriteConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except ValueError as e:
@@ -183,7 +253,9 @@ async def revoke_casefile_access(
             user_id_to_revoke=request.user_id_to_revoke,
             current_user_id=current_user_id
         )
-        return updated_casefile
+        return updated_casefile.model_dump_json()
+    except WriteConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except ValueError as e:
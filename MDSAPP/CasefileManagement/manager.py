@@ -1,21 +1,42 @@
 # MDSAPP/CasefileManagement/manager.py
 
+import asyncio
+import functools
 import logging
-from typing import Dict, Any, List, Optional
+import random
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, Union
 from uuid import uuid4
 from datetime import datetime
-import asyncio
-from firebase_admin import firestore
 
-from MDSAPP.core.managers.database_manager import DatabaseManager
-from MDSAPP.CasefileManagement.models.casefile import Casefile, Event
-from MDSAPP.core.models.ontology import Role
+from pydantic import BaseModel
+
+from MDSAPP.core.managers.database_manager import DatabaseManager, WRITE_RETRY_BASE_DELAY_SECONDS
+from MDSAPP.core.storage.base import DELETE_FIELD, SERVER_TIMESTAMP, WriteConflict
+from MDSAPP.CasefileManagement.models.casefile import (
+    Casefile, CasefileBatchOperation, CasefileBatchResult, CasefileSummary, Event, SubCasefileSpec,
+    CASEFILE_SUMMARY_FIELDS, STATUS_COUNT_FIELDS, acl_role_key,
+)
+from MDSAPP.core.models.ontology import CasefileStatus, Role
 from MDSAPP.core.models.stix_inspired_models import Campaign, Grouping
 from MDSAPP.core.managers.tool_registry import ToolRegistry
 from google.generativeai.types import FunctionDeclaration
 
 logger = logging.getLogger(__name__)
 
+# Firestore's limit on the writes of one transaction, less the change marker
+# the Firestore backend adds when the change feed is on.
+MAX_WRITES_PER_TRANSACTION = 499
+# Children created per transaction by create_sub_casefiles, next to the parent update.
+MAX_SUB_CASEFILES_PER_TRANSACTION = MAX_WRITES_PER_TRANSACTION - 1
+
+def _json_tool(handler):
+    """Tool boundary: handlers that return a casefile hand it to the agent as JSON."""
+    @functools.wraps(handler)
+    async def _handler(*args, **kwargs):
+        result = await handler(*args, **kwargs)
+        return result.model_dump_json() if isinstance(result, BaseModel) else result
+    return _handler
+
 class CasefileManager:
     """
     Manages the business logic for the lifecycle of hierarchical casefiles.
@@ -39,57 +60,8 @@ class CasefileManager:
         as a sub-casefile of the specified parent.
         """
         if parent_id:
-            # Use a Firestore transaction to ensure atomicity
-            transaction = self.db_manager.db.transaction()
-
-            @firestore.transactional
-            def _create_sub_casefile_in_transaction(transaction):
-                parent_ref = self.db_manager.db.collection(self.db_manager.casefiles_collection_name).document(parent_id)
-                parent_doc = parent_ref.get(transaction=transaction)
-
-                if not parent_doc.exists:
-                    raise ValueError(f"Parent casefile with ID '{parent_id}' not found.")
-
-                parent_casefile = Casefile(**parent_doc.to_dict())
-
-                # Permission Check: User must have write access to the parent
-                if not (parent_casefile.acl.get(user_id) in [Role.ADMIN, Role.WRITER]):
-                     raise PermissionError(f"User '{user_id}' does not have permission to create a sub-casefile under '{parent_id}'.")
-
-                # Inherit from parent, but allow overrides
-                sub_campaign = campaign if campaign is not None else parent_casefile.campaign
-                sub_dossier = dossier if dossier is not None else parent_casefile.dossier
-                
-                # Inherit ACL and add creator as admin
-                sub_acl = parent_casefile.acl.copy()
-                sub_acl[user_id] = Role.ADMIN
-
-                sub_casefile = Casefile(
-                    name=name,
-                    description=description,
-                    owner_id=user_id,
-                    acl=sub_acl,
-                    campaign=sub_campaign,
-                    dossier=sub_dossier,
-                    created_at=datetime.utcnow().isoformat() + 'Z',
-                    modified_at=datetime.utcnow().isoformat() + 'Z'
-                )
-
-                # Add sub-casefile ID to parent
-                parent_casefile.sub_casefile_ids.append(sub_casefile.id)
-                parent_casefile.touch()
-
-                # Stage the writes in the transaction
-                sub_ref = self.db_manager.db.collection(self.db_manager.casefiles_collection_name).document(sub_casefile.id)
-                transaction.set(sub_ref, sub_casefile.model_dump(exclude_none=True))
-                transaction.set(parent_ref, parent_casefile.model_dump(exclude_none=True))
-
-                return sub_casefile
-
-            # Run the transactional function in a separate thread
-            sub_casefile = await asyncio.to_thread(_create_sub_casefile_in_transaction, transaction)
-            logger.info(f"Sub-casefile '{sub_casefile.id}' created and saved under parent '{parent_id}' in a transaction.")
-            return sub_casefile.id
+            spec = SubCasefileSpec(id=casefile_id, name=name, description=description, campaign=campaign, dossier=dossier)
+            return (await self.create_sub_casefiles(parent_id, [spec], user_id))[0]
         else:
             if casefile_id is None:
                 casefile_id = f"case-{uuid4().hex[:10]}"
@@ -114,32 +86,263 @@ class CasefileManager:
             logger.info(f"Top-level casefile '{casefile.id}' created by user '{user_id}'.")
             return casefile.id
 
+    async def create_sub_casefiles(
+        self,
+        parent_id: str,
+        specs: List[Union[SubCasefileSpec, Dict[str, Any]]],
+        user_id: str,
+    ) -> List[str]:
+        """
+        Creates sub-casefiles under a parent and adds them to the parent's
+        `sub_casefile_ids`. The parent is read, permission-checked and
+        written once per transaction instead of once per child, and its ACL
+        is inherited once. Up to MAX_SUB_CASEFILES_PER_TRANSACTION children
+        are created atomically; larger sets are split over several
+        transactions. Returns the IDs of the new casefiles in `specs` order.
+        """
+        specs = [SubCasefileSpec.model_validate(spec) if isinstance(spec, dict) else spec for spec in specs]
+        casefiles_collection = self.db_manager.casefiles_collection_name
+        created_ids = []
+
+        for start in range(0, len(specs), MAX_SUB_CASEFILES_PER_TRANSACTION):
+            batch = specs[start:start + MAX_SUB_CASEFILES_PER_TRANSACTION]
+            # Chosen outside the transaction, so a retried attempt writes the same IDs.
+            child_ids = [spec.id or f"case-{uuid4().hex[:10]}" for spec in batch]
+
+            def _create_in_transaction(transaction, batch=batch, child_ids=child_ids):
+                parent_data = transaction.get(casefiles_collection, parent_id)
+                if parent_data is None:
+                    raise ValueError(f"Parent casefile with ID '{parent_id}' not found.")
+
+                # Only the parent fields needed here are read: the stored
+                # document may hold compressed fields that a model cannot parse.
+                parent_acl = {member: Role(role) for member, role in (parent_data.get("acl") or {}).items()}
+
+                # Permission Check: User must have write access to the parent
+                if parent_acl.get(user_id) not in [Role.ADMIN, Role.WRITER]:
+                    raise PermissionError(f"User '{user_id}' does not have permission to create a sub-casefile under '{parent_id}'.")
+
+                # Inherit ACL and add creator as admin
+                sub_acl = {**parent_acl, user_id: Role.ADMIN}
+                ancestor_ids = (parent_data.get("ancestor_ids") or []) + [parent_id]
+                now = datetime.utcnow().isoformat() + 'Z'
+
+                for child_id, spec in zip(child_ids, batch):
+                    sub_casefile = Casefile(
+                        id=child_id,
+                        name=spec.name,
+                        description=spec.description,
+                        casefile_type=spec.casefile_type,
+                        tags=spec.tags,
+                        owner_id=user_id,
+                        acl=sub_acl,
+                        parent_id=parent_id,
+                        ancestor_ids=ancestor_ids,
+                        # Inherit from parent, but allow overrides
+                        campaign=spec.campaign if spec.campaign is not None else parent_data.get("campaign"),
+                        dossier=spec.dossier if spec.dossier is not None else parent_data.get("dossier"),
+                        created_at=now,
+                        modified_at=now,
+                    )
+                    transaction.set(casefiles_collection, child_id, sub_casefile.model_dump(exclude_none=True))
+
+                sub_casefile_ids = list(dict.fromkeys((parent_data.get("sub_casefile_ids") or []) + child_ids))
+                transaction.update(casefiles_collection, parent_id, {
+                    "sub_casefile_ids": sub_casefile_ids,
+                    "sub_casefile_count": len(sub_casefile_ids),
+                    "modified_at": SERVER_TIMESTAMP,
+                })
+
+            await self.db_manager.run_transaction(_create_in_transaction)
+            created_ids.extend(child_ids)
+
+        logger.info(f"{len(created_ids)} sub-casefiles created under parent '{parent_id}' by user '{user_id}'.")
+        return created_ids
+
     async def list_all_casefiles(self) -> List[str]:
         """Lists all casefiles from the database as JSON strings."""
-        casefiles = await self.db_manager.load_all_casefiles()
-        return [casefile.model_dump_json() for casefile in casefiles]
+        return [casefile.model_dump_json() async for casefile in self.iter_casefiles()]
+
+    async def list_casefile_summaries(self) -> List[CasefileSummary]:
+        """Lists lightweight summaries of all casefiles, read through a storage projection."""
+        return [summary async for summary in self.iter_casefiles(fields=CASEFILE_SUMMARY_FIELDS)]
+
+    async def list_top_level_casefile_summaries(self) -> List[CasefileSummary]:
+        """
+        Lists summaries of the casefiles without a parent, with one query on
+        the indexed `depth`. Roots are stored without a `parent_id`, so that
+        field cannot be queried for null.
+        """
+        return await self.db_manager.query_casefiles([("depth", "==", 0)], fields=CASEFILE_SUMMARY_FIELDS)
+
+    async def iter_casefiles(
+        self,
+        page_size: int = 100,
+        start_after: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[Union[Casefile, CasefileSummary]]:
+        """
+        Streams casefiles (or summaries, when `fields` is given) with cursor
+        pagination. Batch jobs should use this instead of list_all_casefiles.
+        """
+        async for casefile in self.db_manager.iter_casefiles(page_size=page_size, start_after=start_after, fields=fields):
+            yield casefile
 
     async def delete_casefile(self, casefile_id: str, user_id: str) -> bool:
         """Deletes a casefile from the database."""
-        casefile_json = await self.load_casefile(casefile_id)
-        if not casefile_json:
+        casefile = await self.get_casefile(casefile_id)
+        if not casefile:
             raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
-        casefile = Casefile.model_validate_json(casefile_json)
 
         # Permission Check
         if casefile.acl.get(user_id) != Role.ADMIN:
             raise PermissionError(f"User '{user_id}' does not have admin rights to delete casefile '{casefile_id}'.")
 
+        await self._remove_from_hierarchy(casefile)
         logger.info(f"Casefile '{casefile_id}' deleted by user '{user_id}'.")
         return await self.db_manager.delete_casefile(casefile_id)
 
+    async def _remove_from_hierarchy(self, casefile: Casefile):
+        """
+        Keeps the hierarchy consistent when a casefile is deleted: its
+        children move up to its parent, and it is removed from the
+        `ancestor_ids` of its whole subtree.
+        """
+        casefiles_collection = self.db_manager.casefiles_collection_name
+        descendants = await self.get_descendants(casefile.id)
+        child_ids = [descendant.id for descendant in descendants if descendant.parent_id == casefile.id]
+
+        if casefile.parent_id:
+            def _update_parent(transaction):
+                parent_data = transaction.get(casefiles_collection, casefile.parent_id)
+                if parent_data is None:
+                    return
+                sub_casefile_ids = [
+                    sub_id for sub_id in parent_data.get("sub_casefile_ids") or [] if sub_id != casefile.id
+                ] + child_ids
+                transaction.update(casefiles_collection, casefile.parent_id, {
+                    "sub_casefile_ids": sub_casefile_ids,
+                    "sub_casefile_count": len(sub_casefile_ids),
+                    "modified_at": SERVER_TIMESTAMP,
+                })
+
+            await self.db_manager.run_transaction(_update_parent)
+
+        for start in range(0, len(descendants), MAX_WRITES_PER_TRANSACTION):
+            batch = descendants[start:start + MAX_WRITES_PER_TRANSACTION]
+
+            def _update_descendants(transaction, batch=batch):
+                for descendant in batch:
+                    ancestor_ids = [ancestor_id for ancestor_id in descendant.ancestor_ids if ancestor_id != casefile.id]
+                    # modified_at lets other processes' caches see the change.
+                    updates = {"ancestor_ids": ancestor_ids, "depth": len(ancestor_ids), "modified_at": SERVER_TIMESTAMP}
+                    if descendant.parent_id == casefile.id:
+                        updates["parent_id"] = casefile.parent_id or DELETE_FIELD
+                    transaction.update(casefiles_collection, descendant.id, updates)
+
+            await self.db_manager.run_transaction(_update_descendants)
+
+    async def get_casefile(self, casefile_id: str) -> Optional[Casefile]:
+        """
+        Loads a casefile object from the database, or None if it does not
+        exist. Managers and agents use this; JSON is only produced at the
+        HTTP and tool boundary.
+        """
+        return await self.db_manager.load_casefile(casefile_id)
+
     async def load_casefile(self, casefile_id: str) -> str:
-        """Loads a casefile object from the database and returns it as a JSON string."""
-        casefile = await self.db_manager.load_casefile(casefile_id)
+        """Loads a casefile and returns it as a JSON string, for tools; empty if it does not exist."""
+        casefile = await self.get_casefile(casefile_id)
         if casefile:
             return casefile.model_dump_json()
         return ""
 
+    async def load_subtree(self, root_id: str, depth: Optional[int] = None) -> Dict[str, Casefile]:
+        """
+        Loads a casefile and its sub-casefiles down to `depth` levels below the
+        root (all levels when None). Each level of the tree is fetched with a
+        single batched read. Returns a mapping of casefile ID to Casefile,
+        including the root; an empty mapping if the root does not exist.
+        """
+        root = await self.db_manager.load_casefile(root_id)
+        if not root:
+            return {}
+
+        subtree = {root.id: root}
+        frontier = [root]
+        level = 0
+        while frontier and (depth is None or level < depth):
+            child_ids = [
+                child_id
+                for casefile in frontier
+                for child_id in casefile.sub_casefile_ids
+                if child_id not in subtree
+            ]
+            if not child_ids:
+                break
+            children = await self.db_manager.load_casefiles(child_ids)
+            subtree.update(children)
+            frontier = list(children.values())
+            level += 1
+        return subtree
+
+    async def get_descendants(self, root_id: str) -> List[CasefileSummary]:
+        """
+        Lists summaries of all casefiles below `root_id`, at any depth,
+        shallowest first. A single query on the `ancestor_ids` index.
+        """
+        return await self.db_manager.query_casefiles(
+            [("ancestor_ids", "array_contains", root_id)], fields=CASEFILE_SUMMARY_FIELDS, order_by="depth",
+        )
+
+    async def get_ancestors(self, casefile_id: str) -> List[CasefileSummary]:
+        """
+        Lists summaries of the ancestors of a casefile, from the root down to
+        its parent, read with one batched read. Empty if it does not exist.
+        """
+        casefile = await self.db_manager.load_casefile(casefile_id, fields=["name", "ancestor_ids"])
+        if casefile is None or not casefile.ancestor_ids:
+            return []
+        ancestors = await self.db_manager.load_casefiles(casefile.ancestor_ids, fields=CASEFILE_SUMMARY_FIELDS)
+        return [ancestors[ancestor_id] for ancestor_id in casefile.ancestor_ids if ancestor_id in ancestors]
+
+    async def get_tree(self, root_id: str, max_depth: Optional[int] = None) -> List[CasefileSummary]:
+        """
+        Lists summaries of a casefile and its descendants down to `max_depth`
+        levels below it (all levels when None), shallowest first. The whole
+        subtree is one indexed query; build the nesting from `parent_id`.
+        Empty if the root does not exist.
+        """
+        root = await self.db_manager.load_casefile(root_id, fields=CASEFILE_SUMMARY_FIELDS)
+        if root is None:
+            return []
+        filters = [("ancestor_ids", "array_contains", root_id)]
+        if max_depth is not None:
+            if max_depth <= 0:
+                return [root]
+            filters.append(("depth", "<=", root.depth + max_depth))
+        return [root] + await self.db_manager.query_casefiles(filters, fields=CASEFILE_SUMMARY_FIELDS, order_by="depth")
+
+    async def rebuild_hierarchy_index(self) -> int:
+        """
+        Writes `ancestor_ids` and `depth` of every casefile from the
+        `parent_id` links, for casefiles stored before the index existed.
+        Returns the number of casefiles indexed.
+        """
+        parent_ids = {summary.id: summary.parent_id async for summary in self.iter_casefiles(fields=["name", "parent_id"])}
+        indexed = 0
+        for casefile_id in parent_ids:
+            ancestor_ids = []
+            parent_id = parent_ids[casefile_id]
+            # Stops at a missing parent, and at a cycle in corrupt data.
+            while parent_id and parent_id not in ancestor_ids and parent_id != casefile_id:
+                ancestor_ids.insert(0, parent_id)
+                parent_id = parent_ids.get(parent_id)
+            if await self.db_manager.update_casefile_fields(casefile_id, {"ancestor_ids": ancestor_ids, "depth": len(ancestor_ids)}):
+                indexed += 1
+        logger.info(f"Hierarchy index rebuilt for {indexed} casefiles.")
+        return indexed
+
     async def log_event(
         self,
         casefile_id: str,
@@ -150,11 +353,10 @@ class CasefileManager:
         metadata: Dict[str, Any] = None
     ):
         """Logs a structured event to a casefile's event log."""
-        casefile_json = await self.load_casefile(casefile_id)
-        if not casefile_json:
+        casefile = await self.get_casefile(casefile_id)
+        if not casefile:
             logger.error(f"Cannot log event: Casefile with ID '{casefile_id}' not found.")
             return
-        casefile = Casefile.model_validate_json(casefile_json)
 
         # Permission Check: Any user with a role can log an event.
         if not casefile.acl.get(user_id):
@@ -167,62 +369,129 @@ class CasefileManager:
             metadata=metadata or {}
         )
         
-        casefile.event_log.append(event)
-        await self.db_manager.save_casefile(casefile)
+        # Events go to the append-only events subcollection; the casefile keeps a recent tail.
+        await self.db_manager.append_casefile_event(casefile_id, event)
         logger.info(f"Logged event for casefile '{casefile_id}' by user '{user_id}': {source} - {event_type}")
 
-    async def grant_access(self, casefile_id: str, user_id_to_grant: str, role: str, current_user_id: str) -> str:
+    async def get_events(
+        self, casefile_id: str, after: Optional[str] = None, limit: int = 100, after_id: Optional[str] = None
+    ) -> List[Event]:
+        """
+        Returns a page of the full event history of a casefile, oldest first.
+        Pass the timestamp and the ID of the last returned event as `after`
+        and `after_id` to get the next page.
+        """
+        return await self.db_manager.get_events(casefile_id, after=after, limit=limit, after_id=after_id)
+
+    async def grant_access(self, casefile_id: str, user_id_to_grant: str, role: str, current_user_id: str) -> Casefile:
         """
         Grants a role to a user for a specific casefile.
         Only an admin of the casefile can grant access.
         """
-        casefile_json = await self.load_casefile(casefile_id)
-        if not casefile_json:
-            raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
-        casefile = Casefile.model_validate_json(casefile_json)
-
-        # Permission Check
-        if casefile.acl.get(current_user_id) != Role.ADMIN:
-            raise PermissionError(f"User '{current_user_id}' does not have admin rights for casefile '{casefile_id}'.")
-
         try:
             role_enum = Role(role)
         except ValueError:
             raise ValueError(f"Invalid role '{role}'. Must be one of {[r.value for r in Role]}.")
 
-        casefile.acl[user_id_to_grant] = role_enum
-        casefile.touch()
-        await self.db_manager.save_casefile(casefile)
+        def _grant(casefile: Casefile) -> Dict[Any, Any]:
+            # Permission Check
+            if casefile.acl.get(current_user_id) != Role.ADMIN:
+                raise PermissionError(f"User '{current_user_id}' does not have admin rights for casefile '{casefile_id}'.")
+
+            casefile.acl[user_id_to_grant] = role_enum
+            casefile.touch()
+            return {
+                ("acl", user_id_to_grant): role_enum.value,
+                **self._acl_index_updates(casefile),
+                "modified_at": SERVER_TIMESTAMP,
+            }
+
+        casefile = await self.db_manager.modify_casefile(casefile_id, _grant)
+        if casefile is None:
+            raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
         logger.info(f"User '{user_id_to_grant}' granted '{role_enum.value}' role for casefile '{casefile_id}' by user '{current_user_id}'.")
-        return casefile.model_dump_json()
+        return casefile
 
-    async def revoke_access(self, casefile_id: str, user_id_to_revoke: str, current_user_id: str) -> str:
+    async def revoke_access(self, casefile_id: str, user_id_to_revoke: str, current_user_id: str) -> Casefile:
         """
         Revokes a user's access to a specific casefile.
         Only an admin of the casefile can revoke access.
         The owner's access cannot be revoked.
         """
-        casefile_json = await self.load_casefile(casefile_id)
-        if not casefile_json:
+        def _revoke(casefile: Casefile) -> Optional[Dict[Any, Any]]:
+            # Permission Check
+            if casefile.acl.get(current_user_id) != Role.ADMIN:
+                raise PermissionError(f"User '{current_user_id}' does not have admin rights for casefile '{casefile_id}'.")
+
+            if user_id_to_revoke == casefile.owner_id:
+                raise ValueError("Cannot revoke access for the owner of the casefile.")
+
+            if user_id_to_revoke not in casefile.acl:
+                logger.warning(f"User '{user_id_to_revoke}' already has no access to casefile '{casefile_id}'.")
+                return None
+
+            del casefile.acl[user_id_to_revoke]
+            casefile.touch()
+            return {
+                ("acl", user_id_to_revoke): DELETE_FIELD,
+                **self._acl_index_updates(casefile),
+                "modified_at": SERVER_TIMESTAMP,
+            }
+
+        casefile = await self.db_manager.modify_casefile(casefile_id, _revoke)
+        if casefile is None:
             raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
-        casefile = Casefile.model_validate_json(casefile_json)
-
-        # Permission Check
-        if casefile.acl.get(current_user_id) != Role.ADMIN:
-            raise PermissionError(f"User '{current_user_id}' does not have admin rights for casefile '{casefile_id}'.")
+        logger.info(f"Access for user '{user_id_to_revoke}' revoked from casefile '{casefile_id}' by user '{current_user_id}'.")
+        return casefile
 
-        if user_id_to_revoke == casefile.owner_id:
-            raise ValueError("Cannot revoke access for the owner of the casefile.")
+    @staticmethod
+    def _acl_index_updates(casefile: Casefile) -> Dict[str, List[str]]:
+        """
+        The ACL membership index fields for a changed ACL. They are written in
+        the same conditional update as the ACL itself, so the index cannot
+        drift from it under concurrent grants and revokes.
+        """
+        return {"acl_members": casefile.acl_members, "acl_roles": casefile.acl_roles}
 
-        if user_id_to_revoke not in casefile.acl:
-            logger.warning(f"User '{user_id_to_revoke}' already has no access to casefile '{casefile_id}'.")
-            return casefile.model_dump_json()
+    async def rebuild_acl_index(self) -> int:
+        """
+        Writes the ACL membership index of every casefile, for casefiles stored
+        before the index existed. Returns the number of casefiles indexed.
+        """
+        indexed = 0
+        async for summary in self.iter_casefiles(fields=["name"]):
+            if await self.db_manager.modify_casefile(summary.id, self._acl_index_updates) is not None:
+                indexed += 1
+        logger.info(f"ACL membership index rebuilt for {indexed} casefiles.")
+        return indexed
+
+    async def rebuild_indexes(self) -> Dict[str, int]:
+        """
+        Backfills every derived index of casefiles stored before it existed:
+        the hierarchy index (read by GET /casefiles and the tree reads), the
+        ACL membership index and the status. Safe to run again. Returns the
+        number of casefiles indexed per index.
+        """
+        return {
+            "hierarchy": await self.rebuild_hierarchy_index(),
+            "acl": await self.rebuild_acl_index(),
+            "status": await self.rebuild_status_index(),
+        }
 
-        del casefile.acl[user_id_to_revoke]
-        casefile.touch()
-        await self.db_manager.save_casefile(casefile)
-        logger.info(f"Access for user '{user_id_to_revoke}' revoked from casefile '{casefile_id}' by user '{current_user_id}'.")
-        return casefile.model_dump_json()
+    async def list_casefiles_for_user(self, user_id: str, role: Optional[str] = None) -> List[CasefileSummary]:
+        """
+        Lists summaries of the casefiles a user has access to, optionally only
+        those where the user holds `role`. Answered by an array_contains query
+        on the ACL membership index instead of scanning all casefiles.
+        """
+        if role is None:
+            index_filter = ("acl_members", "array_contains", user_id)
+        else:
+            try:
+                index_filter = ("acl_roles", "array_contains", acl_role_key(user_id, role))
+            except ValueError:
+                raise ValueError(f"Invalid role '{role}'. Must be one of {[r.value for r in Role]}.")
+        return await self.db_manager.query_casefiles([index_filter], fields=CASEFILE_SUMMARY_FIELDS)
 
     def register_tools(self, tool_registry: ToolRegistry):
         """
@@ -311,7 +580,7 @@ class CasefileManager:
         tool_registry.register_tool(
             tool_name="grant_access",
             tool_declaration=grant_access_tool,
-            tool_handler=self.grant_access
+            tool_handler=_json_tool(self.grant_access)
         )
 
         revoke_access_tool = FunctionDeclaration(
@@ -330,7 +599,7 @@ class CasefileManager:
         tool_registry.register_tool(
             tool_name="revoke_access",
             tool_declaration=revoke_access_tool,
-            tool_handler=self.revoke_access
+            tool_handler=_json_tool(self.revoke_access)
         )
 
         update_casefile_tool = FunctionDeclaration(
@@ -349,66 +618,406 @@ class CasefileManager:
         tool_registry.register_tool(
             tool_name="update_casefile",
             tool_declaration=update_casefile_tool,
-            tool_handler=self.update_casefile
+            tool_handler=_json_tool(self.update_casefile)
         )
 
         logger.info("CasefileManager tools registered.")
 
-    async def list_all_casefiles_with_status(self) -> List[Dict[str, Any]]:
-        """ 
-        Retrieves all casefiles and calculates their status based on their content.
-        """
-        all_casefiles_json = await self.list_all_casefiles()
-        status_list = []
-
-        for casefile_json in all_casefiles_json:
-            casefile = Casefile.model_validate_json(casefile_json)
-            status = "NEW"
-            if casefile.engineered_workflows:
-                status = "ANALYSIS_COMPLETE"
-            elif casefile.execution_results:
-                status = "EXECUTION_COMPLETE"
-            elif casefile.workflows:
-                status = "PLANNING_COMPLETE"
-            elif casefile.description:
-                status = "MISSION_DEFINED"
-            
-            casefile_dict = casefile.model_dump()
-            casefile_dict["status"] = status
-            status_list.append(casefile_dict)
-        
-        return status_list
-
-    async def update_casefile(self, casefile_id: str, user_id: str, updates: Dict[str, Any]) -> str:
+    async def list_all_casefiles_with_status(self, status: Optional[Union[CasefileStatus, str]] = None) -> List[Dict[str, Any]]:
         """
-        Updates an existing casefile with the provided data.
-        Handles appending to lists and updating other fields.
+        Retrieves summaries of all casefiles with their stored status, or only
+        those with the given status, in one projection query on the indexed
+        `status` field.
         """
-        casefile_json = await self.load_casefile(casefile_id)
-        if not casefile_json:
-            raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
-        casefile = Casefile.model_validate_json(casefile_json)
-
-        # Permission Check
-        if not (casefile.acl.get(user_id) in [Role.ADMIN, Role.WRITER]):
-            raise PermissionError(f"User '{user_id}' does not have write permission for casefile '{casefile_id}'.")
+        filters = []
+        if status is not None:
+            try:
+                filters.append(("status", "==", CasefileStatus(status).value))
+            except ValueError:
+                raise ValueError(f"Invalid status '{status}'. Must be one of {[s.value for s in CasefileStatus]}.")
+        summaries = await self.db_manager.query_casefiles(filters, fields=CASEFILE_SUMMARY_FIELDS)
+        # Stored before the counts: their status needs the lists themselves.
+        unknown_ids = [summary.id for summary in summaries if summary.status is None]
+        if unknown_ids:
+            casefiles = await self.db_manager.load_casefiles(unknown_ids)
+            summaries = [
+                summary.model_copy(update={
+                    **self._derived_field_updates(casefiles[summary.id]), "status": casefiles[summary.id].status,
+                })
+                if summary.id in casefiles else summary
+                for summary in summaries
+            ]
+        return [summary.model_dump() for summary in summaries]
+
+    @staticmethod
+    def _derived_field_updates(casefile: Casefile) -> Dict[str, Any]:
+        """The stored counts and status of a casefile, computed from its lists."""
+        return {
+            "sub_casefile_count": casefile.sub_casefile_count,
+            **{count_field: getattr(casefile, count_field) for count_field in STATUS_COUNT_FIELDS},
+            "status": casefile.status.value,
+        }
+
+    async def rebuild_status_index(self) -> int:
+        """
+        Writes the status of every casefile, for casefiles stored before the
+        status was persisted. It is derived from the stored counts where
+        there are any; otherwise the casefile is loaded and its counts are
+        written too. Returns the number of casefiles indexed.
+        """
+        indexed = 0
+        async for summary in self.iter_casefiles(fields=CASEFILE_SUMMARY_FIELDS):
+            if summary.status is not None:
+                written = await self.db_manager.update_casefile_fields(summary.id, {"status": summary.status.value})
+            else:
+                written = await self.db_manager.modify_casefile(summary.id, self._derived_field_updates) is not None
+            if written:
+                indexed += 1
+        logger.info(f"Status index rebuilt for {indexed} casefiles.")
+        return indexed
 
+    def _apply_updates(self, casefile: Casefile, updates: Dict[str, Any]) -> Dict[Any, Any]:
+        """
+        Applies `updates` to a casefile in place, appending to list fields, and
+        returns the field updates that write the change.
+        """
+        # Only the touched fields are written. Extended lists are written whole:
+        # an ArrayUnion would skip items equal to stored ones and the stored
+        # counts below would no longer match the stored list.
+        field_updates = {}
         for key, value in updates.items():
-            if hasattr(casefile, key):
+            if key in Casefile.model_computed_fields:
+                # Counts, status, depth and the ACL index follow from the other fields.
+                logger.warning(f"Ignoring update of read-only attribute '{key}' on Casefile '{casefile.id}'.")
+            elif hasattr(casefile, key):
                 current_value = getattr(casefile, key)
-                if isinstance(current_value, list) and isinstance(value, list):
-                    # Extend existing list with new items
-                    current_value.extend(value)
-                elif isinstance(current_value, list) and not isinstance(value, list):
-                    # If current is list but new value is not, append the single item
-                    current_value.append(value)
+                if isinstance(current_value, list):
+                    # Extend existing list with new items, or append the single item
+                    new_items = value if isinstance(value, list) else [value]
+                    current_value.extend(new_items)
+                    if new_items:
+                        field_updates[key] = casefile.model_dump(include={key}, exclude_none=True)[key]
                 else:
                     # Directly update other attributes
                     setattr(casefile, key, value)
+                    field_updates[key] = casefile.model_dump(include={key}, exclude_none=True).get(key)
             else:
-                logger.warning(f"Attempted to update non-existent attribute '{key}' on Casefile '{casefile_id}'.")
+                logger.warning(f"Attempted to update non-existent attribute '{key}' on Casefile '{casefile.id}'.")
+
+        if "acl" in field_updates:
+            field_updates.update(self._acl_index_updates(casefile))
+
+        # Keep the stored counts (read by list views) in sync with appended lists.
+        # They are exact because the write fails if the casefile changed since this read.
+        for count_field in ("sub_casefile_count", "workflow_count", "execution_result_count", "engineered_workflow_count"):
+            field_updates[count_field] = getattr(casefile, count_field)
+        field_updates["status"] = casefile.status.value
 
         casefile.touch() # Update modified_at timestamp
-        await self.db_manager.save_casefile(casefile)
+        field_updates["modified_at"] = SERVER_TIMESTAMP
+        return field_updates
+
+    async def update_casefile(self, casefile_id: str, user_id: str, updates: Dict[str, Any]) -> Casefile:
+        """
+        Updates an existing casefile with the provided data.
+        Handles appending to lists and updating other fields.
+        The update is an optimistic read-modify-write: if the casefile changes
+        concurrently, it is re-read and the update is applied again.
+        """
+        def _apply_updates(casefile: Casefile) -> Dict[Any, Any]:
+            # Permission Check
+            if not (casefile.acl.get(user_id) in [Role.ADMIN, Role.WRITER]):
+                raise PermissionError(f"User '{user_id}' does not have write permission for casefile '{casefile_id}'.")
+            return self._apply_updates(casefile, updates)
+
+        casefile = await self.db_manager.modify_casefile(casefile_id, _apply_updates)
+        if casefile is None:
+            raise ValueError(f"Casefile with ID '{casefile_id}' not found.")
         logger.info(f"Casefile '{casefile_id}' updated successfully by user '{user_id}'.")
-        return casefile.model_dump_json()
\ No newline at end of file
+        return casefile
+
+    async def apply_batch(
+        self, ops: List[Union[CasefileBatchOperation, Dict[str, Any]]], user_id: str
+    ) -> List[CasefileBatchResult]:
+        """
+        Applies creates, updates, ACL changes and deletes in bulk. Every
+        casefile the batch refers to is read, and permission-checked, from one
+        batched read, and the operations are validated in order, so e.g. an
+        update can follow the create of the same casefile. Operations that
+        write a common casefile are committed together, in atomic commits of
+        up to MAX_WRITES_PER_TRANSACTION casefiles. Each commit is conditional
+        on its casefiles being unchanged since they were read, like the
+        single-casefile methods; a conflicting commit alone is read again and
+        its operations re-applied. A failed operation does not stop the
+        others; the results report each operation in `ops` order.
+        """
+        ops = [CasefileBatchOperation.model_validate(op) if isinstance(op, dict) else op for op in ops]
+        ops = [
+            op.model_copy(update={"casefile_id": f"case-{uuid4().hex[:10]}"})
+            if op.op == "create" and op.casefile_id is None else op
+            for op in ops
+        ]
+        referenced_ids = list(dict.fromkeys(
+            casefile_id for op in ops for casefile_id in (op.casefile_id, op.parent_id) if casefile_id
+        ))
+        delete_ids = [op.casefile_id for op in ops if op.op == "delete" and op.casefile_id]
+        snapshot = await self._read_batch_casefiles(referenced_ids, delete_ids)
+
+        results = []
+        touched: List[List[str]] = []
+        working = {casefile_id: casefile.model_copy(deep=True) for casefile_id, (casefile, _) in snapshot.items()}
+        for index, op in enumerate(ops):
+            try:
+                touched.append(self._apply_batch_operation(op, user_id, working))
+            except Exception as e:
+                touched.append([])
+                results.append(CasefileBatchResult(index=index, op=op.op, casefile_id=op.casefile_id, success=False, error=str(e)))
+                continue
+            results.append(CasefileBatchResult(index=index, op=op.op, casefile_id=op.casefile_id, success=True))
+
+        for indexes, casefile_ids in self._batch_chunks(touched):
+            errors = await self._commit_batch_chunk(ops, indexes, casefile_ids, snapshot, user_id)
+            for index, error in errors.items():
+                results[index] = results[index].model_copy(update={"success": False, "error": str(error)})
+
+        succeeded = sum(result.success for result in results)
+        logger.info(f"Batch of {len(ops)} casefile operations applied by user '{user_id}': {succeeded} succeeded.")
+        return results
+
+    async def _read_batch_casefiles(
+        self, casefile_ids: List[str], delete_ids: List[str]
+    ) -> Dict[str, Tuple[Casefile, Any]]:
+        """
+        Reads the casefiles of a batch with their version tokens. A delete
+        also rewrites the parent and the subtree of the deleted casefile, so
+        those are read too, in one more batched read.
+        """
+        snapshot = await self.db_manager.load_casefiles_versioned(casefile_ids)
+        related_ids = []
+        for casefile_id in delete_ids:
+            if casefile_id not in snapshot:
+                continue
+            casefile = snapshot[casefile_id][0]
+            if casefile.parent_id:
+                related_ids.append(casefile.parent_id)
+            if casefile.sub_casefile_ids:
+                related_ids.extend(descendant.id for descendant in await self.get_descendants(casefile_id))
+        missing_ids = [casefile_id for casefile_id in dict.fromkeys(related_ids) if casefile_id not in snapshot]
+        if missing_ids:
+            snapshot.update(await self.db_manager.load_casefiles_versioned(missing_ids))
+        return snapshot
+
+    @staticmethod
+    def _batch_chunks(touched: List[List[str]]) -> List[Tuple[List[int], set]]:
+        """
+        Groups the indexes of the batch operations that write a common
+        casefile, as they must be committed together, and packs the groups,
+        in order, into chunks of up to MAX_WRITES_PER_TRANSACTION casefiles; a
+        larger group is a chunk of its own. `touched` lists the casefiles each
+        operation writes. Returns (operation indexes, casefile IDs) per chunk.
+        """
+        group_of: Dict[str, int] = {}
+        groups: Dict[int, Tuple[List[int], set]] = {}
+        for index, casefile_ids in enumerate(touched):
+            if not casefile_ids:
+                continue
+            merged = sorted({group_of[casefile_id] for casefile_id in casefile_ids if casefile_id in group_of})
+            group = merged[0] if merged else index
+            indexes, group_ids = groups.setdefault(group, ([], set()))
+            for other in merged[1:]:
+                other_indexes, other_ids = groups.pop(other)
+                indexes.extend(other_indexes)
+                group_ids.update(other_ids)
+                group_of.update(dict.fromkeys(other_ids, group))
+            indexes.append(index)
+            group_ids.update(casefile_ids)
+            group_of.update(dict.fromkeys(casefile_ids, group))
+
+        chunks: List[Tuple[List[int], set]] = []
+        for indexes, group_ids in groups.values():
+            if chunks and len(chunks[-1][1]) + len(group_ids) <= MAX_WRITES_PER_TRANSACTION:
+                chunks[-1][0].extend(indexes)
+                chunks[-1][1].update(group_ids)
+            else:
+                chunks.append((list(indexes), set(group_ids)))
+        return [(sorted(indexes), chunk_ids) for indexes, chunk_ids in chunks]
+
+    async def _commit_batch_chunk(
+        self,
+        ops: List[CasefileBatchOperation],
+        indexes: List[int],
+        casefile_ids: set,
+        snapshot: Dict[str, Tuple[Casefile, Any]],
+        user_id: str,
+    ) -> Dict[int, Exception]:
+        """
+        Re-applies the operations of one chunk of a batch to copies of its
+        casefiles as read, and commits the result conditionally. On a conflict
+        only this chunk's casefiles are read again, up to `max_write_attempts`
+        times. Returns the errors of the operations that failed.
+        """
+        for attempt in range(self.db_manager.max_write_attempts):
+            errors: Dict[int, Exception] = {}
+            working = {
+                casefile_id: snapshot[casefile_id][0].model_copy(deep=True)
+                for casefile_id in casefile_ids if casefile_id in snapshot
+            }
+            for index in indexes:
+                try:
+                    self._apply_batch_operation(ops[index], user_id, working)
+                except Exception as e:
+                    errors[index] = e
+            try:
+                writes = self._batch_writes(snapshot, working)
+                if writes:
+                    await self.db_manager.commit_casefiles(writes)
+                return errors
+            except WriteConflict:
+                logger.info(f"Write conflict on a batch of {len(indexes)} operations (attempt {attempt + 1}); retrying.")
+                await asyncio.sleep(random.uniform(0, WRITE_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+                delete_ids = [ops[index].casefile_id for index in indexes if ops[index].op == "delete"]
+                snapshot = await self._read_batch_casefiles(sorted(casefile_ids), delete_ids)
+                casefile_ids = casefile_ids | set(snapshot)
+            except Exception as e:
+                logger.error(f"Batch write of {len(indexes)} operations failed: {e}")
+                return {index: e for index in indexes}
+        error = WriteConflict(f"Casefiles of the batch kept changing; gave up after {self.db_manager.max_write_attempts} attempts.")
+        return {index: error for index in indexes}
+
+    @staticmethod
+    def _batch_writes(
+        snapshot: Dict[str, Tuple[Casefile, Any]], working: Dict[str, Optional[Casefile]]
+    ) -> List[Tuple[str, Optional[Dict[Any, Any]], Any]]:
+        """
+        The writes for `DatabaseManager.commit_casefiles` that turn the
+        casefiles as read into their `working` copies: creates, deletes, and
+        updates of the changed top-level fields (stored counts, status and
+        ACL index included, as they are computed fields).
+        """
+        writes = []
+        for casefile_id, casefile in working.items():
+            if casefile_id not in snapshot:
+                if casefile is not None:
+                    writes.append((casefile_id, casefile.model_dump(exclude_none=True), None))
+                continue
+            read_casefile, version_token = snapshot[casefile_id]
+            if casefile is None:
+                writes.append((casefile_id, None, version_token))
+                continue
+            before = read_casefile.model_dump(exclude_none=True)
+            after = casefile.model_dump(exclude_none=True)
+            updates = {
+                key: after.get(key, DELETE_FIELD)
+                for key in before.keys() | after.keys() if before.get(key) != after.get(key)
+            }
+            if updates:
+                updates["modified_at"] = SERVER_TIMESTAMP
+                writes.append((casefile_id, updates, version_token))
+        return writes
+
+    def _apply_batch_operation(
+        self, op: CasefileBatchOperation, user_id: str, working: Dict[str, Optional[Casefile]]
+    ) -> List[str]:
+        """
+        Applies one batch operation in place to the casefiles in `working`,
+        with the same permission rules as the single-casefile methods. A
+        deleted casefile is set to None. Returns the IDs of the casefiles the
+        operation changed.
+        """
+        if op.op == "create":
+            if not op.name:
+                raise ValueError("A create operation needs a name.")
+            if working.get(op.casefile_id) is not None:
+                raise ValueError(f"Casefile with ID '{op.casefile_id}' already exists.")
+            now = datetime.utcnow().isoformat() + 'Z'
+            casefile = Casefile(
+                id=op.casefile_id,
+                name=op.name,
+                description=op.description,
+                casefile_type=op.casefile_type,
+                tags=op.tags,
+                owner_id=user_id,
+                acl={user_id: Role.ADMIN},
+                campaign=Campaign(name=f"Campaign for {op.name}"),
+                dossier=Grouping(name=f"Dossier for {op.name}", context="casefile-dossier"),
+                created_at=now,
+                modified_at=now,
+            )
+            if not op.parent_id:
+                working[casefile.id] = casefile
+                return [casefile.id]
+            parent = working.get(op.parent_id)
+            if parent is None:
+                raise ValueError(f"Parent casefile with ID '{op.parent_id}' not found.")
+            if parent.acl.get(user_id) not in [Role.ADMIN, Role.WRITER]:
+                raise PermissionError(f"User '{user_id}' does not have permission to create a sub-casefile under '{op.parent_id}'.")
+            casefile.acl = {**parent.acl, user_id: Role.ADMIN}
+            casefile.parent_id = parent.id
+            casefile.ancestor_ids = parent.ancestor_ids + [parent.id]
+            casefile.campaign = parent.campaign
+            casefile.dossier = parent.dossier
+            parent.sub_casefile_ids.append(casefile.id)
+            parent.touch()
+            working[casefile.id] = casefile
+            return [casefile.id, parent.id]
+
+        casefile = working.get(op.casefile_id) if op.casefile_id else None
+        if casefile is None:
+            raise ValueError(f"Casefile with ID '{op.casefile_id}' not found.")
+
+        if op.op == "update":
+            if casefile.acl.get(user_id) not in [Role.ADMIN, Role.WRITER]:
+                raise PermissionError(f"User '{user_id}' does not have write permission for casefile '{casefile.id}'.")
+            read_only = [key for key in op.updates if key in Casefile.model_computed_fields]
+            if read_only:
+                raise ValueError(f"Cannot update read-only attributes {read_only} of casefile '{casefile.id}'.")
+            self._apply_updates(casefile, op.updates)
+            return [casefile.id]
+
+        # ACL changes and deletes need admin rights.
+        if casefile.acl.get(user_id) != Role.ADMIN:
+            raise PermissionError(f"User '{user_id}' does not have admin rights for casefile '{casefile.id}'.")
+        if op.op == "grant_access":
+            if not op.member_id or op.role is None:
+                raise ValueError("A grant_access operation needs a member_id and a role.")
+            casefile.acl[op.member_id] = op.role
+        elif op.op == "revoke_access":
+            if not op.member_id:
+                raise ValueError("A revoke_access operation needs a member_id.")
+            if op.member_id == casefile.owner_id:
+                raise ValueError("Cannot revoke access for the owner of the casefile.")
+            casefile.acl.pop(op.member_id, None)
+        else:  # delete
+            return self._remove_from_batch_hierarchy(casefile, working)
+        casefile.touch()
+        return [casefile.id]
+
+    @staticmethod
+    def _remove_from_batch_hierarchy(casefile: Casefile, working: Dict[str, Optional[Casefile]]) -> List[str]:
+        """
+        Deletes a casefile from `working` the way `_remove_from_hierarchy`
+        does in storage: its children move up to its parent, and it is
+        removed from the `ancestor_ids` of its subtree. Returns the IDs of
+        the casefiles changed.
+        """
+        touched = [casefile.id]
+        parent = working.get(casefile.parent_id) if casefile.parent_id else None
+        if parent is not None:
+            parent.sub_casefile_ids = [
+                sub_id for sub_id in parent.sub_casefile_ids if sub_id != casefile.id
+            ] + casefile.sub_casefile_ids
+            parent.touch()
+            touched.append(parent.id)
+        frontier = list(casefile.sub_casefile_ids)
+        while frontier:
+            descendant = working.get(frontier.pop())
+            if descendant is None:
+                continue
+            descendant.ancestor_ids = [ancestor_id for ancestor_id in descendant.ancestor_ids if ancestor_id != casefile.id]
+            if descendant.parent_id == casefile.id:
+                descendant.parent_id = casefile.parent_id
+            descendant.touch()
+            touched.append(descendant.id)
+            frontier.extend(descendant.sub_casefile_ids)
+        working[casefile.id] = None
+        return touched
@@ -2,13 +2,13 @@
 
 import uuid
 import datetime
-from typing import List, Optional, Dict, Any, Literal
+from typing import Annotated, List, Optional, Dict, Any, Literal, Union
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, BeforeValidator, Field, computed_field, model_validator
 
 # Updated imports from MDSAPP/core/models/ontology
-from MDSAPP.core.models.ontology import CasefileType, EventType, EventStatus, Role
+from MDSAPP.core.models.ontology import CasefileType, CasefileStatus, EventType, EventStatus, Role
 
 # Updated imports from MDSAPP/WorkFlowManagement/models/workflow and results
 from MDSAPP.WorkFlowManagement.models.workflow import Workflow, EngineeredWorkflow
@@ -17,6 +17,14 @@ from MDSAPP.CasefileManagement.models.research_result import ResearchResult
 
 from MDSAPP.core.models.stix_inspired_models import Campaign, Grouping # New import
 
+def _timestamp_to_iso(value: Any) -> Any:
+    # Firestore returns timestamps (e.g. SERVER_TIMESTAMP writes) as datetimes.
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+# An ISO 8601 string that also accepts a stored timestamp, so documents can be
+# validated as read from storage without converting them first.
+IsoTimestamp = Annotated[str, BeforeValidator(_timestamp_to_iso)]
+
 class DriveFileReference(BaseModel):
     id: str
     name: str
@@ -31,10 +39,31 @@ class Event(BaseModel):
     event_type: EventType = EventType.SYSTEM_LOG
     content: str
     metadata: Dict[str, Any] = Field(default_factory=dict)
-    timestamp: str = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
-    scheduled_time: Optional[str] = None
+    timestamp: IsoTimestamp = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
+    scheduled_time: Optional[IsoTimestamp] = None
     status: EventStatus = EventStatus.LOGGED
 
+def casefile_status(
+    description: str, workflow_count: int, execution_result_count: int, engineered_workflow_count: int
+) -> CasefileStatus:
+    """The progress of a casefile, from its description and stored counts."""
+    if engineered_workflow_count:
+        return CasefileStatus.ANALYSIS_COMPLETE
+    if execution_result_count:
+        return CasefileStatus.EXECUTION_COMPLETE
+    if workflow_count:
+        return CasefileStatus.PLANNING_COMPLETE
+    if description:
+        return CasefileStatus.MISSION_DEFINED
+    return CasefileStatus.NEW
+
+# The stored counts the status derives from.
+STATUS_COUNT_FIELDS = ("workflow_count", "execution_result_count", "engineered_workflow_count")
+
+def acl_role_key(member: str, role: Union[Role, str]) -> str:
+    """The `acl_roles` index entry for a member holding a role, e.g. "user-1:admin"."""
+    return f"{member}:{Role(role).value}"
+
 class Casefile(BaseModel):
     """
     The central, all-encompassing dossier-object for the MDS platform.
@@ -45,8 +74,8 @@ class Casefile(BaseModel):
     description: str = ""
     casefile_type: str = "research"
 
-    created_at: str = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
-    modified_at: str = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
+    created_at: IsoTimestamp = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
+    modified_at: IsoTimestamp = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc).isoformat())
 
     owner_id: Optional[str] = None # Added Optional for now
     acl: Dict[str, Role] = Field(default_factory=dict)
@@ -60,6 +89,10 @@ class Casefile(BaseModel):
         description="A list of IDs of nested sub-casefiles."
     )
     parent_id: Optional[str] = None
+    ancestor_ids: List[str] = Field(
+        default_factory=list,
+        description="The IDs of all ancestors, from the root down to the parent; maintained by the CasefileManager."
+    )
 
     workflows: List[Workflow] = Field(default_factory=list)
     engineered_workflows: List[EngineeredWorkflow] = Field(default_factory=list)
@@ -67,11 +100,152 @@ class Casefile(BaseModel):
     research_results: List[ResearchResult] = Field(default_factory=list)
 
     file_references: List[DriveFileReference] = Field(default_factory=list)
-    event_log: List[Event] = Field(default_factory=list)
+    event_log: List[Event] = Field(
+        default_factory=list,
+        description="The most recent events only; the full history lives in the casefile's events subcollection."
+    )
 
     embedding: Optional[List[float]] = None
+    archived_at: Optional[IsoTimestamp] = Field(
+        None,
+        description="Set while the casefile is archived; listings then return a stub without its large lists."
+    )
+
+    # Counts are stored with every write so list views can read them through
+    # a projection instead of loading the lists themselves.
+    @computed_field
+    @property
+    def sub_casefile_count(self) -> int:
+        return len(self.sub_casefile_ids)
+
+    @computed_field
+    @property
+    def workflow_count(self) -> int:
+        return len(self.workflows)
+
+    @computed_field
+    @property
+    def execution_result_count(self) -> int:
+        return len(self.execution_results)
+
+    @computed_field
+    @property
+    def engineered_workflow_count(self) -> int:
+        return len(self.engineered_workflows)
+
+    # Stored with the counts it derives from, so the status dashboard is one
+    # projection query, optionally filtered on the status.
+    @computed_field
+    @property
+    def status(self) -> CasefileStatus:
+        return casefile_status(
+            self.description, self.workflow_count, self.execution_result_count, self.engineered_workflow_count
+        )
+
+    # Hierarchy index: with `ancestor_ids`, a subtree or a level of it is a
+    # single indexed query instead of a recursive walk.
+    @computed_field
+    @property
+    def depth(self) -> int:
+        return len(self.ancestor_ids)
+
+    # ACL membership index: array fields that storage can query with
+    # array_contains, so "casefiles of user X" needs no scan of all documents.
+    @computed_field
+    @property
+    def acl_members(self) -> List[str]:
+        return sorted(self.acl)
+
+    @computed_field
+    @property
+    def acl_roles(self) -> List[str]:
+        return sorted(acl_role_key(member, role) for member, role in self.acl.items())
 
     def touch(self):
         self.modified_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
 Casefile.model_rebuild()
+
+class CasefileSummary(BaseModel):
+    """
+    A lightweight, read-only view of a casefile for list views. It is built
+    from a projection of the stored document and never holds the heavy
+    lists (workflows, results, events, embedding).
+    """
+    id: str
+    name: str
+    description: str = ""
+    casefile_type: str = "research"
+    owner_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    ancestor_ids: List[str] = Field(default_factory=list)
+    depth: int = 0
+    created_at: Optional[IsoTimestamp] = None
+    modified_at: Optional[IsoTimestamp] = None
+    archived_at: Optional[IsoTimestamp] = None
+
+    sub_casefile_count: int = 0
+    workflow_count: int = 0
+    execution_result_count: int = 0
+    engineered_workflow_count: int = 0
+    # None when it cannot be told from the stored fields; see below.
+    status: Optional[CasefileStatus] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _derive_missing_status(cls, data: Any) -> Any:
+        # Casefiles stored before the status was persisted; see
+        # CasefileManager.rebuild_status_index. Casefiles stored before the
+        # counts were have neither, and need the full casefile instead.
+        if isinstance(data, dict) and "status" not in data and all(key in data for key in STATUS_COUNT_FIELDS):
+            data = {**data, "status": casefile_status(
+                data.get("description") or "",
+                data.get("workflow_count") or 0,
+                data.get("execution_result_count") or 0,
+                data.get("engineered_workflow_count") or 0,
+            )}
+        return data
+
+class SubCasefileSpec(BaseModel):
+    """
+    What to create for one sub-casefile in CasefileManager.create_sub_casefiles.
+    The ACL, and the campaign and dossier unless given, are inherited from the parent.
+    """
+    id: Optional[str] = None
+    name: str
+    description: str = ""
+    casefile_type: str = "research"
+    tags: List[str] = Field(default_factory=list)
+    campaign: Optional[Campaign] = None
+    dossier: Optional[Grouping] = None
+
+class CasefileBatchOperation(BaseModel):
+    """
+    One operation of CasefileManager.apply_batch. `casefile_id` is the
+    casefile to change; for a create it is the ID of the new casefile, and
+    generated when omitted.
+    """
+    op: Literal["create", "update", "grant_access", "revoke_access", "delete"]
+    casefile_id: Optional[str] = None
+    # create
+    name: Optional[str] = None
+    description: str = ""
+    casefile_type: str = "research"
+    tags: List[str] = Field(default_factory=list)
+    parent_id: Optional[str] = None
+    # update
+    updates: Dict[str, Any] = Field(default_factory=dict)
+    # grant_access / revoke_access
+    member_id: Optional[str] = None
+    role: Optional[Role] = None
+
+class CasefileBatchResult(BaseModel):
+    """The outcome of one operation of a batch, at its position in the batch."""
+    index: int
+    op: str
+    casefile_id: Optional[str] = None
+    success: bool
+    error: Optional[str] = None
+
+# The stored fields needed to build a CasefileSummary.
+CASEFILE_SUMMARY_FIELDS = [name for name in CasefileSummary.model_fields if name != "id"]
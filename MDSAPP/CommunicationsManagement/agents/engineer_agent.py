@@ -58,7 +58,7 @@ class EngineerAgent(BaseAgent):
             yield Event(author=self.name, content="Error: casefile_id is required.")
             return
 
-        casefile = self._casefile_manager.load_casefile(casefile_id)
+        casefile = await self._casefile_manager.get_casefile(casefile_id)
         if not casefile:
             yield Event(author=self.name, content=f"Error: Casefile with ID '{casefile_id}' not found.")
             return
@@ -52,7 +52,7 @@ class HQOrchestratorAgent(BaseAgent):
             yield Event(author=self.name, content=genai_types.Content(parts=[genai_types.Part(text="Error: No casefile_id found in session state.")]))
             return
 
-        casefile = self._casefile_manager.load_casefile(casefile_id)
+        casefile = await self._casefile_manager.get_casefile(casefile_id)
         if not casefile:
             yield Event(author=self.name, content=genai_types.Content(parts=[genai_types.Part(text=f"Error: Casefile {casefile_id} not found.")]))
             return
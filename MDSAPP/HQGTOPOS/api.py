@@ -22,7 +22,7 @@ async def run_hq_orchestrator(
     logger.info(f"Received request to run HQ flow for casefile: {casefile_id}")
     
     # Check if the casefile exists
-    casefile = await casefile_manager.load_casefile(casefile_id)
+    casefile = await casefile_manager.get_casefile(casefile_id)
     if not casefile:
         raise HTTPException(status_code=404, detail=f"Casefile with ID '{casefile_id}' not found.")
 
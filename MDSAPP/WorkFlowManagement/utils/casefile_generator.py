@@ -3,7 +3,7 @@ from typing import Dict, Any, List
 
 from MDSAPP.CasefileManagement.manager import CasefileManager
 from MDSAPP.core.managers.database_manager import DatabaseManager
-from MDSAPP.CasefileManagement.models.casefile import CasefileType, Casefile # Added Casefile
+from MDSAPP.CasefileManagement.models.casefile import CasefileType, Casefile, SubCasefileSpec
 from MDSAPP.core.models.mission import Mission # New import
 from MDSAPP.core.models.stix_inspired_models import Campaign # Add this import
 
@@ -85,30 +85,29 @@ async def create_real_estate_casefile_with_data(casefile_manager: CasefileManage
     main_cf_data = data["main_casefile"]
 
     print(f"Creating main casefile: {main_cf_data['name']}")
-    main_casefile = await casefile_manager.create_casefile(
+    main_casefile_id = await casefile_manager.create_casefile(
         name=main_cf_data["name"],
         description=main_cf_data["description"],
-        user_id=user_id
+        user_id=user_id,
+        campaign=_mission_to_campaign(main_cf_data["mission"]),
     )
-    # Update casefile_type and mission
-    updates = {"casefile_type": main_cf_data["casefile_type"], "campaign": _mission_to_campaign(main_cf_data["mission"])}
-    await casefile_manager.update_casefile(main_casefile.id, user_id, updates)
 
-    for sub_cf_data in data["sub_casefiles_data"]:
-        print(f"Creating sub-casefile: {sub_cf_data['name']} under {main_casefile.name}")
-        sub_casefile = await casefile_manager.create_casefile(
+    # All sub-casefiles, with their type and mission, are created in one
+    # transaction that writes the main casefile once.
+    specs = [
+        SubCasefileSpec(
             name=sub_cf_data["name"],
             description=sub_cf_data["description"],
-            parent_id=main_casefile.id,
-            user_id=user_id
+            casefile_type=sub_cf_data["casefile_type"],
+            campaign=_mission_to_campaign(sub_cf_data["mission"]),
         )
-        # Update casefile_type and mission for sub-casefile
-        updates = {"casefile_type": sub_cf_data["casefile_type"], "campaign": _mission_to_campaign(sub_cf_data["mission"])}
-        await casefile_manager.update_casefile(sub_casefile.id, user_id, updates)
+        for sub_cf_data in data["sub_casefiles_data"]
+    ]
+    print(f"Creating {len(specs)} sub-casefiles under {main_cf_data['name']}")
+    await casefile_manager.create_sub_casefiles(main_casefile_id, specs, user_id)
 
-    print(f"Successfully created main casefile '{main_casefile.name}' and its sub-casefiles.")
-    main_casefile = await casefile_manager.load_casefile(main_casefile.id)
-    return main_casefile
+    print(f"Successfully created main casefile '{main_cf_data['name']}' and its sub-casefiles.")
+    return await casefile_manager.db_manager.load_casefile(main_casefile_id)
 
 # Example usage (for testing purposes, not part of the main agent flow)
 if __name__ == "__main__":
@@ -128,8 +127,10 @@ if __name__ == "__main__":
         for cf in all_casefiles:
             print(f"- {cf.name} (ID: {cf.id}, Type: {cf.casefile_type.value})")
             if cf.sub_casefile_ids:
+                # Fetch all children of this casefile in one batched read.
+                subtree = await casefile_manager.load_subtree(cf.id, depth=1)
                 for sub_cf_id in cf.sub_casefile_ids:
-                    sub_cf = await casefile_manager.load_casefile(sub_cf_id)
+                    sub_cf = subtree.get(sub_cf_id)
                     if sub_cf:
                         print(f"  - Sub: {sub_cf.name} (ID: {sub_cf.id}, Type: {sub_cf.casefile_type.value})")
 
@@ -5,7 +5,7 @@ import asyncio
 import os
 
 from MDSAPP.celery import app
-from MDSAPP.core.dependencies import get_hq_orchestrator, get_session_service
+from MDSAPP.core.dependencies import get_casefile_manager, get_database_manager, get_hq_orchestrator, get_session_service
 from MDSAPP.core.managers.pubsub_manager import PubSubManager
 from google.adk.agents.invocation_context import InvocationContext
 from google.adk.events import Event
@@ -86,4 +86,27 @@ def run_orchestration_task(self, casefile_id: str):
             TASK_STATUS_TOPIC,
             {"task_id": task_id, "casefile_id": casefile_id, "status": "FAILURE", "error": str(e)}
         ))
-        raise
\ No newline at end of file
+        raise
+
+
+@app.task(name="mds.archive_cold_casefiles")
+def archive_cold_casefiles_task(older_than_days: int = None):
+    """
+    Periodic maintenance: moves casefiles untouched for MDS_ARCHIVE_AFTER_DAYS
+    days to the cold store (see DatabaseManager.archive_cold_casefiles).
+    """
+    db_manager = get_database_manager()
+    archived = asyncio.run(db_manager.archive_cold_casefiles(older_than_days))
+    logger.info(f"[Celery Task] Archived {archived} cold casefiles.")
+    return {'status': 'SUCCESS', 'archived': archived}
+
+
+@app.task(name="mds.rebuild_casefile_indexes")
+def rebuild_casefile_indexes_task():
+    """
+    One-off maintenance after an upgrade: backfills the derived casefile
+    indexes (see CasefileManager.rebuild_indexes).
+    """
+    indexed = asyncio.run(get_casefile_manager().rebuild_indexes())
+    logger.info(f"[Celery Task] Casefile indexes rebuilt: {indexed}.")
+    return {'status': 'SUCCESS', 'indexed': indexed}
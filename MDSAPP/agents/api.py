@@ -24,7 +24,7 @@ async def trigger_orchestrator(
     logger.info(f"API call received: Triggering HQOrchestrator for casefile_id: {casefile_id}")
     
     # Check if the casefile exists
-    casefile = await casefile_manager.load_casefile(casefile_id)
+    casefile = await casefile_manager.get_casefile(casefile_id)
     if not casefile:
         raise HTTPException(status_code=404, detail=f"Casefile with ID '{casefile_id}' not found.")
 
@@ -10,7 +10,6 @@ from google.adk.agents import BaseAgent, LlmAgent
 from google.adk.agents.invocation_context import InvocationContext
 from google.adk.events import Event
 
-from MDSAPP.CasefileManagement.models.casefile import Casefile
 
 from MDSAPP.core.managers.prompt_manager import PromptManager
 from MDSAPP.CasefileManagement.manager import CasefileManager
@@ -86,9 +85,7 @@ class ChatAgent(BaseAgent):
         # 2. Load the casefile to get context for the dynamic prompt.
         casefile = None
         if casefile_id:
-            casefile_json = await self._casefile_manager.load_casefile(casefile_id)
-            if casefile_json:
-                casefile = Casefile.model_validate_json(casefile_json)
+            casefile = await self._casefile_manager.get_casefile(casefile_id)
 
         # 3. Render the dynamic system instruction for the LlmAgent.
         await self._prompt_manager.load_prompts_from_db()
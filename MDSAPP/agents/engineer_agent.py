@@ -107,7 +107,7 @@ class EngineerAgent(BaseAgent):
         return prompt_config.system_prompt.format(query=query)
 
     async def _prepare_workflow_engineering_prompt(self, casefile_id: str) -> str | None:
-        casefile = await self._casefile_manager.load_casefile(casefile_id)
+        casefile = await self._casefile_manager.get_casefile(casefile_id)
         if not casefile:
             logger.error(f"Casefile with ID '{casefile_id}' not found.")
             return None
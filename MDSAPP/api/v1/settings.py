@@ -1,11 +1,13 @@
 # MDSAPP/api/v1/settings.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi.responses import PlainTextResponse
+from typing import List, Dict, Optional, Union
 
 from MDSAPP.core.managers.database_manager import DatabaseManager
 from MDSAPP.core.models.prompts import Prompt
-from MDSAPP.core.dependencies import get_database_manager
+from MDSAPP.CasefileManagement.manager import CasefileManager
+from MDSAPP.core.dependencies import get_casefile_manager, get_database_manager
 
 router = APIRouter()
 
@@ -58,6 +60,77 @@ async def delete_prompt(prompt_id: str, db_manager: DatabaseManager = Depends(ge
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.get("/settings/database/executor", response_model=Dict[str, int])
+async def get_database_executor_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the usage counters of the storage thread pool.
+    """
+    return db_manager.executor_stats()
+
+@router.get("/settings/database/write-behind", response_model=Dict[str, int])
+async def get_database_write_behind_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the counters of the casefile write-behind buffer (empty when disabled).
+    """
+    return db_manager.write_behind_stats()
+
+@router.get("/settings/database/cache", response_model=Dict[str, int])
+async def get_database_cache_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the hit/miss/eviction counters of the casefile read-through cache (empty when disabled).
+    """
+    return db_manager.casefile_cache_stats()
+
+@router.get("/settings/database/shared-cache", response_model=Dict[str, int])
+async def get_database_shared_cache_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the hit/miss counters of the shared Redis cache (empty when disabled).
+    """
+    return db_manager.shared_cache_stats()
+
+@router.get("/settings/database/change-feed", response_model=Dict[str, int])
+async def get_database_change_feed_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get whether the change feed that invalidates caches across replicas is running.
+    """
+    return db_manager.change_feed_stats()
+
+@router.get("/settings/database/compression", response_model=Dict[str, float])
+async def get_database_compression_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the compression ratio and extra chunk reads of stored casefiles.
+    """
+    return db_manager.compression_stats()
+
+@router.get("/settings/database/archive", response_model=Dict[str, Union[int, str]])
+async def get_database_archive_stats(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the cold store in use and the casefiles archived and rehydrated by this process.
+    """
+    return db_manager.archive_stats()
+
+@router.post("/settings/database/archive", response_model=Dict[str, int])
+async def archive_cold_casefiles(older_than_days: Optional[int] = None, db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Archive the casefiles not modified for `older_than_days` days (MDS_ARCHIVE_AFTER_DAYS by default).
+    """
+    return {"archived": await db_manager.archive_cold_casefiles(older_than_days)}
+
+@router.post("/settings/database/reindex", response_model=Dict[str, int])
+async def rebuild_casefile_indexes(casefile_manager: CasefileManager = Depends(get_casefile_manager)):
+    """
+    Backfill the hierarchy, ACL membership and status indexes of casefiles stored before they existed.
+    """
+    return await casefile_manager.rebuild_indexes()
+
+@router.get("/settings/database/metrics", response_class=PlainTextResponse)
+async def get_database_metrics(db_manager: DatabaseManager = Depends(get_database_manager)):
+    """
+    Get the storage metrics (latency histograms, document counts and sizes per
+    collection and operation) and the stats above in the Prometheus text format.
+    """
+    return PlainTextResponse(db_manager.metrics_text(), media_type="text/plain; version=0.0.4")
+
 # Placeholder for settings endpoints
 @router.get("/settings/config")
 async def get_settings():
@@ -17,7 +17,14 @@ app.conf.update(
     result_backend=REDIS_URL,
     task_track_started=True,
     # Explicitly name the modules to import
-    imports=("MDSAPP.WorkFlowManagement.workers.workflow_tasks",)
+    imports=("MDSAPP.WorkFlowManagement.workers.workflow_tasks",),
+    # Run by `celery beat`: daily archival of cold casefiles.
+    beat_schedule={
+        "archive-cold-casefiles": {
+            "task": "mds.archive_cold_casefiles",
+            "schedule": 24 * 60 * 60,
+        },
+    },
 )
 
 if __name__ == "__main__":
@@ -2,58 +2,270 @@
 
 import logging
 import asyncio
-import os
 import datetime
-from typing import List, Any
+import functools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Optional, Dict, Union, AsyncIterator, Callable, Iterable, Tuple
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from pydantic import TypeAdapter
 from sentence_transformers import SentenceTransformer
 
 # Import Casefile from the new MDSAPP location
-from MDSAPP.CasefileManagement.models.casefile import Casefile
+from MDSAPP.CasefileManagement.models.casefile import Casefile, CasefileSummary, Event
 from MDSAPP.core.models.prompts import Prompt
 from MDSAPP.core.models.conversation_session import ConversationSession, Message
+from MDSAPP.core.storage.base import (
+    StorageBackend, StorageTransaction, FieldPath, Filter, DELETE_FIELD, SERVER_TIMESTAMP, WriteConflict, apply_updates,
+)
+from MDSAPP.core.storage.cache import LRUCache
+from MDSAPP.core.storage.cold_store import create_cold_store
+from MDSAPP.core.storage.compression import (
+    FieldCompressor, MissingChunksError, DEFAULT_COMPRESS_MIN_BYTES, DEFAULT_CHUNK_BYTES, is_encoded,
+)
+from MDSAPP.core.storage.factory import create_storage_backend
+from MDSAPP.core.storage.instrumented import InstrumentedBackend
+from MDSAPP.core.storage.metrics import MetricsSink, NullMetricsSink, PrometheusTextExporter, create_metrics_sink
+from MDSAPP.core.storage.shared_cache import DEFAULT_SHARED_CACHE_TTL_SECONDS, create_shared_cache
+from MDSAPP.core.storage.write_behind import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_DB_MAX_WORKERS = 16
+DEFAULT_RECENT_EVENTS_LIMIT = 50
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_CASEFILE_CACHE_SIZE = 1000
+DEFAULT_CASEFILE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CASEFILE_CACHE_TTL_SECONDS = 30
+DEFAULT_CHUNK_BATCH_SIZE = 500
+DEFAULT_CHUNK_WRITE_PARALLELISM = 4
+DEFAULT_MAX_WRITE_ATTEMPTS = 5
+# Base delay of the jittered exponential backoff between conflicting writes.
+WRITE_RETRY_BASE_DELAY_SECONDS = 0.01
+# Validates a page of events in a single call.
+EVENT_LIST_ADAPTER = TypeAdapter(List[Event])
+# Attempts to read a chunked casefile whose chunks are being rewritten concurrently.
+CHUNK_READ_ATTEMPTS = 3
+# Shared-cache key of the full prompt set.
+ALL_PROMPTS_KEY = "all"
+# Casefile fields that can grow large and are never filtered or projected on,
+# so they may be stored compressed.
+COMPRESSIBLE_CASEFILE_FIELDS = (
+    "workflows",
+    "engineered_workflows",
+    "execution_results",
+    "research_results",
+    "file_references",
+    "event_log",
+)
+# Casefile fields moved to the cold store when a casefile is archived; the
+# stub left behind keeps everything else, including the stored counts.
+ARCHIVED_CASEFILE_FIELDS = COMPRESSIBLE_CASEFILE_FIELDS + ("embedding",)
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+# Fraction of storage calls whose document sizes are measured.
+DEFAULT_METRICS_SIZE_SAMPLE_RATE = 0.1
+OPERATION_SECONDS = "mds_db_operation_seconds"
+
+def _instrumented(collection: str):
+    """
+    Records the end-to-end latency of a DatabaseManager operation, cache
+    hits included, next to the storage calls it makes.
+    """
+    def decorator(fn):
+        labels = {"collection": collection, "operation": fn.__name__}
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(self, *args, **kwargs)
+            finally:
+                self.metrics.observe(OPERATION_SECONDS, time.perf_counter() - started, labels)
+        return wrapper
+    return decorator
+
+def _version_stamp(modified_at: Any) -> Any:
+    """Compares stored timestamps equally whether read from storage or from the shared cache."""
+    return modified_at.isoformat() if isinstance(modified_at, datetime.datetime) else modified_at
+
+class DatabaseExecutor:
+    """
+    A bounded thread pool dedicated to storage calls, so blocking backend I/O
+    never competes with the default asyncio executor. Keeps counters on pool
+    usage that can be used to size it.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mds-db")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs a blocking callable on the pool and awaits its result."""
+        with self._lock:
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        def _call():
+            with self._lock:
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, _call)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns a snapshot of the pool usage counters."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": max(self._in_flight - self._active, 0),
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "completed": self._completed,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+class _RecordingTransaction(StorageTransaction):
+    """Delegates to a backend transaction and records which documents it writes."""
+    def __init__(self, transaction: StorageTransaction):
+        self._transaction = transaction
+        self.written = set()
+
+    def get(self, collection: str, doc_id: str):
+        return self._transaction.get(collection, doc_id)
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        self.written.add((collection, doc_id))
+        self._transaction.set(collection, doc_id, data)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any]):
+        self.written.add((collection, doc_id))
+        self._transaction.update(collection, doc_id, updates)
+
+    def delete(self, collection: str, doc_id: str):
+        self.written.add((collection, doc_id))
+        self._transaction.delete(collection, doc_id)
+
 class DatabaseManager:
     """
-    Manages the connection to the Firestore database, including all
-    CRUD (Create, Read, Update, Delete) operations for casefiles and prompts.
+    Manages the connection to the configured storage backend (Firestore by
+    default, or the embedded SQLite engine), including all CRUD (Create,
+    Read, Update, Delete) operations for casefiles and prompts.
     """
-    def __init__(self):
+    def __init__(self, backend: Optional[StorageBackend] = None, metrics: Optional[MetricsSink] = None):
         print("DatabaseManager __init__ called")
-        self._db = None
+        # Latency, document counts and sizes of every storage call, by
+        # collection and operation; MDS_STORAGE_METRICS=0 turns them off.
+        self.metrics = metrics or create_metrics_sink()
+        self.backend = backend or create_storage_backend()
+        if not isinstance(self.metrics, NullMetricsSink):
+            self.backend = InstrumentedBackend(
+                self.backend,
+                self.metrics,
+                size_sample_rate=float(os.getenv("MDS_STORAGE_METRICS_SIZE_SAMPLE_RATE", DEFAULT_METRICS_SIZE_SAMPLE_RATE)),
+            )
+        self.executor = DatabaseExecutor(max_workers=int(os.getenv("MDS_DB_MAX_WORKERS", DEFAULT_DB_MAX_WORKERS)))
         self.embedding_model = None
         self.casefiles_collection_name = "casefiles"
         self.documents_collection_name = "document_chunks"
         self.prompts_collection_name = "prompts"
+        self.sessions_collection_name = "conversation_sessions"
+        self.events_subcollection_name = "events"
+        self.messages_subcollection_name = "messages"
+        # Bulk ingest of document chunks: writes per batch and batches in flight.
+        self.chunk_batch_size = int(os.getenv("MDS_CHUNK_BATCH_SIZE", DEFAULT_CHUNK_BATCH_SIZE))
+        self.chunk_write_parallelism = int(os.getenv("MDS_CHUNK_WRITE_PARALLELISM", DEFAULT_CHUNK_WRITE_PARALLELISM))
+        self.chunks_subcollection_name = "chunks"
+        # Number of most recent events kept inline on the casefile document.
+        self.recent_events_limit = int(os.getenv("MDS_RECENT_EVENTS_LIMIT", DEFAULT_RECENT_EVENTS_LIMIT))
+        # Attempts of an optimistic read-modify-write before WriteConflict is raised.
+        self.max_write_attempts = int(os.getenv("MDS_CASEFILE_MAX_WRITE_ATTEMPTS", DEFAULT_MAX_WRITE_ATTEMPTS))
+        self._write_conflicts = 0
         self._initialize_embedding_model()
 
-        # Add a file handler for debug logs specifically for this logger
-        debug_file_handler = logging.FileHandler('debug_conversion.log')
-        debug_file_handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        debug_file_handler.setFormatter(formatter)
-        logger.addHandler(debug_file_handler)
+        # Opt-in write-behind for casefiles: repeated saves of the same casefile
+        # within the window are merged into a single write.
+        write_behind_ms = int(os.getenv("MDS_CASEFILE_WRITE_BEHIND_MS", "0"))
+        self.casefile_write_buffer: Optional[WriteBehindBuffer] = None
+        if write_behind_ms > 0:
+            self.casefile_write_buffer = WriteBehindBuffer(self._write_casefile_data, write_behind_ms / 1000)
+            logger.info(f"Casefile write-behind enabled with a {write_behind_ms} ms window.")
 
-    def _connect(self):
-        try:
-            if not firebase_admin._apps:
-                project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
-                if not project_id:
-                    raise ValueError("GOOGLE_CLOUD_PROJECT environment variable not set.")
-                cred = credentials.ApplicationDefault()
-                firebase_admin.initialize_app(cred, {
-                    'projectId': project_id,
-                })
-            self._db = firestore.client()
-            logger.info("Successfully connected to Firestore.")
-        except Exception as e:
-            logger.error(f"Error connecting to Firestore: {e}", exc_info=True)
-            raise
+        # Large casefile fields are stored compressed, and split into chunk
+        # documents when still too large; MDS_CASEFILE_COMPRESS_MIN_BYTES=0 disables it.
+        self.casefile_compressor = FieldCompressor(
+            COMPRESSIBLE_CASEFILE_FIELDS,
+            min_bytes=int(os.getenv("MDS_CASEFILE_COMPRESS_MIN_BYTES", DEFAULT_COMPRESS_MIN_BYTES)),
+            chunk_bytes=int(os.getenv("MDS_CASEFILE_CHUNK_BYTES", DEFAULT_CHUNK_BYTES)),
+        )
+
+        # Read-through cache of loaded casefiles; MDS_CASEFILE_CACHE_SIZE=0 disables it.
+        cache_size = int(os.getenv("MDS_CASEFILE_CACHE_SIZE", DEFAULT_CASEFILE_CACHE_SIZE))
+        self.casefile_cache: Optional[LRUCache] = None
+        if cache_size > 0:
+            self.casefile_cache = LRUCache(
+                max_entries=cache_size,
+                max_bytes=int(os.getenv("MDS_CASEFILE_CACHE_MAX_BYTES", DEFAULT_CASEFILE_CACHE_MAX_BYTES)),
+                ttl_seconds=float(os.getenv("MDS_CASEFILE_CACHE_TTL_SECONDS", DEFAULT_CASEFILE_CACHE_TTL_SECONDS)),
+            )
+
+        # Optional second-level cache in Redis, shared with the other API
+        # processes and the Celery workers (MDS_SHARED_CACHE_URL).
+        self.shared_cache = create_shared_cache(
+            os.getenv("MDS_SHARED_CACHE_URL"),
+            ttl_seconds=float(os.getenv("MDS_SHARED_CACHE_TTL_SECONDS", DEFAULT_SHARED_CACHE_TTL_SECONDS)),
+        )
+
+        # Opt-in change feed (MDS_CHANGE_FEED=1): writes by other replicas
+        # invalidate this process's caches; started by `start_change_feed`.
+        self.change_feed_enabled = os.getenv("MDS_CHANGE_FEED", "0") == "1"
+        if self.change_feed_enabled:
+            # Every process writing the database must log its changes, not only the watching ones.
+            self.backend.log_changes([self.casefiles_collection_name, self.prompts_collection_name])
+        self._change_listeners: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._stop_change_feed: Optional[Callable[[], None]] = None
+        self._changes_received = 0
+
+        # Archival tier: the large fields of casefiles untouched for
+        # MDS_ARCHIVE_AFTER_DAYS move to a compressed cold store.
+        self.cold_store = create_cold_store(self.backend)
+        self.archive_after_days = int(os.getenv("MDS_ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS))
+        self._archive_lock = threading.Lock()
+        self._archived = 0
+        self._rehydrated = 0
+
+        self.metrics_exporter = PrometheusTextExporter(self.metrics)
+        for subsystem, stats in [
+            ("db_executor", self.executor_stats),
+            ("casefile_write_behind", self.write_behind_stats),
+            ("casefile_cache", self.casefile_cache_stats),
+            ("shared_cache", self.shared_cache_stats),
+            ("casefile_compression", self.compression_stats),
+            ("casefile_writes", lambda: {"conflicts": self.write_conflict_count()}),
+            ("change_feed", self.change_feed_stats),
+            ("casefile_archive", self.archive_stats),
+        ]:
+            self.metrics_exporter.add_collector(subsystem, stats)
 
     def _initialize_embedding_model(self):
         try:
@@ -65,136 +277,1030 @@ class DatabaseManager:
 
     @property
     def db(self):
-        if not self._db:
-            self._connect()
-        return self._db
-
-    def _convert_datetimes_to_iso(self, data: Any) -> Any:
-        """
-        Recursively converts datetime objects within a dictionary or list to ISO 8601 strings.
-        """
-        logger.debug(f"_convert_datetimes_to_iso received type: {type(data)}")
-        if isinstance(data, dict):
-            logger.debug("  - Is dict")
-            return {k: self._convert_datetimes_to_iso(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            logger.debug("  - Is list")
-            return [self._convert_datetimes_to_iso(v) for v in data]
-        elif isinstance(data, (datetime.datetime, DatetimeWithNanoseconds)):
-            logger.debug(f"  - Is datetime or DatetimeWithNanoseconds: {data}")
-            return data.isoformat()
-        else:
-            logger.debug("  - Is other type")
-            return data
+        """The native Firestore client, or None when running on a local backend."""
+        return self.backend.client
+
+    # Stored documents are validated as read: pydantic accepts stored timestamps
+    # for datetime fields, and IsoTimestamp fields convert them to ISO strings,
+    # so the document is not walked in Python before validation.
+    def _casefile_from_document(self, doc_id: str, casefile_data: dict) -> Casefile:
+        return Casefile.model_validate({**casefile_data, "id": doc_id})  # The ID is the document ID
+
+    def _summary_from_document(self, doc_id: str, casefile_data: dict) -> CasefileSummary:
+        return CasefileSummary.model_validate({**casefile_data, "id": doc_id})
+
+    @_instrumented("*")  # may span collections
+    async def run_transaction(self, fn):
+        """Runs `fn(transaction)` atomically on the storage backend and returns its result."""
+        # Transactions read straight from the backend, so buffered writes must land first.
+        await self.flush()
+        # Every casefile the transaction writes is dropped from the cache.
+        written = set()
+
+        def _run_recorded(transaction):
+            recorder = _RecordingTransaction(transaction)
+            result = fn(recorder)
+            # Reassigned on every attempt, so a retried transaction reports only its final writes.
+            written.clear()
+            written.update(recorder.written)
+            return result
+
+        try:
+            return await self.executor.run(self.backend.run_transaction, _run_recorded)
+        finally:
+            written_casefile_ids = [doc_id for collection, doc_id in written if collection == self.casefiles_collection_name]
+            if written_casefile_ids:
+                await self._invalidate_casefiles(written_casefile_ids)
+
+    def _invalidate_cached_casefile(self, casefile_id: str):
+        if self.casefile_cache:
+            self.casefile_cache.invalidate(casefile_id)
+
+    async def _invalidate_casefiles(self, casefile_ids: List[str]):
+        """
+        Drops casefiles from the local and the shared cache. Call it once the
+        write has finished (or failed): a load that ran during the write may
+        have cached the old version, and the write itself does not always
+        change the `modified_at` that revalidation compares.
+        """
+        for casefile_id in casefile_ids:
+            self._invalidate_cached_casefile(casefile_id)
+        await self._invalidate_shared(self.casefiles_collection_name, casefile_ids)
+
+    async def _invalidate_shared(self, namespace: str, keys: List[str]):
+        """
+        Drops keys from the shared cache. Must run after the stored documents
+        changed, so no other process can cache the old version again.
+        """
+        if self.shared_cache:
+            await self.executor.run(lambda: [self.shared_cache.invalidate(namespace, key) for key in keys])
+
+    def add_change_listener(self, collection: str, listener: Callable[[Optional[str]], None]):
+        """
+        Registers `listener(doc_id)` for changes to `collection` reported by the
+        change feed. It runs on the event loop; a doc_id of None means any
+        document of the collection may have changed.
+        """
+        self._change_listeners.setdefault(collection, []).append(listener)
+
+    async def start_change_feed(self):
+        """
+        Subscribes to the change feed of the storage backend (a Firestore
+        listener on the change markers writers add, or polling of the SQLite
+        change log) for casefiles and prompts, so writes from other replicas
+        invalidate this process's caches. Does nothing unless enabled, or when already started.
+        """
+        if not self.change_feed_enabled or self._stop_change_feed is not None:
+            return
+        loop = asyncio.get_running_loop()
 
+        def _on_change(collection: str, doc_id: Optional[str]):
+            try:
+                loop.call_soon_threadsafe(self._dispatch_change, collection, doc_id)
+            except RuntimeError:
+                pass  # The event loop is closed; the process is shutting down.
+
+        self._stop_change_feed = await self.executor.run(
+            self.backend.watch, [self.casefiles_collection_name, self.prompts_collection_name], _on_change
+        )
+        logger.info(f"Change feed of {self.backend.name} started.")
+
+    def stop_change_feed(self):
+        if self._stop_change_feed is not None:
+            self._stop_change_feed()
+            self._stop_change_feed = None
+
+    def _dispatch_change(self, collection: str, doc_id: Optional[str]):
+        self._changes_received += 1
+        if collection == self.casefiles_collection_name and self.casefile_cache:
+            if doc_id is None:
+                self.casefile_cache.clear()
+            else:
+                self.casefile_cache.invalidate(doc_id)
+        for listener in self._change_listeners.get(collection, []):
+            try:
+                listener(doc_id)
+            except Exception as e:
+                logger.error(f"Error in change listener of '{collection}': {e}", exc_info=True)
+
+    def _cache_casefile(self, casefile: Casefile, casefile_data: dict, generation: int):
+        """Caches a freshly read casefile, versioned by the stored `modified_at`."""
+        size = len(json.dumps(casefile_data, default=str, separators=(",", ":")))
+        self.casefile_cache.put(casefile.id, casefile, _version_stamp(casefile_data.get("modified_at")), size, generation=generation)
+
+    async def start_write_behind(self):
+        """
+        Buffers casefile saves made on the running event loop, when
+        write-behind is enabled. Call it from the API server's lifespan only:
+        saves on other loops, such as those of Celery tasks, are written
+        directly, because a buffered save would be lost with its loop.
+        """
+        if self.casefile_write_buffer:
+            self.casefile_write_buffer.attach()
+
+    async def flush(self, casefile_id: Optional[str] = None):
+        """
+        Write barrier for the casefile write-behind buffer: returns once the
+        buffered save of `casefile_id` (or of every casefile) is durable.
+        A no-op when write-behind is disabled.
+        """
+        if self.casefile_write_buffer:
+            await self.casefile_write_buffer.flush(casefile_id)
+
+    def _chunks_collection(self, casefile_id: str) -> str:
+        return f"{self.casefiles_collection_name}/{casefile_id}/{self.chunks_subcollection_name}"
+
+    def _decode_casefile_data(self, casefile_id: str, casefile_data: dict) -> dict:
+        """Restores compressed fields, reading chunk documents in one batched call if needed."""
+        chunk_ids = self.casefile_compressor.chunk_ids(casefile_data)
+        chunks = self.backend.get_many(self._chunks_collection(casefile_id), chunk_ids) if chunk_ids else None
+        return self.casefile_compressor.decode(casefile_data, chunks)
+
+    def _read_casefile_data(self, casefile_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Reads and decodes a stored casefile; full reads go through the shared
+        cache when it is enabled. Blocking; runs on the storage pool.
+        """
+        shared_version = None
+        if fields is None and self.shared_cache:
+            casefile_data, shared_version = self.shared_cache.lookup(self.casefiles_collection_name, casefile_id)
+            if casefile_data is not None:
+                return casefile_data
+        versioned = self._read_versioned_casefile_data(casefile_id, fields)
+        if versioned is None:
+            return None
+        if fields is None and self.shared_cache:
+            self.shared_cache.fill(self.casefiles_collection_name, casefile_id, versioned[0], shared_version)
+        return versioned[0]
+
+    def _read_versioned_casefile_data(self, casefile_id: str, fields: Optional[List[str]] = None):
+        """
+        Returns (decoded data, version, stored data) of a casefile, or None.
+        A chunked casefile that is rewritten between reading the document and
+        its chunks is read again. A full read of an archived casefile
+        rehydrates it first. Blocking; runs on the storage pool.
+        """
+        for _ in range(CHUNK_READ_ATTEMPTS):
+            if fields is None:
+                versioned = self.backend.get_versioned(self.casefiles_collection_name, casefile_id)
+                if versioned is None:
+                    return None
+                stored_data, version = versioned
+                if "archived_at" in stored_data:
+                    self._rehydrate_casefile(casefile_id, stored_data, version)
+                    continue
+            else:
+                stored_data = self.backend.get(self.casefiles_collection_name, casefile_id, fields)
+                if stored_data is None:
+                    return None
+                version = None
+            try:
+                return self._decode_casefile_data(casefile_id, stored_data), version, stored_data
+            except MissingChunksError:
+                logger.info(f"Chunks of casefile '{casefile_id}' changed while reading; reading it again.")
+        raise MissingChunksError(f"Could not read a consistent version of casefile '{casefile_id}'.")
+
+    @staticmethod
+    def _cold_key(casefile_id: str, archived_at: Any) -> str:
+        """
+        Cold store key of one archival of a casefile. Every archival writes
+        its own copy, so cleaning up after one never removes another's.
+        """
+        return f"{casefile_id}@{_version_stamp(archived_at)}"
+
+    def _archive_casefile(self, casefile_id: str) -> bool:
+        """
+        Moves the archived fields of a casefile to the cold store and leaves a
+        stub marked with `archived_at`. The stub is only written if the
+        casefile did not change meanwhile. `modified_at` is kept, so cached
+        copies stay valid. Returns whether the casefile was archived.
+        Blocking; runs on the storage pool.
+        """
+        versioned = self.backend.get_versioned(self.casefiles_collection_name, casefile_id)
+        if versioned is None or "archived_at" in versioned[0]:
+            return False
+        stored_data, version = versioned
+        try:
+            casefile_data = self._decode_casefile_data(casefile_id, stored_data)
+        except MissingChunksError:
+            return False  # Being rewritten right now, so not cold after all.
+        archived_data = {field: casefile_data[field] for field in ARCHIVED_CASEFILE_FIELDS if field in casefile_data}
+        archived_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        cold_key = self._cold_key(casefile_id, archived_at)
+        # The cold copy is complete before the stub that points to it is written.
+        self.cold_store.put(cold_key, archived_data)
+        updates = {field: DELETE_FIELD for field in archived_data}
+        updates["archived_at"] = archived_at
+        try:
+            archived = self.backend.update(self.casefiles_collection_name, casefile_id, updates, version)
+        except WriteConflict:
+            archived = False
+        if not archived:
+            self.cold_store.delete(cold_key)
+            return False
+        self._delete_chunks(casefile_id, self.casefile_compressor.chunk_ids(stored_data))
+        with self._archive_lock:
+            self._archived += 1
+        logger.info(f"Casefile '{casefile_id}' archived to the {self.cold_store.name} cold store.")
+        return True
+
+    def _rehydrate_casefile(self, casefile_id: str, stored_data: dict, version: Any):
+        """
+        Restores the archived fields of a casefile stub from the cold store.
+        Losing the race to another rehydration (or any other write) is fine:
+        the caller reads the casefile again either way. Blocking.
+        """
+        cold_key = self._cold_key(casefile_id, stored_data["archived_at"])
+        archived_data = self.cold_store.get(cold_key)
+        if archived_data is None:
+            # Either a concurrent rehydration removed it, and the update below
+            # conflicts, or it is lost and the stub is all there is.
+            logger.warning(f"Archived data of casefile '{casefile_id}' not found; restoring the stub as is.")
+            archived_data = {}
+        encoded, chunks = self.casefile_compressor.encode(archived_data, uuid.uuid4().hex[:8])
+        updates = {**encoded, "archived_at": DELETE_FIELD}
+        self._write_chunks(casefile_id, chunks)
+        try:
+            restored = self.backend.update(self.casefiles_collection_name, casefile_id, updates, version)
+        except WriteConflict:
+            restored = False
+        if not restored:
+            self._delete_chunks(casefile_id, list(chunks))
+            return
+        self.cold_store.delete(cold_key)
+        with self._archive_lock:
+            self._rehydrated += 1
+        logger.info(f"Casefile '{casefile_id}' rehydrated from the {self.cold_store.name} cold store.")
+
+    def _decode_listed_casefiles(
+        self, docs: Iterable[Tuple[str, dict]], rehydrate: bool = False
+    ) -> List[Tuple[str, dict]]:
+        """
+        Decodes the full casefiles returned by a stream, query or multi-get;
+        one whose chunks were rewritten meanwhile is read again. Archived
+        casefiles stay stubs unless `rehydrate` is set. Blocking.
+        """
+        decoded_docs = []
+        for casefile_id, casefile_data in docs:
+            if rehydrate and "archived_at" in casefile_data:
+                casefile_data = self._read_casefile_data(casefile_id)
+            else:
+                try:
+                    casefile_data = self._decode_casefile_data(casefile_id, casefile_data)
+                except MissingChunksError:
+                    casefile_data = self._read_casefile_data(casefile_id)
+            if casefile_data is not None:
+                decoded_docs.append((casefile_id, casefile_data))
+        return decoded_docs
+
+    def _write_chunks(self, casefile_id: str, chunks: Dict[str, dict]):
+        chunks_collection = self._chunks_collection(casefile_id)
+        for chunk_id, chunk_data in chunks.items():
+            self.backend.set(chunks_collection, chunk_id, chunk_data)
+
+    def _delete_chunks(self, casefile_id: str, chunk_ids: List[str]):
+        chunks_collection = self._chunks_collection(casefile_id)
+        for chunk_id in chunk_ids:
+            self.backend.delete(chunks_collection, chunk_id)
+
+    def _set_casefile_data(self, casefile_id: str, casefile_data: dict):
+        """
+        Writes a full casefile with its large fields encoded. New chunks are
+        written before the document that references them, and the chunks of
+        the replaced version are only deleted afterwards, so readers never see
+        a document whose chunks are missing. Blocking; runs on the storage pool.
+        """
+        stored_data, chunks = self.casefile_compressor.encode(casefile_data, uuid.uuid4().hex[:8])
+        previous_chunk_ids = []
+        if any(is_encoded(value) for value in stored_data.values()):
+            # Only large casefiles can have chunks to clean up; small ones skip this read.
+            previous = self.backend.get(self.casefiles_collection_name, casefile_id, list(COMPRESSIBLE_CASEFILE_FIELDS))
+            previous_chunk_ids = self.casefile_compressor.chunk_ids(previous or {})
+        self._write_chunks(casefile_id, chunks)
+        self.backend.set(self.casefiles_collection_name, casefile_id, stored_data)
+        if self.shared_cache:
+            # Write-through, so e.g. a worker picking up this casefile next reads it from Redis.
+            self.shared_cache.store(self.casefiles_collection_name, casefile_id, casefile_data)
+        self._delete_chunks(casefile_id, [chunk_id for chunk_id in previous_chunk_ids if chunk_id not in chunks])
+
+    def _encode_casefile_updates(
+        self, casefile_data: dict, stored_data: dict, updates: Dict[FieldPath, Any], token: str
+    ) -> Tuple[Dict[FieldPath, Any], Dict[str, dict], List[str]]:
+        """
+        Rewrites patches of compressible fields into their encoded full value.
+        Compressed values cannot be patched in place (e.g. with ArrayUnion), so
+        the patch is applied to the decoded value first. Returns the updates to
+        write, the chunks to write with them, and the chunks they replace.
+        """
+        encoded_updates = dict(updates)
+        chunks = {}
+        replaced_chunk_ids = []
+        for field_path, value in updates.items():
+            if field_path not in COMPRESSIBLE_CASEFILE_FIELDS:
+                continue
+            was_encoded = is_encoded(stored_data.get(field_path))
+            if not was_encoded and not self.casefile_compressor.enabled:
+                continue
+            resolved = {field_path: casefile_data.get(field_path)}
+            apply_updates(resolved, {field_path: value})
+            if field_path not in resolved:
+                encoded = {}
+            else:
+                encoded, field_chunks = self.casefile_compressor.encode(resolved, token)
+                chunks.update(field_chunks)
+            if is_encoded(encoded.get(field_path)) or was_encoded:
+                encoded_updates[field_path] = encoded.get(field_path, value)
+            if was_encoded:
+                replaced_chunk_ids.extend(self.casefile_compressor.chunk_ids({field_path: stored_data[field_path]}))
+        return encoded_updates, chunks, replaced_chunk_ids
+
+    async def _write_casefile_data(self, casefile_id: str, casefile_data: dict):
+        await self.executor.run(self._set_casefile_data, casefile_id, casefile_data)
+        logger.info(f"Casefile '{casefile_id}' saved to {self.backend.name}.")
+
+    @_instrumented("casefiles")
     async def save_casefile(self, casefile: Casefile):
-        doc_ref = self.db.collection(self.casefiles_collection_name).document(casefile.id)
-        await asyncio.to_thread(doc_ref.set, casefile.model_dump(exclude_none=True))
-        logger.info(f"Casefile '{casefile.id}' saved to Firestore.")
-
-    async def load_casefile(self, casefile_id: str) -> Casefile | None:
-        doc_ref = self.db.collection(self.casefiles_collection_name).document(casefile_id)
-        doc = await asyncio.to_thread(doc_ref.get)
-        if doc.exists:
-            casefile_data = doc.to_dict()
-            casefile_data = self._convert_datetimes_to_iso(casefile_data) # Convert datetimes to ISO strings
-            casefile_data['id'] = doc.id  # Ensure the ID is the document ID
-            return Casefile(**casefile_data)
+        if casefile.archived_at is not None:
+            # Saving a stub from a listing would drop the archived fields for good.
+            raise ValueError(f"Casefile '{casefile.id}' is an archived stub; load it with load_casefile before saving.")
+        casefile_data = casefile.model_dump(exclude_none=True)
+        if self.casefile_write_buffer and self.casefile_write_buffer.put(casefile.id, casefile_data):
+            # Loads serve the buffered snapshot until it is written.
+            self._invalidate_cached_casefile(casefile.id)
+            logger.debug(f"Casefile '{casefile.id}' buffered for write-behind.")
+            return
+        try:
+            await self._write_casefile_data(casefile.id, casefile_data)
+        finally:
+            # The shared cache is written through by the save itself.
+            self._invalidate_cached_casefile(casefile.id)
+
+    @_instrumented("casefiles")
+    async def update_casefile_fields(self, casefile_id: str, updates: Dict[FieldPath, Any]) -> bool:
+        """
+        Patches only the given field paths of a stored casefile instead of
+        rewriting the whole document. Values must be serialized data, or the
+        storage sentinels ArrayUnion / DELETE_FIELD / SERVER_TIMESTAMP.
+        Returns False if the casefile does not exist.
+        """
+        if any(field_path in COMPRESSIBLE_CASEFILE_FIELDS for field_path in updates):
+            # Possibly compressed fields are patched through a read-modify-write.
+            return await self.modify_casefile(casefile_id, lambda casefile: updates) is not None
+        # A buffered full write would overwrite the patch, so it has to land first.
+        await self.flush(casefile_id)
+        try:
+            updated = await self.executor.run(self.backend.update, self.casefiles_collection_name, casefile_id, updates)
+        finally:
+            await self._invalidate_casefiles([casefile_id])
+        if updated:
+            logger.info(f"Casefile '{casefile_id}' patched in {self.backend.name}: {[str(path) for path in updates]}.")
+        else:
+            logger.warning(f"Attempted to patch, but casefile '{casefile_id}' not found.")
+        return updated
+
+    @_instrumented("casefiles")
+    async def modify_casefile(
+        self,
+        casefile_id: str,
+        mutate: Callable[[Casefile], Optional[Dict[FieldPath, Any]]],
+    ) -> Optional[Casefile]:
+        """
+        Optimistic read-modify-write of a casefile without holding locks.
+        `mutate` receives the current casefile, may change it in place, and
+        returns the field updates to write (or nothing to skip the write).
+        The write is conditional on the document being unchanged since the
+        read; on a conflict the casefile is re-read and `mutate` runs again,
+        up to `max_write_attempts` times before WriteConflict is raised.
+        Exceptions raised by `mutate` (e.g. PermissionError) abort the write.
+        Returns the modified casefile, or None if it does not exist.
+        """
+        await self.flush(casefile_id)
+        for attempt in range(self.max_write_attempts):
+            versioned = await self.executor.run(self._read_versioned_casefile_data, casefile_id)
+            if versioned is None:
+                return None
+            casefile_data, version, stored_data = versioned
+            casefile = self._casefile_from_document(casefile_id, casefile_data)
+            updates = mutate(casefile)
+            if not updates:
+                return casefile
+            updates, chunks, replaced_chunk_ids = self._encode_casefile_updates(
+                casefile_data, stored_data, updates, uuid.uuid4().hex[:8]
+            )
+            try:
+                if chunks:
+                    await self.executor.run(self._write_chunks, casefile_id, chunks)
+                try:
+                    updated = await self.executor.run(
+                        self.backend.update, self.casefiles_collection_name, casefile_id, updates, version
+                    )
+                finally:
+                    await self._invalidate_casefiles([casefile_id])
+                if not updated:
+                    if chunks:
+                        await self.executor.run(self._delete_chunks, casefile_id, list(chunks))
+                    return None
+                if replaced_chunk_ids:
+                    await self.executor.run(self._delete_chunks, casefile_id, replaced_chunk_ids)
+                return casefile
+            except WriteConflict:
+                if chunks:
+                    # Nothing references the chunks of the rejected write.
+                    await self.executor.run(self._delete_chunks, casefile_id, list(chunks))
+                self._write_conflicts += 1
+                logger.info(f"Write conflict on casefile '{casefile_id}' (attempt {attempt + 1}); retrying.")
+                await asyncio.sleep(random.uniform(0, WRITE_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+        raise WriteConflict(
+            f"Casefile '{casefile_id}' kept changing; gave up after {self.max_write_attempts} attempts."
+        )
+
+    @_instrumented("casefiles")
+    async def load_casefiles_versioned(self, casefile_ids: List[str]) -> Dict[str, Tuple[Casefile, Any]]:
+        """
+        Reads several casefiles in one batched read for a conditional bulk
+        write. Maps each casefile ID to (casefile, version token); pass the
+        token to `commit_casefiles`. IDs that do not exist are left out.
+        Caches are bypassed, as the tokens must match the stored documents.
+        """
+        # A buffered full write would land after, and overwrite, the bulk write.
+        await self.flush()
+
+        def _read_many():
+            versioned = {}
+            docs = self.backend.get_many_versioned(self.casefiles_collection_name, casefile_ids)
+            for casefile_id, (stored_data, version) in docs.items():
+                if "archived_at" in stored_data:
+                    versioned[casefile_id] = self._read_versioned_casefile_data(casefile_id)
+                    continue
+                try:
+                    versioned[casefile_id] = self._decode_casefile_data(casefile_id, stored_data), version, stored_data
+                except MissingChunksError:
+                    versioned[casefile_id] = self._read_versioned_casefile_data(casefile_id)
+            return versioned
+
+        return {
+            casefile_id: (self._casefile_from_document(casefile_id, read[0]), read)
+            for casefile_id, read in (await self.executor.run(_read_many)).items() if read is not None
+        }
+
+    def _commit_casefile_writes(self, writes: List[Tuple[str, Optional[Dict[FieldPath, Any]], Any]]):
+        """
+        Encodes and commits the writes of `commit_casefiles`, then removes the
+        chunks and events they leave unreferenced. Blocking; runs on the
+        storage pool.
+        """
+        token = uuid.uuid4().hex[:8]
+        conditional_writes = []
+        new_chunks: Dict[str, Dict[str, dict]] = {}
+        unreferenced_chunk_ids: Dict[str, List[str]] = {}
+        deleted_events = []
+        for casefile_id, data, read in writes:
+            if read is None:
+                data, chunks = self.casefile_compressor.encode(data, token)
+                conditional_writes.append((casefile_id, data, None))
+                new_chunks[casefile_id] = chunks
+                continue
+            _, version, stored_data = read
+            if data is None:
+                unreferenced_chunk_ids[casefile_id] = self.casefile_compressor.chunk_ids(stored_data)
+                if stored_data.get("event_log"):
+                    deleted_events.append(casefile_id)
+            else:
+                data, new_chunks[casefile_id], unreferenced_chunk_ids[casefile_id] = self._encode_casefile_updates(
+                    read[0], stored_data, data, token
+                )
+            conditional_writes.append((casefile_id, data, version))
+
+        for casefile_id, chunks in new_chunks.items():
+            self._write_chunks(casefile_id, chunks)
+        try:
+            self.backend.write_conditional(self.casefiles_collection_name, conditional_writes)
+        except Exception:
+            # Nothing references the chunks of the rejected writes.
+            for casefile_id, chunks in new_chunks.items():
+                self._delete_chunks(casefile_id, list(chunks))
+            raise
+        for casefile_id, chunk_ids in unreferenced_chunk_ids.items():
+            self._delete_chunks(casefile_id, chunk_ids)
+        for casefile_id in deleted_events:
+            # Subcollections are not removed together with their parent document.
+            self.backend.delete_collection(self._events_collection(casefile_id))
+
+    @_instrumented("casefiles")
+    async def commit_casefiles(self, writes: List[Tuple[str, Optional[Dict[FieldPath, Any]], Any]]):
+        """
+        Writes creates, updates and deletes of several casefiles in a single
+        atomic commit. Each write is (casefile ID, data, version token):
+        with no token, data is a new casefile (`model_dump(exclude_none=True)`);
+        otherwise data holds field updates, or is None to delete the casefile,
+        and the token comes from `load_casefiles_versioned`. Raises
+        WriteConflict, writing nothing, if any casefile changed since it was
+        read. Keep one call within a single commit: on Firestore, 500 writes
+        less the change marker.
+        """
+        try:
+            await self.executor.run(self._commit_casefile_writes, writes)
+        except WriteConflict:
+            self._write_conflicts += 1
+            raise
+        finally:
+            await self._invalidate_casefiles([casefile_id for casefile_id, _, _ in writes])
+        logger.info(f"{len(writes)} casefile writes committed to {self.backend.name}.")
+
+    def _events_collection(self, casefile_id: str) -> str:
+        return f"{self.casefiles_collection_name}/{casefile_id}/{self.events_subcollection_name}"
+
+    @_instrumented("casefiles")
+    async def append_casefile_event(self, casefile_id: str, event: Event) -> bool:
+        """
+        Appends an event to the casefile's append-only events subcollection and
+        keeps only the most recent events inline in `event_log`. The cost of
+        an append does not grow with the length of the history. The event is
+        stored before the inline tail is updated, so the tail never refers to
+        an event that does not exist; both writes are keyed by the event ID,
+        so a failed append can be retried. The tail is maintained with an
+        optimistic write, so concurrent appends never drop each other's events.
+        Returns False if the casefile does not exist.
+        """
+        event_data = event.model_dump(exclude_none=True)
+        events_collection = self._events_collection(casefile_id)
+        await self.executor.run(self.backend.set, events_collection, event.id, event_data)
+
+        def _append_to_recent_events(casefile: Casefile):
+            if any(e.id == event.id for e in casefile.event_log):
+                return None  # Already appended by an earlier attempt.
+            recent_events = [e.model_dump(exclude_none=True) for e in casefile.event_log] + [event_data]
+            return {
+                "event_log": recent_events[-self.recent_events_limit:],
+                "modified_at": SERVER_TIMESTAMP,
+            }
+
+        appended = await self.modify_casefile(casefile_id, _append_to_recent_events) is not None
+        if appended:
+            logger.info(f"Event '{event.id}' appended to casefile '{casefile_id}'.")
+        else:
+            await self.executor.run(self.backend.delete, events_collection, event.id)
+            logger.warning(f"Attempted to append an event, but casefile '{casefile_id}' not found.")
+        return appended
+
+    @_instrumented("casefiles")
+    async def get_events(
+        self, casefile_id: str, after: Optional[str] = None, limit: int = 100, after_id: Optional[str] = None
+    ) -> List[Event]:
+        """
+        Returns a page of a casefile's events in chronological order, starting
+        after the last event of the previous page: its timestamp as `after`
+        and its ID as `after_id`. Events with equal timestamps are ordered by
+        ID; without `after_id` all events at the `after` timestamp are skipped.
+        """
+        docs = await self.executor.run(
+            self.backend.query,
+            self._events_collection(casefile_id),
+            order_by="timestamp",
+            start_after=(after, after_id) if after is not None and after_id else after,
+            limit=limit,
+        )
+        return EVENT_LIST_ADAPTER.validate_python([event_data for _, event_data in docs])
+
+    @_instrumented("casefiles")
+    async def load_casefile(self, casefile_id: str, fields: Optional[List[str]] = None) -> Union[Casefile, CasefileSummary, None]:
+        """
+        Loads a casefile. With a field selection (e.g. CASEFILE_SUMMARY_FIELDS)
+        only those fields are read from storage and a CasefileSummary is
+        returned instead of the full Casefile.
+        """
+        to_model = self._casefile_from_document if fields is None else self._summary_from_document
+        if self.casefile_write_buffer and self.casefile_write_buffer.has_pending(casefile_id):
+            # Serve the buffered snapshot so callers read their own writes.
+            return to_model(casefile_id, self.casefile_write_buffer.get(casefile_id))
+        if fields is None and self.casefile_cache:
+            return await self._load_casefile_cached(casefile_id)
+        casefile_data = await self.executor.run(self._read_casefile_data, casefile_id, fields)
+        if casefile_data is not None:
+            return to_model(casefile_id, casefile_data)
         return None
 
+    async def _load_casefile_cached(self, casefile_id: str) -> Optional[Casefile]:
+        """
+        Serves a casefile from the read-through cache. An expired entry is
+        revalidated with a projection read of `modified_at`, which is much
+        cheaper than reading and decoding the whole document again.
+        Callers get their own copy, so mutating it never alters the cache.
+        """
+        cache = self.casefile_cache
+        if cache.needs_revalidation(casefile_id):
+            current = await self.executor.run(self.backend.get, self.casefiles_collection_name, casefile_id, ["modified_at"])
+            cache.revalidate(casefile_id, _version_stamp(current.get("modified_at")) if current else None)
+        casefile = cache.get(casefile_id)
+        if casefile is None:
+            generation = cache.generation
+            casefile_data = await self.executor.run(self._read_casefile_data, casefile_id)
+            if casefile_data is None:
+                return None
+            casefile = self._casefile_from_document(casefile_id, casefile_data)
+            self._cache_casefile(casefile, casefile_data, generation)
+        return casefile.model_copy(deep=True)
+
+    @_instrumented("casefiles")
+    async def load_casefiles(self, casefile_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Union[Casefile, CasefileSummary]]:
+        """
+        Loads several casefiles in a single batched read. Returns a mapping of
+        casefile ID to casefile (or CasefileSummary with a field selection);
+        IDs that do not exist are left out.
+        """
+        to_model = self._casefile_from_document if fields is None else self._summary_from_document
+        casefiles = {}
+        ids_to_read = []
+        use_cache = fields is None and self.casefile_cache is not None
+        for casefile_id in casefile_ids:
+            if self.casefile_write_buffer and self.casefile_write_buffer.has_pending(casefile_id):
+                casefiles[casefile_id] = to_model(casefile_id, self.casefile_write_buffer.get(casefile_id))
+                continue
+            cached = self.casefile_cache.get(casefile_id) if use_cache else None
+            if cached is not None:
+                casefiles[casefile_id] = cached.model_copy(deep=True)
+            else:
+                ids_to_read.append(casefile_id)
+        if ids_to_read:
+            generation = self.casefile_cache.generation if use_cache else 0
+
+            def _read_many():
+                docs = self.backend.get_many(self.casefiles_collection_name, ids_to_read, fields)
+                # Projections never include compressed fields.
+                return list(docs.items()) if fields is not None else self._decode_listed_casefiles(docs.items(), rehydrate=True)
+
+            for casefile_id, casefile_data in await self.executor.run(_read_many):
+                casefile = to_model(casefile_id, casefile_data)
+                if use_cache:
+                    self._cache_casefile(casefile, casefile_data, generation)
+                    casefile = casefile.model_copy(deep=True)
+                casefiles[casefile_id] = casefile
+        return casefiles
+
+    @staticmethod
+    def _document_chunk_id(chunk_data: dict) -> str:
+        return f"{chunk_data['case_id']}-{chunk_data['file_id']}-{chunk_data['chunk_index']}"
+
     def save_document_chunk(self, chunk_data: dict):
-        chunk_id = f"{chunk_data['case_id']}-{chunk_data['file_id']}-{chunk_data['chunk_index']}"
-        doc_ref = self.db.collection(self.documents_collection_name).document(chunk_id)
-        doc_ref.set(chunk_data)
-        logger.info(f"Document chunk '{chunk_id}' opgeslagen in Firestore.")
+        chunk_id = self._document_chunk_id(chunk_data)
+        self.backend.set(self.documents_collection_name, chunk_id, chunk_data)
+        logger.info(f"Document chunk '{chunk_id}' opgeslagen in {self.backend.name}.")
+
+    def save_document_chunks(
+        self, chunks: List[dict], batch_size: Optional[int] = None, parallelism: Optional[int] = None
+    ) -> int:
+        """
+        Bulk-writes document chunks in batches (`MDS_CHUNK_BATCH_SIZE` writes
+        each, `MDS_CHUNK_WRITE_PARALLELISM` batches in flight by default)
+        instead of one round trip per chunk. Returns the number of chunks written.
+        """
+        documents = [(self._document_chunk_id(chunk_data), chunk_data) for chunk_data in chunks]
+        written = self.backend.set_many(
+            self.documents_collection_name,
+            documents,
+            batch_size=batch_size or self.chunk_batch_size,
+            parallelism=parallelism or self.chunk_write_parallelism,
+        )
+        logger.info(f"{written} document chunks opgeslagen in {self.backend.name}.")
+        return written
 
-    async def load_all_casefiles(self) -> List[Casefile]:
-        """Retrieves all casefile documents from the collection."""
+    @_instrumented("casefiles")
+    async def load_all_casefiles(self, fields: Optional[List[str]] = None) -> Union[List[Casefile], List[CasefileSummary]]:
+        """
+        Retrieves all casefile documents from the collection. With a field
+        selection the projection is pushed down to storage and
+        CasefileSummary objects are returned.
+        """
         logger.info(f"Alle casefiles worden opgehaald uit de '{self.casefiles_collection_name}' collectie.")
+        await self.flush()
         
         def _load_all():
-            docs = self.db.collection(self.casefiles_collection_name).stream()
-            casefiles = []
-            for doc in docs:
-                casefile_data = doc.to_dict()
-                casefile_data = self._convert_datetimes_to_iso(casefile_data) # Convert datetimes to ISO strings
-                casefile_data['id'] = doc.id # Ensure the ID is the document ID
-                casefiles.append(Casefile(**casefile_data))
-            return casefiles
-
-        casefiles = await asyncio.to_thread(_load_all)
+            if fields is not None:
+                return [
+                    self._summary_from_document(doc_id, casefile_data)
+                    for doc_id, casefile_data in self.backend.query(self.casefiles_collection_name, select=fields)
+                ]
+            return [
+                self._casefile_from_document(doc_id, casefile_data)
+                for doc_id, casefile_data in self._decode_listed_casefiles(self.backend.stream(self.casefiles_collection_name))
+            ]
+
+        casefiles = await self.executor.run(_load_all)
         logger.info(f"{len(casefiles)} casefiles gevonden en geladen.")
         return casefiles
 
+    @_instrumented("casefiles")
+    async def load_casefile_page(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        start_after: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Union[List[Casefile], List[CasefileSummary]]:
+        """
+        Loads one page of casefiles ordered by ID, starting after the
+        `start_after` casefile ID. With a field selection, CasefileSummary
+        objects are returned.
+        """
+        select = None if fields is None else sorted(set(fields) | {"id"})
+
+        def _read_page():
+            docs = self.backend.query(
+                self.casefiles_collection_name,
+                order_by="id",
+                start_after=start_after,
+                limit=page_size,
+                select=select,
+            )
+            return docs if fields is not None else self._decode_listed_casefiles(docs)
+
+        docs = await self.executor.run(_read_page)
+        to_model = self._casefile_from_document if fields is None else self._summary_from_document
+        return [to_model(doc_id, casefile_data) for doc_id, casefile_data in docs]
+
+    @_instrumented("casefiles")
+    async def query_casefiles(
+        self,
+        filters: List[Filter],
+        fields: Optional[List[str]] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Union[List[Casefile], List[CasefileSummary]]:
+        """
+        Loads the casefiles matching all `filters`, evaluated by the storage
+        backend on indexed fields. With a field selection, CasefileSummary
+        objects are returned.
+        """
+        await self.flush()
+        select = None if fields is None else sorted(set(fields) | {"id"})
+
+        def _query():
+            docs = self.backend.query(
+                self.casefiles_collection_name, filters=filters, order_by=order_by, limit=limit, select=select,
+            )
+            return docs if fields is not None else self._decode_listed_casefiles(docs)
+
+        docs = await self.executor.run(_query)
+        to_model = self._casefile_from_document if fields is None else self._summary_from_document
+        return [to_model(doc_id, casefile_data) for doc_id, casefile_data in docs]
+
+    async def iter_casefiles(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        start_after: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[Union[Casefile, CasefileSummary]]:
+        """
+        Streams all casefiles page by page with cursor pagination, so memory
+        use is bounded by `page_size` instead of the size of the collection.
+        """
+        await self.flush()
+        while True:
+            page = await self.load_casefile_page(page_size=page_size, start_after=start_after, fields=fields)
+            for casefile in page:
+                yield casefile
+            if len(page) < page_size:
+                return
+            start_after = page[-1].id
+
+    @_instrumented("casefiles")
     async def delete_casefile(self, casefile_id: str) -> bool:
-        """Deletes a specific casefile document from Firestore."""
-        doc_ref = self.db.collection(self.casefiles_collection_name).document(casefile_id)
-        
-        doc = await asyncio.to_thread(doc_ref.get)
-        if doc.exists:
-            await asyncio.to_thread(doc_ref.delete)
-            logger.info(f"Casefile '{casefile_id}' successfully deleted from Firestore.")
-            return True
+        """Deletes a specific casefile document from the storage backend."""
+        if self.casefile_write_buffer:
+            await self.casefile_write_buffer.discard(casefile_id)
+        stub = await self.executor.run(self.backend.get, self.casefiles_collection_name, casefile_id, ["archived_at"])
+        try:
+            deleted = await self.executor.run(self.backend.delete, self.casefiles_collection_name, casefile_id)
+        finally:
+            await self._invalidate_casefiles([casefile_id])
+        if deleted:
+            if stub and "archived_at" in stub:
+                await self.executor.run(self.cold_store.delete, self._cold_key(casefile_id, stub["archived_at"]))
+            # Subcollections are not removed together with their parent document.
+            await self.executor.run(self.backend.delete_collection, self._events_collection(casefile_id))
+            await self.executor.run(self.backend.delete_collection, self._chunks_collection(casefile_id))
+            logger.info(f"Casefile '{casefile_id}' successfully deleted from {self.backend.name}.")
         else:
             logger.warning(f"Attempted to delete, but casefile '{casefile_id}' not found.")
-            return False
+        return deleted
+
+    @_instrumented("casefiles")
+    async def archive_cold_casefiles(self, older_than_days: Optional[int] = None) -> int:
+        """
+        Archives every casefile not modified for `older_than_days` days
+        (MDS_ARCHIVE_AFTER_DAYS by default): its large fields move to the
+        cold store and only a stub stays in the casefiles collection, so
+        scans and listings stop paying for them. `load_casefile` and
+        `load_casefiles` rehydrate archived casefiles on demand.
+        Returns the number of casefiles archived.
+        """
+        await self.flush()
+        days = self.archive_after_days if older_than_days is None else older_than_days
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+
+        def _find_cold():
+            # `modified_at` is an ISO string, or a native timestamp after a
+            # SERVER_TIMESTAMP write; storage compares each type on its own.
+            candidates = []
+            for value in (cutoff.isoformat(), cutoff):
+                candidates.extend(
+                    doc_id
+                    for doc_id, casefile_data in self.backend.query(
+                        self.casefiles_collection_name, filters=[("modified_at", "<", value)], select=["archived_at"],
+                    )
+                    if "archived_at" not in casefile_data
+                )
+            return list(dict.fromkeys(candidates))
+
+        archived = 0
+        for casefile_id in await self.executor.run(_find_cold):
+            if await self.executor.run(self._archive_casefile, casefile_id):
+                archived += 1
+        logger.info(f"{archived} casefiles not modified since {cutoff.isoformat()} archived.")
+        return archived
 
+    @_instrumented("prompts")
     async def save_prompt(self, prompt: Prompt):
-        doc_ref = self.db.collection(self.prompts_collection_name).document(prompt.id)
-        await asyncio.to_thread(doc_ref.set, prompt.model_dump(exclude_none=True))
-        logger.info(f"Prompt '{prompt.id}' saved to Firestore.")
+        await self.executor.run(self.backend.set, self.prompts_collection_name, prompt.id, prompt.model_dump(exclude_none=True))
+        await self._invalidate_shared(self.prompts_collection_name, [ALL_PROMPTS_KEY])
+        logger.info(f"Prompt '{prompt.id}' saved to {self.backend.name}.")
 
+    @_instrumented("prompts")
     async def load_prompt(self, prompt_id: str) -> Prompt | None:
-        doc_ref = self.db.collection(self.prompts_collection_name).document(prompt_id)
-        doc = await asyncio.to_thread(doc_ref.get)
-        if doc.exists:
-            prompt_data = doc.to_dict()
-            prompt_data['id'] = doc.id
+        prompt_data = await self.executor.run(self.backend.get, self.prompts_collection_name, prompt_id)
+        if prompt_data is not None:
+            prompt_data['id'] = prompt_id
             return Prompt(**prompt_data)
         return None
 
+    @_instrumented("prompts")
     async def load_all_prompts(self) -> List[Prompt]:
         """Retrieves all prompt documents from the collection."""
         logger.info(f"Alle prompts worden opgehaald uit de '{self.prompts_collection_name}' collectie.")
         
         def _load_all():
-            docs = self.db.collection(self.prompts_collection_name).stream()
-            prompts = []
-            for doc in docs:
-                prompt_data = doc.to_dict()
-                prompt_data['id'] = doc.id
-                prompts.append(Prompt(**prompt_data))
-            return prompts
-
-        prompts = await asyncio.to_thread(_load_all)
+            prompts_data, shared_version = None, None
+            if self.shared_cache:
+                prompts_data, shared_version = self.shared_cache.lookup(self.prompts_collection_name, ALL_PROMPTS_KEY)
+            if prompts_data is None:
+                prompts_data = [{**prompt_data, 'id': doc_id} for doc_id, prompt_data in self.backend.stream(self.prompts_collection_name)]
+                if self.shared_cache:
+                    self.shared_cache.fill(self.prompts_collection_name, ALL_PROMPTS_KEY, prompts_data, shared_version)
+            return [Prompt(**prompt_data) for prompt_data in prompts_data]
+
+        prompts = await self.executor.run(_load_all)
         logger.info(f"{len(prompts)} prompts gevonden en geladen.")
         return prompts
 
+    @_instrumented("prompts")
     async def delete_prompt(self, prompt_id: str) -> bool:
-        """Deletes a specific prompt document from Firestore."""
-        doc_ref = self.db.collection(self.prompts_collection_name).document(prompt_id)
-        
-        doc = await asyncio.to_thread(doc_ref.get)
-        if doc.exists:
-            await asyncio.to_thread(doc_ref.delete)
-            logger.info(f"Prompt '{prompt_id}' successfully deleted from Firestore.")
-            return True
+        """Deletes a specific prompt document from the storage backend."""
+        deleted = await self.executor.run(self.backend.delete, self.prompts_collection_name, prompt_id)
+        if deleted:
+            await self._invalidate_shared(self.prompts_collection_name, [ALL_PROMPTS_KEY])
+            logger.info(f"Prompt '{prompt_id}' successfully deleted from {self.backend.name}.")
         else:
             logger.warning(f"Attempted to delete, but prompt '{prompt_id}' not found.")
-            return False
+        return deleted
 
+    def _messages_collection(self, session_id: str) -> str:
+        return f"{self.sessions_collection_name}/{session_id}/{self.messages_subcollection_name}"
+
+    @staticmethod
+    def _message_id(seq: int) -> str:
+        # Zero-padded so the document IDs sort in sequence order as well.
+        return f"{seq:010d}"
+
+    def _append_messages(
+        self,
+        transaction: StorageTransaction,
+        session_id: str,
+        messages: List[Message],
+        session_fields: Optional[Dict[str, Any]] = None,
+        skip_stored: bool = False,
+    ) -> int:
+        """
+        Writes `messages` into the session's messages subcollection, numbered
+        after the messages stored so far, and bumps `message_count` on the
+        session document. Sessions saved before messages were stored
+        separately keep their inline `history`; it counts as the first
+        messages. With `skip_stored`, `messages` is the full history and only
+        the messages beyond `message_count` are written.
+        """
+        session_data = transaction.get(self.sessions_collection_name, session_id)
+        if session_data is None:
+            count = 0
+        else:
+            count = session_data.get("message_count", len(session_data.get("history", [])))
+        new_messages = messages[count:] if skip_stored else messages
+        for seq, message in enumerate(new_messages, start=count):
+            transaction.set(self._messages_collection(session_id), self._message_id(seq), {"seq": seq, **message.model_dump()})
+        updates = {**(session_fields or {}), "message_count": count + len(new_messages)}
+        if session_data is None:
+            transaction.set(self.sessions_collection_name, session_id, updates)
+        else:
+            transaction.update(self.sessions_collection_name, session_id, updates)
+        return count + len(new_messages)
+
+    @_instrumented("conversation_sessions")
+    async def append_messages(self, session_id: str, messages: List[Message]) -> int:
+        """
+        Appends messages to a conversation session, creating the session if it
+        does not exist yet. Only the new messages and the session's message
+        counter are written, so the cost does not grow with the length of the
+        conversation. Returns the number of messages in the session.
+        """
+        count = await self.executor.run(
+            self.backend.run_transaction,
+            lambda transaction: self._append_messages(transaction, session_id, messages),
+        )
+        logger.info(f"{len(messages)} messages appended to conversation session '{session_id}'.")
+        return count
+
+    @_instrumented("conversation_sessions")
     async def save_conversation_session(self, session: ConversationSession):
-        """Saves a conversation session to Firestore."""
-        doc_ref = self.db.collection("conversation_sessions").document(session.id)
-        await asyncio.to_thread(doc_ref.set, session.model_dump(exclude_none=True))
-        logger.info(f"Conversation session '{session.id}' saved to Firestore.")
+        """
+        Saves a conversation session to the storage backend. The messages of
+        `history` that are already stored are not written again.
+        """
+        session_fields = session.model_dump(exclude={"history"}, exclude_none=True)
+        await self.executor.run(
+            self.backend.run_transaction,
+            lambda transaction: self._append_messages(transaction, session.id, session.history, session_fields, skip_stored=True),
+        )
+        logger.info(f"Conversation session '{session.id}' saved to {self.backend.name}.")
 
+    @_instrumented("conversation_sessions")
     async def load_conversation_session(self, session_id: str) -> ConversationSession | None:
-        """Loads a conversation session from Firestore."""
-        doc_ref = self.db.collection("conversation_sessions").document(session_id)
-        doc = await asyncio.to_thread(doc_ref.get)
-        if doc.exists:
-            session_data = doc.to_dict()
-            session_data['id'] = doc.id
-            return ConversationSession(**session_data)
-        return None
+        """Loads a conversation session with its full message history from the storage backend."""
+        session_data = await self.executor.run(self.backend.get, self.sessions_collection_name, session_id)
+        if session_data is None:
+            return None
+        docs = await self.executor.run(self.backend.query, self._messages_collection(session_id), order_by="seq")
+        session_data.pop("message_count", None)
+        session_data["history"] = session_data.get("history", []) + [message_data for _, message_data in docs]
+        session_data['id'] = session_id
+        return ConversationSession(**session_data)
+
+    @_instrumented("conversation_sessions")
+    async def load_recent(self, session_id: str, n: int) -> List[Message]:
+        """Returns the last `n` messages of a conversation session, oldest first."""
+        if n <= 0:
+            return []
+        docs = await self.executor.run(
+            self.backend.query, self._messages_collection(session_id), order_by="seq", descending=True, limit=n,
+        )
+        messages = [message_data for _, message_data in reversed(docs)]
+        if len(messages) < n:
+            # The remainder may still be stored inline by an older save.
+            session_data = await self.executor.run(self.backend.get, self.sessions_collection_name, session_id, ["history"])
+            legacy_history = (session_data or {}).get("history") or []
+            messages = legacy_history[max(len(legacy_history) - (n - len(messages)), 0):] + messages
+        return [Message.model_validate(message_data) for message_data in messages]
+
+    def executor_stats(self) -> Dict[str, int]:
+        """Returns the usage counters of the storage thread pool."""
+        return self.executor.stats()
+
+    def write_behind_stats(self) -> Dict[str, int]:
+        """Returns the counters of the casefile write-behind buffer (empty when disabled)."""
+        return self.casefile_write_buffer.stats() if self.casefile_write_buffer else {}
+
+    def write_conflict_count(self) -> int:
+        """Returns how many optimistic casefile writes had to be retried."""
+        return self._write_conflicts
+
+    def compression_stats(self) -> Dict[str, float]:
+        """Returns the compression ratio and chunk read counters of stored casefiles."""
+        return self.casefile_compressor.stats()
+
+    def casefile_cache_stats(self) -> Dict[str, int]:
+        """Returns the counters of the casefile read-through cache (empty when disabled)."""
+        return self.casefile_cache.stats() if self.casefile_cache else {}
+
+    def shared_cache_stats(self) -> Dict[str, int]:
+        """Returns the counters of the shared Redis cache (empty when disabled)."""
+        return self.shared_cache.stats() if self.shared_cache else {}
+
+    def archive_stats(self) -> Dict[str, Any]:
+        """Returns the cold store in use and the casefiles archived and rehydrated by this process."""
+        with self._archive_lock:
+            return {
+                "cold_store": self.cold_store.name,
+                "archive_after_days": self.archive_after_days,
+                "archived": self._archived,
+                "rehydrated": self._rehydrated,
+            }
+
+    def change_feed_stats(self) -> Dict[str, int]:
+        """Returns whether the change feed is running and how many changes it delivered."""
+        return {"running": int(self._stop_change_feed is not None), "changes_received": self._changes_received}
+
+    def metrics_text(self) -> str:
+        """Returns the storage metrics and the stats above in the Prometheus text format."""
+        return self.metrics_exporter.render()
+
+    def close(self):
+        """Shuts down the storage thread pool and releases the storage backend."""
+        self.stop_change_feed()
+        self.executor.shutdown()
+        self.backend.close()
@@ -64,24 +64,26 @@ class EmbeddingsManager:
                 return
 
             chunks = self._chunk_text(text_content)
-            
-            for i, chunk in enumerate(chunks):
-                if not self.embedding_model:
-                    logger.error("Embedding model not available.")
-                    break
-                
-                embedding = self.embedding_model.encode(chunk).tolist()
-                
-                chunk_data = {
+
+            if not self.embedding_model:
+                logger.error("Embedding model not available.")
+                return
+
+            # Encode all chunks in one batched model call, then write them in bulk.
+            embeddings = self.embedding_model.encode(chunks)
+            chunk_docs = [
+                {
                     "case_id": case_id,
                     "file_id": file_ref.id,
                     "file_name": file_ref.name,
                     "chunk_index": i,
                     "chunk_text": chunk,
-                    "embedding": embedding
+                    "embedding": embedding.tolist()
                 }
-                self.db_manager.save_document_chunk(chunk_data)
-                logger.info(f"Generated embedding for chunk {i} of file '{file_ref.name}'.")
+                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+            ]
+            self.db_manager.save_document_chunks(chunk_docs)
+            logger.info(f"Generated embeddings for {len(chunk_docs)} chunks of file '{file_ref.name}'.")
 
         except Exception as e:
             logger.error(f"Failed to generate embeddings for file '{file_ref.name}': {e}", exc_info=True)
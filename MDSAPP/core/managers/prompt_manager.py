@@ -1,7 +1,8 @@
 # MDSAPP/core/managers/prompt_manager.py
 
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from jinja2 import Environment
 
 from MDSAPP.core.managers.database_manager import DatabaseManager
@@ -18,6 +19,10 @@ class PromptManager:
         self._prompts: Dict[str, Prompt] = {}
         self._jinja_env = Environment()
         # No need to load prompts at init, can be loaded on demand or with a dedicated method.
+        # Prompts changed by another replica are reloaded through the change feed.
+        self._reload_requested = False
+        self._reload_task: Optional[asyncio.Task] = None
+        self.db_manager.add_change_listener(self.db_manager.prompts_collection_name, self._on_prompt_changed)
 
     async def load_prompts_from_db(self):
         """
@@ -26,16 +31,30 @@ class PromptManager:
         logger.info("Loading all prompts from Firestore...")
         try:
             prompts = await self.db_manager.load_all_prompts()
+            latest_prompts: Dict[str, Prompt] = {}
             for prompt in prompts:
                 # Store prompts by a unique key, e.g., "agent_name-task_name"
                 prompt_key = f"{prompt.agent_name}-{prompt.task_name}"
                 # If there are multiple versions, only keep the latest one
-                if prompt_key not in self._prompts or prompt.version > self._prompts[prompt_key].version:
-                    self._prompts[prompt_key] = prompt
+                if prompt_key not in latest_prompts or prompt.version > latest_prompts[prompt_key].version:
+                    latest_prompts[prompt_key] = prompt
+            # Swapped in whole, so deleted prompts disappear and readers never see a partial load.
+            self._prompts = latest_prompts
             logger.info(f"Successfully loaded {len(self._prompts)} latest version prompts.")
         except Exception as e:
             logger.error(f"Error loading prompts from Firestore: {e}", exc_info=True)
 
+    def _on_prompt_changed(self, prompt_id: Optional[str]):
+        """Schedules a reload of the prompts; changes arriving during a reload trigger one more."""
+        self._reload_requested = True
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.get_running_loop().create_task(self._reload_prompts())
+
+    async def _reload_prompts(self):
+        while self._reload_requested:
+            self._reload_requested = False
+            await self.load_prompts_from_db()
+
     def get_prompt(self, agent_name: str, task_name: str) -> Prompt | None:
         """
         Returns the latest version of a prompt for a specific agent and task.
@@ -81,6 +81,16 @@ class EventStatus(str, Enum): # Added EventStatus
     CANCELLED = "CANCELLED"
     LOGGED = "LOGGED"
 
+class CasefileStatus(str, Enum):
+    """
+    Defines how far a casefile has progressed, from its stored contents.
+    """
+    NEW = "NEW"
+    MISSION_DEFINED = "MISSION_DEFINED"
+    PLANNING_COMPLETE = "PLANNING_COMPLETE"
+    EXECUTION_COMPLETE = "EXECUTION_COMPLETE"
+    ANALYSIS_COMPLETE = "ANALYSIS_COMPLETE"
+
 class Role(str, Enum):
     """
     Defines the access control roles for a casefile.
@@ -0,0 +1,260 @@
+# MDSAPP/core/storage/base.py
+
+import datetime
+import json
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+# A field path is either a top-level field name or a tuple of path segments,
+# e.g. ("acl", "user@example.com"). Segments are never split on dots.
+FieldPath = Union[str, Tuple[str, ...]]
+
+
+class ArrayUnion:
+    """Update value: appends the given values to an array field, skipping ones already present."""
+    def __init__(self, values: List[Any]):
+        self.values = list(values)
+
+
+class _Sentinel:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# Update value: removes the field from the document.
+DELETE_FIELD = _Sentinel("DELETE_FIELD")
+# Update value: sets the field to the commit time of the write.
+SERVER_TIMESTAMP = _Sentinel("SERVER_TIMESTAMP")
+
+
+# A query filter: (field, operator, value). Supported operators are
+# "==", "!=", "<", "<=", ">", ">=", "in" and "array_contains".
+Filter = Tuple[str, str, Any]
+QUERY_OPERATORS = ("==", "!=", "<", "<=", ">", ">=", "in", "array_contains")
+
+
+# Change-feed callback: (collection, doc_id). A doc_id of None means changes
+# may have been missed and any document of the collection may have changed.
+ChangeCallback = Callable[[str, Optional[str]], None]
+
+
+# A write of `StorageBackend.write_conditional`: (doc_id, data, if_version).
+# With if_version None, `data` is a new document that must not exist yet;
+# otherwise `data` holds field updates, or is None to delete the document,
+# and the document must still be at that version.
+ConditionalWrite = Tuple[str, Optional[Dict[FieldPath, Any]], Any]
+
+
+class WriteConflict(Exception):
+    """Raised by a conditional write when the document changed after it was read."""
+
+
+def field_path_segments(field_path: FieldPath) -> Tuple[str, ...]:
+    return (field_path,) if isinstance(field_path, str) else tuple(field_path)
+
+
+def json_default(value: Any) -> Any:
+    """`json.dumps` default for the non-JSON values found in model dumps."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def apply_updates(data: Dict[str, Any], updates: Dict[FieldPath, Any]):
+    """Applies field-path updates to a decoded document in place, mirroring Firestore semantics."""
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    for field_path, value in updates.items():
+        *parents, leaf = field_path_segments(field_path)
+        target = data
+        for segment in parents:
+            if not isinstance(target.get(segment), dict):
+                target[segment] = {}
+            target = target[segment]
+
+        if value is DELETE_FIELD:
+            target.pop(leaf, None)
+        elif value is SERVER_TIMESTAMP:
+            target[leaf] = now
+        elif isinstance(value, ArrayUnion):
+            current = target.get(leaf)
+            current = list(current) if isinstance(current, list) else []
+            for item in json.loads(json.dumps(value.values, default=json_default)):
+                if item not in current:
+                    current.append(item)
+            target[leaf] = current
+        else:
+            target[leaf] = json.loads(json.dumps(value, default=json_default))
+
+
+class StorageTransaction(ABC):
+    """
+    A unit of work handed to the callback of `StorageBackend.run_transaction`.
+    All reads must happen before the first write (a Firestore requirement
+    that the local engines follow as well).
+    """
+
+    @abstractmethod
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any]):
+        """Same semantics as `StorageBackend.update`; the document must exist."""
+
+    @abstractmethod
+    def delete(self, collection: str, doc_id: str):
+        ...
+
+
+class StorageBackend(ABC):
+    """
+    The document-store interface behind the DatabaseManager.
+    Backends are synchronous; the DatabaseManager is responsible for
+    running them off the event loop.
+    """
+    name: str = "abstract"
+
+    @property
+    def client(self) -> Any:
+        """The native client of the backend, if it exposes one."""
+        return None
+
+    @abstractmethod
+    def get(self, collection: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the document data, or None if it does not exist.
+        With `fields`, only those top-level fields are read.
+        """
+
+    @abstractmethod
+    def get_versioned(self, collection: str, doc_id: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+        """
+        Returns (data, version) of a document, or None if it does not exist.
+        The version is an opaque stamp that changes with every write of the
+        document and can be passed to `update(..., if_version=...)`.
+        """
+
+    @abstractmethod
+    def get_many(self, collection: str, doc_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads several documents in one batched call. Returns a mapping of
+        doc_id to data; IDs that do not exist are left out.
+        """
+
+    def get_many_versioned(self, collection: str, doc_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], Any]]:
+        """
+        Like `get_many`, but maps each doc_id to (data, version) for use with
+        `write_conditional`. Backends override this with one batched call.
+        """
+        versioned = {}
+        for doc_id in dict.fromkeys(doc_ids):
+            document = self.get_versioned(collection, doc_id)
+            if document is not None:
+                versioned[doc_id] = document
+        return versioned
+
+    @abstractmethod
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        """Creates or fully overwrites a document."""
+
+    def set_many(
+        self, collection: str, documents: List[Tuple[str, Dict[str, Any]]], batch_size: int = 500, parallelism: int = 1
+    ) -> int:
+        """
+        Creates or overwrites many documents, grouped into batches of up to
+        `batch_size` writes with up to `parallelism` batches in flight.
+        Each batch is atomic; the whole call is not. Returns the number of
+        documents written.
+        """
+        for doc_id, data in documents:
+            self.set(collection, doc_id, data)
+        return len(documents)
+
+    @abstractmethod
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any], if_version: Any = None) -> bool:
+        """
+        Writes only the given field paths of an existing document. Values may be
+        plain data or one of ArrayUnion, DELETE_FIELD and SERVER_TIMESTAMP.
+        Returns False if the document does not exist. With `if_version`, the
+        write only succeeds if the document is still at that version
+        (see `get_versioned`) and raises WriteConflict otherwise.
+        """
+
+    @abstractmethod
+    def delete(self, collection: str, doc_id: str) -> bool:
+        """Deletes a document. Returns False if it did not exist."""
+
+    def write_conditional(self, collection: str, writes: List[ConditionalWrite]):
+        """
+        Commits creates, updates and deletes of several documents atomically,
+        each conditional on its document (see ConditionalWrite). Raises
+        WriteConflict, and writes nothing, if any condition does not hold.
+        Callers keep the writes within one commit (500 writes on Firestore).
+        """
+        raise NotImplementedError(f"The {self.name} storage backend has no conditional batch writes.")
+
+    @abstractmethod
+    def stream(self, collection: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (doc_id, data) for every document in the collection."""
+
+    @abstractmethod
+    def query(
+        self,
+        collection: str,
+        filters: Optional[List[Filter]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        start_after: Any = None,
+        limit: Optional[int] = None,
+        select: Optional[List[str]] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Returns (doc_id, data) for the documents matching all `filters`,
+        sorted on `order_by` and resumed after the `start_after` value of
+        that field. Documents with equal values are sorted by ID, in the same
+        direction; a `(value, doc_id)` tuple as `start_after` resumes after
+        that exact document, so ties at a page boundary are not skipped.
+        With `select`, only those top-level fields are returned.
+        """
+
+    def delete_collection(self, collection: str) -> int:
+        """Deletes every document of a collection and returns how many were removed."""
+        deleted = 0
+        for doc_id, _ in list(self.stream(collection)):
+            deleted += int(self.delete(collection, doc_id))
+        return deleted
+
+    @abstractmethod
+    def run_transaction(self, fn: Callable[[StorageTransaction], T]) -> T:
+        """Runs `fn` atomically and returns its result."""
+
+    def log_changes(self, collections: List[str]):
+        """
+        Makes writes of this process to the given top-level collections
+        visible to `watch` in other processes. Backends whose change feed
+        already sees every write need nothing here.
+        """
+
+    def watch(self, collections: List[str], callback: ChangeCallback) -> Callable[[], None]:
+        """
+        Calls `callback(collection, doc_id)` for every document of the given
+        top-level collections that is written or deleted from now on, by any
+        process that logs its changes (see `log_changes`). Callbacks run on a
+        background thread. Returns a function that stops watching.
+        """
+        raise NotImplementedError(f"The {self.name} storage backend has no change feed.")
+
+    def close(self):
+        """Releases any resources held by the backend."""
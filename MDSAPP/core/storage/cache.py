@@ -0,0 +1,128 @@
+# MDSAPP/core/storage/cache.py
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    # Opaque version stamp of the stored document (e.g. its `modified_at`).
+    version: Any
+    size: int
+    expires_at: float
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at <= time.monotonic()
+
+
+class LRUCache:
+    """
+    An in-process LRU cache bounded by entry count and approximate byte size.
+    Entries are served without a round trip for `ttl_seconds`; after that
+    they must be revalidated against the current version stamp of the
+    document before they can be served again. Not thread-safe: use it from
+    the event loop only.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._revalidations = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        Increases with every invalidation. Read it before loading a value and
+        pass it to `put`, so a load that raced with a write is not cached.
+        """
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None if it is absent or has expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry.expired:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry.value
+
+    def needs_revalidation(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expired
+
+    def revalidate(self, key: Hashable, version: Any) -> bool:
+        """
+        Compares an expired entry with the current version stamp of the
+        document. A match extends the entry by another TTL; otherwise the
+        entry is dropped. Returns whether the entry is still valid.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if version is None or entry.version != version:
+            self.invalidate(key)
+            return False
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        self._revalidations += 1
+        return True
+
+    def put(self, key: Hashable, value: Any, version: Any, size: int, generation: Optional[int] = None):
+        """
+        Caches a value, evicting the least recently used entries to stay within
+        bounds. Skipped when an invalidation happened after `generation` was read.
+        """
+        if generation is not None and generation != self._generation:
+            return
+        self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = CacheEntry(value, version, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._generation += 1
+        if self._remove(key):
+            self._invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the cache counters and current occupancy."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "revalidations": self._revalidations,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+        }
@@ -0,0 +1,132 @@
+# MDSAPP/core/storage/cold_store.py
+
+import gzip
+import json
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+from MDSAPP.core.storage.base import StorageBackend, json_default
+from MDSAPP.core.storage.compression import FieldCompressor, MissingChunksError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_COLLECTION = "casefiles_archive"
+DEFAULT_ARCHIVE_DIR = "mds_archive"
+# Attempts to read archived data whose chunks are being replaced concurrently.
+CHUNK_READ_ATTEMPTS = 3
+
+
+class ColdStore(ABC):
+    """
+    Compressed storage for the bulky parts of archived documents, read only
+    when an archived document is needed again. Blocking; call it from the
+    storage thread pool.
+    """
+    name: str = "abstract"
+
+    @abstractmethod
+    def put(self, doc_id: str, data: Dict[str, Any]):
+        """Stores (or replaces) the archived data of a document."""
+
+    @abstractmethod
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the archived data of a document, or None if there is none."""
+
+    @abstractmethod
+    def delete(self, doc_id: str):
+        """Removes the archived data of a document, if any."""
+
+
+class CollectionColdStore(ColdStore):
+    """
+    Keeps archived data as one zlib-compressed value per document in a
+    separate collection of the storage backend. Values that are too large
+    for a single document are split into chunk documents.
+    """
+    name = "collection"
+    _FIELD = "data"
+
+    def __init__(self, backend: StorageBackend, collection: str = DEFAULT_ARCHIVE_COLLECTION):
+        self.backend = backend
+        self.collection = collection
+        # Everything is compressed, however small.
+        self._compressor = FieldCompressor([self._FIELD], min_bytes=1)
+
+    def _chunks_collection(self, doc_id: str) -> str:
+        return f"{self.collection}/{doc_id}/chunks"
+
+    def put(self, doc_id: str, data: Dict[str, Any]):
+        stored, chunks = self._compressor.encode({self._FIELD: data}, uuid.uuid4().hex[:8])
+        previous = self.backend.get(self.collection, doc_id)
+        for chunk_id, chunk_data in chunks.items():
+            self.backend.set(self._chunks_collection(doc_id), chunk_id, chunk_data)
+        self.backend.set(self.collection, doc_id, stored)
+        for chunk_id in self._compressor.chunk_ids(previous or {}):
+            self.backend.delete(self._chunks_collection(doc_id), chunk_id)
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        for _ in range(CHUNK_READ_ATTEMPTS):
+            stored = self.backend.get(self.collection, doc_id)
+            if stored is None:
+                return None
+            chunk_ids = self._compressor.chunk_ids(stored)
+            chunks = self.backend.get_many(self._chunks_collection(doc_id), chunk_ids) if chunk_ids else None
+            try:
+                return self._compressor.decode(stored, chunks)[self._FIELD]
+            except MissingChunksError:
+                logger.info(f"Archived data of '{doc_id}' was replaced while reading; reading it again.")
+        raise MissingChunksError(f"Could not read a consistent version of the archived data of '{doc_id}'.")
+
+    def delete(self, doc_id: str):
+        if self.backend.delete(self.collection, doc_id):
+            self.backend.delete_collection(self._chunks_collection(doc_id))
+
+
+class FileColdStore(ColdStore):
+    """
+    Keeps archived data as gzip-compressed JSON files in a local directory,
+    so archived data does not grow the database of the embedded backend.
+    """
+    name = "files"
+
+    def __init__(self, directory: str = DEFAULT_ARCHIVE_DIR):
+        self.directory = directory
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, quote(doc_id, safe="") + ".json.gz")
+
+    def put(self, doc_id: str, data: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(doc_id)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, default=json_default, separators=(",", ":"))
+        # Readers see either the old or the new file, never a partial one.
+        os.replace(temp_path, path)
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with gzip.open(self._path(doc_id), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, doc_id: str):
+        try:
+            os.remove(self._path(doc_id))
+        except FileNotFoundError:
+            pass
+
+
+def create_cold_store(backend: StorageBackend) -> ColdStore:
+    """
+    Builds the cold store for a storage backend: local files next to the
+    embedded SQLite backend (MDS_ARCHIVE_DIR), a separate collection otherwise.
+    """
+    if backend.name == "sqlite":
+        return FileColdStore(os.getenv("MDS_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR))
+    return CollectionColdStore(backend)
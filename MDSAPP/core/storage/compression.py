@@ -0,0 +1,155 @@
+# MDSAPP/core/storage/compression.py
+
+import base64
+import json
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from MDSAPP.core.storage.base import json_default
+
+# Key that marks a stored field value as encoded by the FieldCompressor.
+CODEC_KEY = "__mds_codec__"
+CODEC_ZLIB = "zlib"
+
+DEFAULT_COMPRESS_MIN_BYTES = 16 * 1024
+# Compressed values above this size are moved into chunk documents. Several
+# inline values of this size still leave room under Firestore's 1 MiB cap.
+DEFAULT_CHUNK_BYTES = 128 * 1024
+
+
+class MissingChunksError(KeyError):
+    """A chunked field references chunk documents that were not found (e.g. rewritten meanwhile)."""
+
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, dict) and CODEC_KEY in value
+
+
+def chunk_id(field: str, token: str, index: int) -> str:
+    return f"{field}-{token}-{index:04d}"
+
+
+class FieldCompressor:
+    """
+    Encodes large top-level fields of stored documents. A value of one of
+    `fields` whose JSON is at least `min_bytes` is stored zlib-compressed
+    (base64, so every backend can hold it). A compressed value larger than
+    `chunk_bytes` is split into ordered chunk documents and the field keeps
+    only a reference to them. Values that are not encoded pass through, so
+    documents written before compression was enabled stay readable.
+    Thread-safe: encoding and decoding run on the storage thread pool.
+    """
+    def __init__(self, fields: Iterable[str], min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        self.fields = frozenset(fields)
+        self.min_bytes = min_bytes
+        self.chunk_bytes = chunk_bytes
+        self._lock = threading.Lock()
+        self._fields_compressed = 0
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+        self._chunks_written = 0
+        self._chunked_reads = 0
+        self._chunks_read = 0
+        self._chunk_bytes_read = 0
+        self._decode_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether new writes are compressed; decoding always works."""
+        return self.min_bytes > 0
+
+    def encode(self, data: Dict[str, Any], token: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """
+        Returns the document to store and the chunk documents (keyed by chunk
+        ID) that must be written along with it. `token` must be unique per
+        write, so the chunks of a rewrite never overwrite those still
+        referenced by the stored document.
+        """
+        stored = dict(data)
+        chunks = {}
+        if not self.enabled:
+            return stored, chunks
+        for field in self.fields.intersection(data):
+            value = data[field]
+            if value is None or is_encoded(value):
+                continue
+            raw = json.dumps(value, default=json_default, separators=(",", ":")).encode("utf-8")
+            if len(raw) < self.min_bytes:
+                continue
+            compressed = base64.b64encode(zlib.compress(raw)).decode("ascii")
+            if len(compressed) > self.chunk_bytes:
+                pieces = [compressed[i:i + self.chunk_bytes] for i in range(0, len(compressed), self.chunk_bytes)]
+                for index, piece in enumerate(pieces):
+                    chunks[chunk_id(field, token, index)] = {"field": field, "token": token, "index": index, "data": piece}
+                stored[field] = {CODEC_KEY: CODEC_ZLIB, "token": token, "chunks": len(pieces)}
+            else:
+                stored[field] = {CODEC_KEY: CODEC_ZLIB, "data": compressed}
+            with self._lock:
+                self._fields_compressed += 1
+                self._raw_bytes += len(raw)
+                self._stored_bytes += len(compressed)
+        with self._lock:
+            self._chunks_written += len(chunks)
+        return stored, chunks
+
+    def chunk_ids(self, data: Dict[str, Any]) -> List[str]:
+        """Returns the IDs of the chunk documents referenced by a stored document."""
+        ids = []
+        for field, value in data.items():
+            if is_encoded(value) and "chunks" in value:
+                ids.extend(chunk_id(field, value["token"], index) for index in range(value["chunks"]))
+        return ids
+
+    def decode(self, data: Dict[str, Any], chunks: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Returns the document with every encoded field restored. `chunks` must
+        hold the documents listed by `chunk_ids`; raises MissingChunksError
+        if one of them is absent.
+        """
+        started = time.perf_counter()
+        decoded = None
+        chunked = False
+        for field, value in data.items():
+            if not is_encoded(value):
+                continue
+            if decoded is None:
+                decoded = dict(data)
+            if "chunks" in value:
+                chunked = True
+                ids = [chunk_id(field, value["token"], index) for index in range(value["chunks"])]
+                missing = [id_ for id_ in ids if not chunks or id_ not in chunks]
+                if missing:
+                    raise MissingChunksError(f"Chunks {missing} of field '{field}' not found.")
+                compressed = "".join(chunks[id_]["data"] for id_ in ids)
+                with self._lock:
+                    self._chunks_read += len(ids)
+                    self._chunk_bytes_read += len(compressed)
+            else:
+                compressed = value["data"]
+            decoded[field] = json.loads(zlib.decompress(base64.b64decode(compressed)))
+        if decoded is None:
+            return data
+        with self._lock:
+            self._chunked_reads += int(chunked)
+            self._decode_seconds += time.perf_counter() - started
+        return decoded
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the compression counters: the ratio of raw to stored bytes,
+        and the extra reads and decompression time spent on loading.
+        """
+        with self._lock:
+            return {
+                "fields_compressed": self._fields_compressed,
+                "raw_bytes": self._raw_bytes,
+                "stored_bytes": self._stored_bytes,
+                "compression_ratio": round(self._raw_bytes / self._stored_bytes, 2) if self._stored_bytes else 0.0,
+                "chunks_written": self._chunks_written,
+                "chunked_reads": self._chunked_reads,
+                "chunks_read": self._chunks_read,
+                "chunk_bytes_read": self._chunk_bytes_read,
+                "decode_seconds": round(self._decode_seconds, 6),
+            }
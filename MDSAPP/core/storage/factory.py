@@ -0,0 +1,35 @@
+# MDSAPP/core/storage/factory.py
+
+import logging
+import os
+from typing import Optional
+
+from MDSAPP.core.storage.base import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE_BACKEND = "firestore"
+DEFAULT_SQLITE_PATH = "mds_local.db"
+DEFAULT_CHANGE_POLL_MS = 1000
+
+
+def create_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    """
+    Builds the storage backend selected by `name`, or by the
+    MDS_STORAGE_BACKEND environment variable ("firestore" or "sqlite").
+    The Firestore client library is only imported when it is selected.
+    """
+    name = (name or os.getenv("MDS_STORAGE_BACKEND", DEFAULT_STORAGE_BACKEND)).lower()
+    logger.info(f"Using '{name}' storage backend.")
+
+    if name == "firestore":
+        from MDSAPP.core.storage.firestore_backend import FirestoreBackend
+        return FirestoreBackend()
+    if name == "sqlite":
+        from MDSAPP.core.storage.sqlite_backend import SqliteBackend
+        return SqliteBackend(
+            path=os.getenv("MDS_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+            change_poll_seconds=int(os.getenv("MDS_CHANGE_FEED_POLL_MS", DEFAULT_CHANGE_POLL_MS)) / 1000,
+        )
+
+    raise ValueError(f"Unknown storage backend '{name}'. Must be one of ['firestore', 'sqlite'].")
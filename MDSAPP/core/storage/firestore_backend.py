@@ -0,0 +1,288 @@
+# MDSAPP/core/storage/firestore_backend.py
+
+import datetime
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.field_path import FieldPath as FirestoreFieldPath
+
+from MDSAPP.core.storage.base import (
+    StorageBackend, StorageTransaction, T, FieldPath, Filter, ArrayUnion, DELETE_FIELD, SERVER_TIMESTAMP,
+    ConditionalWrite, WriteConflict, ChangeCallback, field_path_segments,
+)
+
+logger = logging.getLogger(__name__)
+
+# Writers add one small marker per commit to this collection, listing the
+# documents it changed; change feeds listen to the markers instead of
+# streaming the watched collections themselves.
+CHANGE_LOG_COLLECTION = "_changes"
+# Markers carry an `expire_at` for a Firestore TTL policy to remove them by.
+CHANGE_MARKER_RETENTION = datetime.timedelta(days=1)
+
+
+def _to_firestore_updates(updates: Dict[FieldPath, Any]) -> Dict[str, Any]:
+    """Translates backend-neutral field paths and sentinels to their Firestore equivalents."""
+    firestore_updates = {}
+    for field_path, value in updates.items():
+        if isinstance(value, ArrayUnion):
+            value = firestore.ArrayUnion(value.values)
+        elif value is DELETE_FIELD:
+            value = firestore.DELETE_FIELD
+        elif value is SERVER_TIMESTAMP:
+            value = firestore.SERVER_TIMESTAMP
+        firestore_updates[FirestoreFieldPath(*field_path_segments(field_path)).to_api_repr()] = value
+    return firestore_updates
+
+
+class _FirestoreTransaction(StorageTransaction):
+    def __init__(self, client, transaction, logged_collections):
+        self._client = client
+        self._transaction = transaction
+        self._logged_collections = logged_collections
+        # Written documents of logged collections, for the change marker.
+        self.changed: List[Tuple[str, str]] = []
+
+    def _record(self, collection: str, doc_id: str):
+        if collection in self._logged_collections:
+            self.changed.append((collection, doc_id))
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self._client.collection(collection).document(doc_id).get(transaction=self._transaction)
+        return doc.to_dict() if doc.exists else None
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        self._transaction.set(self._client.collection(collection).document(doc_id), data)
+        self._record(collection, doc_id)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any]):
+        self._transaction.update(self._client.collection(collection).document(doc_id), _to_firestore_updates(updates))
+        self._record(collection, doc_id)
+
+    def delete(self, collection: str, doc_id: str):
+        self._transaction.delete(self._client.collection(collection).document(doc_id))
+        self._record(collection, doc_id)
+
+
+class FirestoreBackend(StorageBackend):
+    """
+    Stores documents in Google Cloud Firestore. The connection is opened
+    lazily on first use with Application Default Credentials.
+    """
+    name = "firestore"
+
+    def __init__(self):
+        self._db = None
+        self._logged_collections = frozenset()
+
+    def _connect(self):
+        try:
+            if not firebase_admin._apps:
+                project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+                if not project_id:
+                    raise ValueError("GOOGLE_CLOUD_PROJECT environment variable not set.")
+                cred = credentials.ApplicationDefault()
+                firebase_admin.initialize_app(cred, {
+                    'projectId': project_id,
+                })
+            self._db = firestore.client()
+            logger.info("Successfully connected to Firestore.")
+        except Exception as e:
+            logger.error(f"Error connecting to Firestore: {e}", exc_info=True)
+            raise
+
+    @property
+    def client(self):
+        if not self._db:
+            self._connect()
+        return self._db
+
+    def get(self, collection: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        doc = self.client.collection(collection).document(doc_id).get(field_paths=fields)
+        return doc.to_dict() if doc.exists else None
+
+    def get_versioned(self, collection: str, doc_id: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+        doc = self.client.collection(collection).document(doc_id).get()
+        return (doc.to_dict(), doc.update_time) if doc.exists else None
+
+    def get_many(self, collection: str, doc_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        if not doc_ids:
+            return {}
+        collection_ref = self.client.collection(collection)
+        doc_refs = [collection_ref.document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+        return {doc.id: doc.to_dict() for doc in self.client.get_all(doc_refs, field_paths=fields) if doc.exists}
+
+    def get_many_versioned(self, collection: str, doc_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], Any]]:
+        if not doc_ids:
+            return {}
+        collection_ref = self.client.collection(collection)
+        doc_refs = [collection_ref.document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+        return {doc.id: (doc.to_dict(), doc.update_time) for doc in self.client.get_all(doc_refs) if doc.exists}
+
+    def _add_change_marker(self, batch, changed: List[Tuple[str, str]]):
+        """Adds the change marker of the logged documents among `changed` to a batch or transaction."""
+        changed = [(collection, doc_id) for collection, doc_id in changed if collection in self._logged_collections]
+        if not changed:
+            return
+        batch.set(self.client.collection(CHANGE_LOG_COLLECTION).document(uuid.uuid4().hex), {
+            "documents": [{"collection": collection, "id": doc_id} for collection, doc_id in changed],
+            "changed_at": firestore.SERVER_TIMESTAMP,
+            "expire_at": datetime.datetime.now(datetime.timezone.utc) + CHANGE_MARKER_RETENTION,
+        })
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        batch = self.client.batch()
+        batch.set(self.client.collection(collection).document(doc_id), data)
+        self._add_change_marker(batch, [(collection, doc_id)])
+        batch.commit()
+
+    def set_many(
+        self, collection: str, documents: List[Tuple[str, Dict[str, Any]]], batch_size: int = 500, parallelism: int = 1
+    ) -> int:
+        # A Firestore write batch holds at most 500 writes, one of which may be the change marker.
+        batch_size = min(batch_size, 499 if collection in self._logged_collections else 500)
+        collection_ref = self.client.collection(collection)
+
+        def _commit(batch_documents):
+            batch = self.client.batch()
+            for doc_id, data in batch_documents:
+                batch.set(collection_ref.document(doc_id), data)
+            self._add_change_marker(batch, [(collection, doc_id) for doc_id, _ in batch_documents])
+            batch.commit()
+
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+        if parallelism <= 1 or len(batches) <= 1:
+            for batch_documents in batches:
+                _commit(batch_documents)
+        else:
+            with ThreadPoolExecutor(max_workers=min(parallelism, len(batches)), thread_name_prefix="mds-bulk") as pool:
+                # list() surfaces the first failed commit.
+                list(pool.map(_commit, batches))
+        return len(documents)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any], if_version: Any = None) -> bool:
+        option = self.client.write_option(last_update_time=if_version) if if_version is not None else None
+        batch = self.client.batch()
+        batch.update(self.client.collection(collection).document(doc_id), _to_firestore_updates(updates), option=option)
+        self._add_change_marker(batch, [(collection, doc_id)])
+        try:
+            batch.commit()
+        except NotFound:
+            return False
+        except FailedPrecondition as e:
+            raise WriteConflict(f"Document '{collection}/{doc_id}' changed after it was read.") from e
+        return True
+
+    def delete(self, collection: str, doc_id: str) -> bool:
+        doc_ref = self.client.collection(collection).document(doc_id)
+        if not doc_ref.get().exists:
+            return False
+        batch = self.client.batch()
+        batch.delete(doc_ref)
+        self._add_change_marker(batch, [(collection, doc_id)])
+        batch.commit()
+        return True
+
+    def write_conditional(self, collection: str, writes: List[ConditionalWrite]):
+        collection_ref = self.client.collection(collection)
+        batch = self.client.batch()
+        for doc_id, data, if_version in writes:
+            doc_ref = collection_ref.document(doc_id)
+            if if_version is None:
+                batch.create(doc_ref, data)
+                continue
+            option = self.client.write_option(last_update_time=if_version)
+            if data is None:
+                batch.delete(doc_ref, option=option)
+            else:
+                batch.update(doc_ref, _to_firestore_updates(data), option=option)
+        self._add_change_marker(batch, [(collection, doc_id) for doc_id, _, _ in writes])
+        try:
+            batch.commit()
+        except (AlreadyExists, FailedPrecondition, NotFound) as e:
+            raise WriteConflict(f"A document of '{collection}' changed after it was read.") from e
+
+    def stream(self, collection: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for doc in self.client.collection(collection).stream():
+            yield doc.id, doc.to_dict()
+
+    def query(
+        self,
+        collection: str,
+        filters: Optional[List[Filter]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        start_after: Any = None,
+        limit: Optional[int] = None,
+        select: Optional[List[str]] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        query = self.client.collection(collection)
+        for field, op, value in filters or []:
+            query = query.where(filter=FieldFilter(field, op, value))
+        if select is not None:
+            query = query.select(select)
+        if order_by:
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query = query.order_by(order_by, direction=direction)
+            if isinstance(start_after, tuple):
+                value, after_id = start_after
+                query = query.order_by("__name__", direction=direction)
+                query = query.start_after({order_by: value, "__name__": self.client.collection(collection).document(after_id)})
+            elif start_after is not None:
+                query = query.start_after({order_by: start_after})
+        if limit is not None:
+            query = query.limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def delete_collection(self, collection: str) -> int:
+        deleted = 0
+        batch = self.client.batch()
+        for doc_ref in self.client.collection(collection).list_documents():
+            batch.delete(doc_ref)
+            deleted += 1
+            if deleted % 500 == 0:
+                batch.commit()
+                batch = self.client.batch()
+        batch.commit()
+        return deleted
+
+    def run_transaction(self, fn: Callable[[StorageTransaction], T]) -> T:
+        transaction = self.client.transaction()
+
+        @firestore.transactional
+        def _run(transaction):
+            recorder = _FirestoreTransaction(self.client, transaction, self._logged_collections)
+            result = fn(recorder)
+            self._add_change_marker(transaction, recorder.changed)
+            return result
+
+        return _run(transaction)
+
+    def log_changes(self, collections: List[str]):
+        self._logged_collections = self._logged_collections | frozenset(collections)
+
+    def watch(self, collections: List[str], callback: ChangeCallback) -> Callable[[], None]:
+        # Listens to the change markers written from now on, not to the
+        # collections: only document IDs are sent, never whole documents.
+        # The listener reconnects by itself.
+        watched = set(collections)
+        since = datetime.datetime.now(datetime.timezone.utc)
+
+        def _on_snapshot(_docs, changes, _read_time):
+            for change in changes:
+                if change.type.name != "ADDED":
+                    continue  # The server timestamp of a marker being set, or its expiry.
+                for document in (change.document.to_dict() or {}).get("documents", []):
+                    if document.get("collection") in watched:
+                        callback(document["collection"], document.get("id"))
+
+        query = self.client.collection(CHANGE_LOG_COLLECTION).where(filter=FieldFilter("changed_at", ">=", since))
+        marker_watch = query.on_snapshot(_on_snapshot)
+        return marker_watch.unsubscribe
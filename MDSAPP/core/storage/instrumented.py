@@ -0,0 +1,250 @@
+# MDSAPP/core/storage/instrumented.py
+
+import json
+import random
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from MDSAPP.core.storage.base import (
+    StorageBackend, StorageTransaction, T, FieldPath, Filter, ConditionalWrite, WriteConflict, ChangeCallback,
+    field_path_segments, json_default,
+)
+from MDSAPP.core.storage.metrics import MetricsSink
+
+OPERATION_SECONDS = "mds_storage_operation_seconds"
+DOCUMENTS_TOTAL = "mds_storage_documents_total"
+DOCUMENT_BYTES = "mds_storage_document_bytes"
+FIELD_BYTES = "mds_storage_field_bytes"
+ERRORS_TOTAL = "mds_storage_errors_total"
+WRITE_CONFLICTS_TOTAL = "mds_storage_write_conflicts_total"
+
+
+def collection_label(collection: str) -> str:
+    """
+    Drops the parent document IDs from a subcollection path, so e.g.
+    "casefiles/case-1/events" is labelled "casefiles/events" and label
+    cardinality stays bounded.
+    """
+    return "/".join(collection.split("/")[::2])
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, default=json_default, separators=(",", ":")))
+
+
+class _Measurement:
+    """
+    Times one storage call and records it when the block exits. The clock
+    stops at the first `count`, so measuring sizes is not part of the latency.
+    """
+    __slots__ = ("backend", "labels", "started", "ended")
+
+    def __init__(self, backend: "InstrumentedBackend", collection: str, operation: str):
+        self.backend = backend
+        self.labels = {"collection": collection_label(collection), "operation": operation}
+        self.ended = None
+
+    def __enter__(self) -> "_Measurement":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics = self.backend.metrics
+        metrics.observe(OPERATION_SECONDS, (self.ended or time.perf_counter()) - self.started, self.labels)
+        if exc_type is WriteConflict:
+            metrics.increment(WRITE_CONFLICTS_TOTAL, labels={"collection": self.labels["collection"]})
+        elif exc_type is not None:
+            metrics.increment(ERRORS_TOTAL, labels=self.labels)
+
+    def count(self, documents: int):
+        if self.ended is None:
+            self.ended = time.perf_counter()
+        if documents:
+            self.backend.metrics.increment(DOCUMENTS_TOTAL, documents, self.labels)
+
+    def documents(self, docs: List[Dict[str, Any]]):
+        """Counts the documents read or written, and samples their sizes."""
+        metrics = self.backend.metrics
+        self.count(len(docs))
+        for data in docs:
+            if self.backend.sampled():
+                metrics.observe(DOCUMENT_BYTES, _json_size(data), self.labels)
+
+    def fields(self, data: Dict[FieldPath, Any]):
+        """
+        Counts one written document and samples the size of each of its
+        top-level fields; the document size is their sum, so the
+        document is serialized only once.
+        """
+        metrics = self.backend.metrics
+        self.count(1)
+        if not self.backend.sampled():
+            return
+        total = 0
+        for field_path, value in data.items():
+            try:
+                size = _json_size(value)
+            except TypeError:
+                continue  # A storage sentinel such as DELETE_FIELD.
+            total += size
+            metrics.observe(FIELD_BYTES, size, {**self.labels, "field": field_path_segments(field_path)[0]})
+        metrics.observe(DOCUMENT_BYTES, total, self.labels)
+
+
+class _InstrumentedTransaction(StorageTransaction):
+    def __init__(self, backend: "InstrumentedBackend", transaction: StorageTransaction):
+        self._backend = backend
+        self._transaction = transaction
+
+    def get(self, collection: str, doc_id: str):
+        with _Measurement(self._backend, collection, "transaction_get") as measurement:
+            data = self._transaction.get(collection, doc_id)
+            measurement.documents([data] if data is not None else [])
+            return data
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        with _Measurement(self._backend, collection, "transaction_set") as measurement:
+            self._transaction.set(collection, doc_id, data)
+            measurement.fields(data)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any]):
+        with _Measurement(self._backend, collection, "transaction_update") as measurement:
+            self._transaction.update(collection, doc_id, updates)
+            measurement.fields(updates)
+
+    def delete(self, collection: str, doc_id: str):
+        with _Measurement(self._backend, collection, "transaction_delete") as measurement:
+            self._transaction.delete(collection, doc_id)
+            measurement.count(1)
+
+
+class InstrumentedBackend(StorageBackend):
+    """
+    Wraps a storage backend and records, per collection and operation, the
+    latency of every call, the number of documents read and written, and
+    document and field sizes. Sizes cost a serialization, so they are
+    measured for a `size_sample_rate` fraction of the calls only.
+    """
+
+    def __init__(self, backend: StorageBackend, metrics: MetricsSink, size_sample_rate: float = 1.0):
+        self.backend = backend
+        self.metrics = metrics
+        self.size_sample_rate = size_sample_rate
+        self.name = backend.name
+
+    @property
+    def client(self) -> Any:
+        return self.backend.client
+
+    def sampled(self) -> bool:
+        return self.size_sample_rate >= 1 or random.random() < self.size_sample_rate
+
+    def get(self, collection: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        with _Measurement(self, collection, "get") as measurement:
+            data = self.backend.get(collection, doc_id, fields)
+            measurement.documents([data] if data is not None else [])
+            return data
+
+    def get_versioned(self, collection: str, doc_id: str) -> Optional[Tuple[Dict[str, Any], Any]]:
+        with _Measurement(self, collection, "get") as measurement:
+            versioned = self.backend.get_versioned(collection, doc_id)
+            measurement.documents([versioned[0]] if versioned is not None else [])
+            return versioned
+
+    def get_many(self, collection: str, doc_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        with _Measurement(self, collection, "get_many") as measurement:
+            docs = self.backend.get_many(collection, doc_ids, fields)
+            measurement.documents(list(docs.values()))
+            return docs
+
+    def get_many_versioned(self, collection: str, doc_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], Any]]:
+        with _Measurement(self, collection, "get_many") as measurement:
+            versioned = self.backend.get_many_versioned(collection, doc_ids)
+            measurement.documents([data for data, _ in versioned.values()])
+            return versioned
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        with _Measurement(self, collection, "set") as measurement:
+            self.backend.set(collection, doc_id, data)
+            measurement.fields(data)
+
+    def set_many(
+        self, collection: str, documents: List[Tuple[str, Dict[str, Any]]], batch_size: int = 500, parallelism: int = 1
+    ) -> int:
+        with _Measurement(self, collection, "set_many") as measurement:
+            written = self.backend.set_many(collection, documents, batch_size=batch_size, parallelism=parallelism)
+            measurement.documents([data for _, data in documents])
+            return written
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any], if_version: Any = None) -> bool:
+        with _Measurement(self, collection, "update") as measurement:
+            updated = self.backend.update(collection, doc_id, updates, if_version)
+            if updated:
+                measurement.fields(updates)
+            return updated
+
+    def delete(self, collection: str, doc_id: str) -> bool:
+        with _Measurement(self, collection, "delete") as measurement:
+            deleted = self.backend.delete(collection, doc_id)
+            measurement.count(int(deleted))
+            return deleted
+
+    def write_conditional(self, collection: str, writes: List[ConditionalWrite]):
+        with _Measurement(self, collection, "write_conditional") as measurement:
+            self.backend.write_conditional(collection, writes)
+            measurement.count(sum(data is None for _, data, _ in writes))
+            for _, data, _ in writes:
+                if data is not None:
+                    measurement.fields(data)
+
+    def stream(self, collection: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # Timed until the stream is exhausted or closed, as its reads are
+        # lazy; document sizes are not sampled.
+        with _Measurement(self, collection, "stream") as measurement:
+            documents = 0
+            for doc_id, data in self.backend.stream(collection):
+                documents += 1
+                yield doc_id, data
+            measurement.count(documents)
+
+    def query(
+        self,
+        collection: str,
+        filters: Optional[List[Filter]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        start_after: Any = None,
+        limit: Optional[int] = None,
+        select: Optional[List[str]] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        with _Measurement(self, collection, "query") as measurement:
+            docs = self.backend.query(
+                collection, filters=filters, order_by=order_by, descending=descending,
+                start_after=start_after, limit=limit, select=select,
+            )
+            measurement.documents([data for _, data in docs])
+            return docs
+
+    def delete_collection(self, collection: str) -> int:
+        with _Measurement(self, collection, "delete_collection") as measurement:
+            deleted = self.backend.delete_collection(collection)
+            measurement.count(deleted)
+            return deleted
+
+    def run_transaction(self, fn: Callable[[StorageTransaction], T]) -> T:
+        # Spans collections; the reads and writes inside are labelled individually.
+        with _Measurement(self, "*", "transaction"):
+            return self.backend.run_transaction(lambda transaction: fn(_InstrumentedTransaction(self, transaction)))
+
+    def log_changes(self, collections: List[str]):
+        self.backend.log_changes(collections)
+
+    def watch(self, collections: List[str], callback: ChangeCallback) -> Callable[[], None]:
+        def _counted(collection: str, doc_id: Optional[str]):
+            self.metrics.increment(DOCUMENTS_TOTAL, labels={"collection": collection_label(collection), "operation": "watch"})
+            callback(collection, doc_id)
+
+        return self.backend.watch(collections, _counted)
+
+    def close(self):
+        self.backend.close()
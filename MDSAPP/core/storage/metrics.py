@@ -0,0 +1,191 @@
+# MDSAPP/core/storage/metrics.py
+
+import bisect
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histograms, in seconds.
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the size histograms, in bytes; Firestore documents are limited to 1 MiB.
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A sample in the Prometheus exposition format: (name, labels, value).
+Sample = Tuple[str, Labels, float]
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsSink(ABC):
+    """
+    Receives the measurements of the storage layer. Histogram names end in
+    `_seconds` or `_bytes`; counter names end in `_total`. Implementations
+    must be thread-safe: storage calls run on a thread pool.
+    """
+
+    @abstractmethod
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        """Records one observation of a histogram."""
+
+    @abstractmethod
+    def increment(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        """Adds to a counter."""
+
+    def samples(self) -> List[Sample]:
+        """Returns the current values for export; sinks that push elsewhere return nothing."""
+        return []
+
+
+class NullMetricsSink(MetricsSink):
+    """Discards every measurement (MDS_STORAGE_METRICS=0)."""
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        pass
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        pass
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.bounds):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """
+    Keeps counters and fixed-bucket histograms in process memory, for the
+    Prometheus exporter. Memory is bounded by the number of label
+    combinations, not by the number of observations.
+    """
+
+    def __init__(
+        self,
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+    ):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+
+    def _buckets_for(self, name: str) -> Sequence[float]:
+        return self.size_buckets if name.endswith("_bytes") else self.latency_buckets
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self._buckets_for(name))
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def histogram(self, name: str, labels: Optional[Dict[str, str]] = None) -> Tuple[int, float]:
+        """Returns (count, sum) of a histogram; (0, 0.0) if nothing was observed."""
+        with self._lock:
+            histogram = self._histograms.get((name, _labels(labels)))
+            return (histogram.count, histogram.sum) if histogram else (0, 0.0)
+
+    def counter(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._counters.get((name, _labels(labels)), 0)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                samples.append((name, labels, value))
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    samples.append((f"{name}_bucket", labels + (("le", _format_value(bound)),), cumulative))
+                samples.append((f"{name}_bucket", labels + (("le", "+Inf"),), histogram.count))
+                samples.append((f"{name}_count", labels, histogram.count))
+                samples.append((f"{name}_sum", labels, histogram.sum))
+        return samples
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _metric_type(name: str, histograms: set) -> str:
+    return "histogram" if name in histograms else "counter" if name.endswith("_total") else "gauge"
+
+
+class PrometheusTextExporter:
+    """
+    Renders the samples of a metrics sink, plus gauges read from stats
+    callables (e.g. `DatabaseManager.executor_stats`), in the Prometheus
+    text exposition format. Collectors are read at render time, so the
+    gauges always show current values.
+    """
+
+    def __init__(self, sink: MetricsSink, prefix: str = "mds"):
+        self.sink = sink
+        self.prefix = prefix
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, object]]]] = []
+
+    def add_collector(self, subsystem: str, stats: Callable[[], Dict[str, object]]):
+        """Exports every numeric value of `stats()` as the gauge `{prefix}_{subsystem}_{key}`."""
+        self._collectors.append((subsystem, stats))
+
+    def _gauges(self) -> Iterable[Sample]:
+        for subsystem, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield f"{self.prefix}_{subsystem}_{key}", (), value
+
+    def render(self) -> str:
+        samples = list(self.sink.samples())
+        histograms = {name[:-len("_count")] for name, _, _ in samples if name.endswith("_count")}
+        samples.extend(self._gauges())
+        lines = []
+        declared = set()
+        for name, labels, value in samples:
+            family = next((name[:-len(suffix)] for suffix in ("_bucket", "_count", "_sum")
+                           if name.endswith(suffix) and name[:-len(suffix)] in histograms), name)
+            if family not in declared:
+                declared.add(family)
+                lines.append(f"# TYPE {family} {_metric_type(family, histograms)}")
+            label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels)
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text else f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics_sink() -> MetricsSink:
+    """Builds the in-memory sink, or the null sink when MDS_STORAGE_METRICS=0."""
+    if os.getenv("MDS_STORAGE_METRICS", "1") == "0":
+        return NullMetricsSink()
+    return InMemoryMetricsSink()
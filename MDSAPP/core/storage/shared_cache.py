@@ -0,0 +1,234 @@
+# MDSAPP/core/storage/shared_cache.py
+
+import json
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from MDSAPP.core.storage.base import json_default
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_CACHE_TTL_SECONDS = 300
+# Format byte in front of every cached value, so the encoding can change later.
+ENCODING_ZLIB_JSON = b"\x01"
+
+
+def encode_value(value: Any) -> bytes:
+    """Encodes a JSON-compatible value as compact, zlib-compressed JSON."""
+    raw = json.dumps(value, default=json_default, separators=(",", ":")).encode("utf-8")
+    return ENCODING_ZLIB_JSON + zlib.compress(raw)
+
+
+def decode_value(payload: bytes) -> Any:
+    if payload[:1] != ENCODING_ZLIB_JSON:
+        raise ValueError(f"Unknown shared cache encoding {payload[:1]!r}.")
+    return json.loads(zlib.decompress(payload[1:]))
+
+
+class SharedCache:
+    """
+    A second-level cache shared by all API processes and Celery workers,
+    kept in Redis. Every key has a version counter that writers increment
+    after changing the stored document; values are stored under the
+    version they were read at. A reader that raced with a write therefore
+    fills a version nobody looks up anymore, instead of caching stale data.
+    Values expire after `ttl_seconds`. Redis errors never fail a request:
+    they are logged and the caller falls back to storage.
+    Blocking; call it from the storage thread pool.
+    """
+    def __init__(self, client, ttl_seconds: float = DEFAULT_SHARED_CACHE_TTL_SECONDS, prefix: str = "mds"):
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._fills = 0
+        self._invalidations = 0
+        self._errors = 0
+        self._bytes_read = 0
+        self._bytes_written = 0
+
+    def _version_key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}:version"
+
+    def _value_key(self, namespace: str, key: str, version: int) -> str:
+        return f"{self.prefix}:{namespace}:{key}:v{version}"
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def lookup(self, namespace: str, key: str) -> Tuple[Optional[Any], Optional[int]]:
+        """
+        Returns (value, version). The value is None on a miss; pass the
+        version to `fill` along with the value read from storage. The
+        version is None if Redis is unavailable, in which case `fill` is
+        skipped.
+        """
+        try:
+            version = int(self.client.get(self._version_key(namespace, key)) or 0)
+            payload = self.client.get(self._value_key(namespace, key, version))
+            value = decode_value(payload) if payload is not None else None
+        except Exception as e:
+            self._count("_errors")
+            logger.warning(f"Shared cache lookup of '{namespace}:{key}' failed: {e}")
+            return None, None
+        if payload is None:
+            self._count("_misses")
+            return None, version
+        self._count("_hits")
+        self._count("_bytes_read", len(payload))
+        return value, version
+
+    def fill(self, namespace: str, key: str, value: Any, version: Optional[int]):
+        """Caches a value read from storage at the version returned by `lookup`."""
+        if version is None:
+            return
+        payload = encode_value(value)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(self._value_key(namespace, key, version), payload, ex=self.ttl_seconds)
+            # The version counter outlives every value stored under it; a
+            # counter that expires restarts at 0 only once those are gone.
+            pipe.expire(self._version_key(namespace, key), 2 * self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            self._count("_errors")
+            logger.warning(f"Shared cache fill of '{namespace}:{key}' failed: {e}")
+            return
+        self._count("_fills")
+        self._count("_bytes_written", len(payload))
+
+    def invalidate(self, namespace: str, key: str) -> Optional[int]:
+        """
+        Moves the key to a new version, so all cached values of it are
+        ignored. Must be called after the stored document has changed.
+        Returns the new version, or None if Redis is unavailable.
+        """
+        version_key = self._version_key(namespace, key)
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.incr(version_key)
+            pipe.expire(version_key, 2 * self.ttl_seconds)
+            version = pipe.execute()[0]
+        except Exception as e:
+            self._count("_errors")
+            logger.error(f"Shared cache invalidation of '{namespace}:{key}' failed; it may be stale for up to {self.ttl_seconds}s: {e}")
+            return None
+        self._count("_invalidations")
+        return int(version)
+
+    def store(self, namespace: str, key: str, value: Any):
+        """Write-through after a full write of the stored document: invalidates, then caches `value`."""
+        self.fill(namespace, key, value, self.invalidate(namespace, key))
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the bytes moved to and from Redis."""
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "fills": self._fills,
+                "invalidations": self._invalidations,
+                "errors": self._errors,
+                "bytes_read": self._bytes_read,
+                "bytes_written": self._bytes_written,
+            }
+
+
+class InMemoryRedis:
+    """
+    A minimal in-process stand-in for a Redis client, covering the commands
+    SharedCache uses (GET, SET with EX, INCR, EXPIRE, DELETE and pipelines).
+    For tests and single-process development.
+    """
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.RLock()
+
+    def _live(self, name: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+
+    def set(self, name: str, value: Any, ex: Optional[int] = None) -> bool:
+        if not isinstance(value, bytes):
+            value = str(value).encode("utf-8")
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, name: str) -> int:
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[name] = (str(value).encode("utf-8"), entry[1] if entry else None)
+            return value
+
+    def expire(self, name: str, seconds: int) -> bool:
+        with self._lock:
+            entry = self._live(name)
+            if entry is None:
+                return False
+            self._data[name] = (entry[0], time.monotonic() + seconds)
+            return True
+
+    def delete(self, *names: str) -> int:
+        deleted = 0
+        with self._lock:
+            for name in names:
+                if self._live(name):
+                    del self._data[name]
+                    deleted += 1
+        return deleted
+
+    def pipeline(self, transaction: bool = True) -> "_InMemoryPipeline":
+        return _InMemoryPipeline(self)
+
+
+class _InMemoryPipeline:
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, command: str):
+        def _queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return _queue
+
+    def execute(self) -> List[Any]:
+        # Holding the client lock makes the queued commands atomic, like MULTI/EXEC.
+        with self._client._lock:
+            results = [getattr(self._client, command)(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+def create_shared_cache(url: Optional[str], ttl_seconds: float = DEFAULT_SHARED_CACHE_TTL_SECONDS) -> Optional[SharedCache]:
+    """
+    Builds the shared cache for a Redis URL, or for "memory://" the
+    in-process stand-in. Returns None when no URL is configured. The redis
+    client library is only imported when it is used.
+    """
+    if not url:
+        return None
+    if url == "memory://":
+        client = InMemoryRedis()
+    else:
+        import redis
+        client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+    logger.info(f"Shared casefile cache enabled with a {ttl_seconds}s TTL.")
+    return SharedCache(client, ttl_seconds=ttl_seconds)
@@ -0,0 +1,374 @@
+# MDSAPP/core/storage/sqlite_backend.py
+
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from MDSAPP.core.storage.base import (
+    StorageBackend, StorageTransaction, T, FieldPath, Filter, QUERY_OPERATORS, ConditionalWrite, WriteConflict,
+    ChangeCallback, apply_updates, json_default,
+)
+
+logger = logging.getLogger(__name__)
+
+# Stays well below SQLite's limit on bound parameters per statement.
+MAX_IN_CLAUSE_SIZE = 500
+DEFAULT_CHANGE_POLL_SECONDS = 1.0
+# Rows kept in the change log; a watcher that falls further behind than this
+# is told that it may have missed changes.
+CHANGE_LOG_RETENTION = 10000
+
+
+def _encode(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=json_default, separators=(",", ":"))
+
+
+def _json_path(field: str) -> str:
+    return "$." + ".".join(json.dumps(segment) for segment in field.split("."))
+
+
+def _sql_value(value: Any) -> Any:
+    """Converts a filter value to what json_extract returns for it."""
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()  # Stored the same way by `_encode`.
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return _encode(value)
+    return value
+
+
+def _filter_clause(field: str, op: str, value: Any) -> Tuple[str, List[Any]]:
+    if op not in QUERY_OPERATORS:
+        raise ValueError(f"Unsupported query operator '{op}'.")
+    column = "json_extract(data, ?)"
+    if op == "array_contains":
+        return (
+            "EXISTS (SELECT 1 FROM json_each(data, ?) WHERE json_each.value = ?)",
+            [_json_path(field), _sql_value(value)],
+        )
+    if op == "in":
+        values = [_sql_value(v) for v in value]
+        placeholders = ", ".join("?" for _ in values) or "NULL"
+        return f"{column} IN ({placeholders})", [_json_path(field), *values]
+    if value is None and op in ("==", "!="):
+        return f"{column} {'IS' if op == '==' else 'IS NOT'} NULL", [_json_path(field)]
+    return f"{column} {op.replace('==', '=')} ?", [_json_path(field), _sql_value(value)]
+
+
+class _SqliteTransaction(StorageTransaction):
+    def __init__(self, backend: "SqliteBackend", conn: sqlite3.Connection):
+        self._backend = backend
+        self._conn = conn
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self._backend._get(self._conn, collection, doc_id)
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        self._backend._set(self._conn, collection, doc_id, data)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any]):
+        if not self._backend._update(self._conn, collection, doc_id, updates):
+            raise KeyError(f"Document '{collection}/{doc_id}' does not exist.")
+
+    def delete(self, collection: str, doc_id: str):
+        self._backend._delete(self._conn, collection, doc_id)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    An embedded, single-node document store on top of SQLite in WAL mode.
+    Every document is a JSON blob keyed by (collection, id). Each thread
+    gets its own connection; WAL lets readers proceed while a writer holds
+    the lock.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str = "mds_local.db", change_poll_seconds: float = DEFAULT_CHANGE_POLL_SECONDS):
+        self.path = path
+        self.change_poll_seconds = change_poll_seconds
+        self._local = threading.local()
+        self._init_schema()
+        logger.info(f"SQLite storage backend initialized at '{self.path}'.")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None leaves transaction control to us (BEGIN/COMMIT).
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (collection, id)
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "version" not in columns:
+            # Databases created before documents were versioned.
+            conn.execute("ALTER TABLE documents ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        # Change log of top-level documents, filled by triggers so that every
+        # write path (including other processes) is covered. It backs `watch`
+        # and trims itself to the last CHANGE_LOG_RETENTION rows.
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL
+            )
+            """
+        )
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS documents_{event.lower()}_change AFTER {event} ON documents
+                WHEN instr({row}.collection, '/') = 0
+                BEGIN
+                    INSERT INTO changes (collection, id) VALUES ({row}.collection, {row}.id);
+                    DELETE FROM changes WHERE seq <= last_insert_rowid() - {CHANGE_LOG_RETENTION};
+                END
+                """
+            )
+
+    def _get(self, conn: sqlite3.Connection, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, conn: sqlite3.Connection, collection: str, doc_id: str, data: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO documents (collection, id, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(collection, id) DO UPDATE SET data = excluded.data, version = version + 1",
+            (collection, doc_id, _encode(data)),
+        )
+
+    def _get_versioned(self, conn: sqlite3.Connection, collection: str, doc_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        row = conn.execute(
+            "SELECT data, version FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _update(
+        self, conn: sqlite3.Connection, collection: str, doc_id: str, updates: Dict[FieldPath, Any], if_version: Any = None
+    ) -> bool:
+        versioned = self._get_versioned(conn, collection, doc_id)
+        if versioned is None:
+            return False
+        data, version = versioned
+        if if_version is not None and version != if_version:
+            raise WriteConflict(f"Document '{collection}/{doc_id}' changed after it was read.")
+        apply_updates(data, updates)
+        self._set(conn, collection, doc_id, data)
+        return True
+
+    def _delete(self, conn: sqlite3.Connection, collection: str, doc_id: str) -> bool:
+        cursor = conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+        return cursor.rowcount > 0
+
+    def get(self, collection: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        data = self._get(self._connection(), collection, doc_id)
+        if data is not None and fields is not None:
+            data = {field: data[field] for field in fields if field in data}
+        return data
+
+    def get_versioned(self, collection: str, doc_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        return self._get_versioned(self._connection(), collection, doc_id)
+
+    def get_many(self, collection: str, doc_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        unique_ids = list(dict.fromkeys(doc_ids))
+        results = {}
+        for start in range(0, len(unique_ids), MAX_IN_CLAUSE_SIZE):
+            chunk = unique_ids[start:start + MAX_IN_CLAUSE_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._connection().execute(
+                f"SELECT id, data FROM documents WHERE collection = ? AND id IN ({placeholders})", (collection, *chunk)
+            )
+            for doc_id, data in rows:
+                data = json.loads(data)
+                if fields is not None:
+                    data = {field: data[field] for field in fields if field in data}
+                results[doc_id] = data
+        return results
+
+    def get_many_versioned(self, collection: str, doc_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], int]]:
+        unique_ids = list(dict.fromkeys(doc_ids))
+        results = {}
+        for start in range(0, len(unique_ids), MAX_IN_CLAUSE_SIZE):
+            chunk = unique_ids[start:start + MAX_IN_CLAUSE_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._connection().execute(
+                f"SELECT id, data, version FROM documents WHERE collection = ? AND id IN ({placeholders})", (collection, *chunk)
+            )
+            for doc_id, data, version in rows:
+                results[doc_id] = (json.loads(data), version)
+        return results
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        self._set(self._connection(), collection, doc_id, data)
+
+    def set_many(
+        self, collection: str, documents: List[Tuple[str, Dict[str, Any]]], batch_size: int = 500, parallelism: int = 1
+    ) -> int:
+        # SQLite has a single writer, so batches are written one after another;
+        # each batch is one transaction with a multi-row insert.
+        conn = self._connection()
+        for start in range(0, len(documents), batch_size):
+            rows = [(collection, doc_id, _encode(data)) for doc_id, data in documents[start:start + batch_size]]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO documents (collection, id, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(collection, id) DO UPDATE SET data = excluded.data, version = version + 1",
+                    rows,
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return len(documents)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[FieldPath, Any], if_version: Any = None) -> bool:
+        # The read-modify-write runs under the write lock so concurrent patches compose.
+        return self.run_transaction(
+            lambda transaction: self._update(transaction._conn, collection, doc_id, updates, if_version)
+        )
+
+    def delete(self, collection: str, doc_id: str) -> bool:
+        return self._delete(self._connection(), collection, doc_id)
+
+    def write_conditional(self, collection: str, writes: List[ConditionalWrite]):
+        def _write_all(transaction):
+            for doc_id, data, if_version in writes:
+                versioned = self._get_versioned(transaction._conn, collection, doc_id)
+                if (versioned[1] if versioned is not None else None) != if_version:
+                    raise WriteConflict(f"Document '{collection}/{doc_id}' changed after it was read.")
+                if if_version is None:
+                    self._set(transaction._conn, collection, doc_id, data)
+                elif data is None:
+                    self._delete(transaction._conn, collection, doc_id)
+                else:
+                    apply_updates(versioned[0], data)
+                    self._set(transaction._conn, collection, doc_id, versioned[0])
+
+        self.run_transaction(_write_all)
+
+    def stream(self, collection: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        rows = self._connection().execute(
+            "SELECT id, data FROM documents WHERE collection = ? ORDER BY id", (collection,)
+        )
+        for doc_id, data in rows:
+            yield doc_id, json.loads(data)
+
+    def query(
+        self,
+        collection: str,
+        filters: Optional[List[Filter]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        start_after: Any = None,
+        limit: Optional[int] = None,
+        select: Optional[List[str]] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        clauses, params = ["collection = ?"], [collection]
+        for field, op, value in filters or []:
+            clause, clause_params = _filter_clause(field, op, value)
+            clauses.append(clause)
+            params.extend(clause_params)
+
+        sql = f"SELECT id, data FROM documents WHERE {' AND '.join(clauses)}"
+        if order_by:
+            after, direction = ("<", "DESC") if descending else (">", "ASC")
+            if isinstance(start_after, tuple):
+                value, after_id = start_after
+                sql += f" AND (json_extract(data, ?) {after} ? OR (json_extract(data, ?) = ? AND id {after} ?))"
+                params.extend([_json_path(order_by), _sql_value(value), _json_path(order_by), _sql_value(value), after_id])
+            elif start_after is not None:
+                sql += f" AND json_extract(data, ?) {after} ?"
+                params.extend([_json_path(order_by), _sql_value(start_after)])
+            sql += f" ORDER BY json_extract(data, ?) {direction}, id {direction}"
+            params.append(_json_path(order_by))
+        else:
+            sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        results = []
+        for doc_id, data in self._connection().execute(sql, params):
+            data = json.loads(data)
+            if select is not None:
+                data = {field: data[field] for field in select if field in data}
+            results.append((doc_id, data))
+        return results
+
+    def delete_collection(self, collection: str) -> int:
+        return self._connection().execute("DELETE FROM documents WHERE collection = ?", (collection,)).rowcount
+
+    def run_transaction(self, fn: Callable[[StorageTransaction], T]) -> T:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(_SqliteTransaction(self, conn))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def watch(self, collections: List[str], callback: ChangeCallback) -> Callable[[], None]:
+        # Polls the change log on a daemon thread with its own connection.
+        stop = threading.Event()
+        placeholders = ", ".join("?" for _ in collections)
+        last_seq = self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+        def _poll():
+            nonlocal last_seq
+            while not stop.wait(self.change_poll_seconds):
+                try:
+                    conn = self._connection()
+                    first_seq, max_seq = conn.execute("SELECT MIN(seq), MAX(seq) FROM changes").fetchone()
+                    if max_seq is None or max_seq <= last_seq:
+                        continue
+                    if first_seq > last_seq + 1:
+                        # The log was trimmed past our position.
+                        for collection in collections:
+                            callback(collection, None)
+                    rows = conn.execute(
+                        f"SELECT collection, id FROM changes WHERE seq > ? AND seq <= ? AND collection IN ({placeholders}) ORDER BY seq",
+                        (last_seq, max_seq, *collections),
+                    )
+                    for collection, doc_id in rows:
+                        callback(collection, doc_id)
+                    last_seq = max_seq
+                except Exception as e:
+                    logger.error(f"Error polling the SQLite change log: {e}", exc_info=True)
+            self.close()
+
+        threading.Thread(target=_poll, name="mds-sqlite-changes", daemon=True).start()
+        return stop.set
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,119 @@
+# MDSAPP/core/storage/write_behind.py
+
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces repeated full-document writes of the same document ID.
+    A write is held for `window_seconds`; any newer write for the same ID
+    within that window replaces it, so only the latest snapshot is written.
+    Buffered documents are served by `get` to keep read-your-writes within
+    the process, and `flush` acts as a barrier for code that needs the data
+    to be durable. Writes are only buffered on the event loop the buffer is
+    attached to, which must outlive them (the API server's loop).
+    """
+    def __init__(self, write_fn: Callable[[str, Dict[str, Any]], Awaitable[None]], window_seconds: float):
+        self._write_fn = write_fn
+        self.window_seconds = window_seconds
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buffered = 0
+        self._written = 0
+
+    def attach(self):
+        """Buffers writes made on the running event loop from now on."""
+        self._loop = asyncio.get_running_loop()
+
+    def put(self, doc_id: str, data: Dict[str, Any]) -> bool:
+        """
+        Buffers a write and schedules its flush at the end of the window.
+        Returns False, buffering nothing, on any loop but the attached one:
+        a short-lived loop (e.g. `asyncio.run` in a Celery task) cancels the
+        flush when it closes, so the caller must write the document itself.
+        """
+        if asyncio.get_running_loop() is not self._loop:
+            # The direct write replaces any older buffered snapshot.
+            self._pending.pop(doc_id, None)
+            return False
+        self._pending[doc_id] = data
+        self._buffered += 1
+        if doc_id not in self._timers:
+            timer = self._timers[doc_id] = self._loop.create_task(self._flush_after_window(doc_id))
+            # Also when cancelled, e.g. by a closing loop, possibly before it
+            # ran; otherwise no later `put` of this ID would schedule a flush.
+            timer.add_done_callback(functools.partial(self._forget_timer, doc_id))
+        return True
+
+    def _forget_timer(self, doc_id: str, timer: asyncio.Task):
+        if self._timers.get(doc_id) is timer:
+            del self._timers[doc_id]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the buffered snapshot of a document, if any."""
+        return self._pending.get(doc_id)
+
+    def has_pending(self, doc_id: str) -> bool:
+        return doc_id in self._pending
+
+    async def discard(self, doc_id: str):
+        """
+        Drops a buffered write, e.g. because the document is being deleted.
+        Waits for a write of the same ID that is already in progress.
+        """
+        timer = self._timers.pop(doc_id, None)
+        if timer is not None:
+            timer.cancel()
+        async with self._locks.setdefault(doc_id, asyncio.Lock()):
+            self._pending.pop(doc_id, None)
+
+    async def _flush_after_window(self, doc_id: str):
+        try:
+            await asyncio.sleep(self.window_seconds)
+        except asyncio.CancelledError:
+            return
+        # Done with the window: a `put` from now on schedules a new flush.
+        self._forget_timer(doc_id, asyncio.current_task())
+        try:
+            await self._flush_one(doc_id)
+        except Exception as e:
+            logger.error(f"Write-behind flush of '{doc_id}' failed; it stays buffered until the next flush: {e}", exc_info=True)
+
+    async def _flush_one(self, doc_id: str):
+        lock = self._locks.setdefault(doc_id, asyncio.Lock())
+        async with lock:
+            data = self._pending.pop(doc_id, None)
+            if data is None:
+                return
+            try:
+                await self._write_fn(doc_id, data)
+            except Exception:
+                # Keep the snapshot unless a newer one was buffered meanwhile.
+                self._pending.setdefault(doc_id, data)
+                raise
+            self._written += 1
+
+    async def flush(self, doc_id: Optional[str] = None):
+        """Writes buffered documents now: one ID, or everything when `doc_id` is None."""
+        doc_ids = [doc_id] if doc_id is not None else list(self._pending)
+        for pending_id in doc_ids:
+            timer = self._timers.pop(pending_id, None)
+            if timer is not None:
+                timer.cancel()
+            await self._flush_one(pending_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns how many writes were buffered, written, and coalesced away."""
+        return {
+            "buffered": self._buffered,
+            "written": self._written,
+            "coalesced": self._buffered - self._written - len(self._pending),
+            "pending": len(self._pending),
+        }
@@ -28,7 +28,7 @@ from MDSAPP.api.v1 import settings as settings_router
 
 # Import dependencies from the new MDSAPP core
 # Import dependencies from the new MDSAPP core
-from MDSAPP.core.dependencies import get_tool_registry, register_all_tools, initialize_managers
+from MDSAPP.core.dependencies import get_tool_registry, register_all_tools, initialize_managers, get_database_manager
 from MDSAPP.core.logging_config import setup_logging
 
 logger = logging.getLogger(__name__)
@@ -49,10 +49,18 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing managers...")
     initialize_managers()
     logger.info("Managers initialized.")
+
+    # Writes by other replicas invalidate the caches of this one (MDS_CHANGE_FEED=1).
+    await get_database_manager().start_change_feed()
+    # Casefile saves on this loop may be buffered (MDS_CASEFILE_WRITE_BEHIND_MS).
+    await get_database_manager().start_write_behind()
     
     yield
     
     logger.info("MDSAPP application shutting down.")
+    db_manager = get_database_manager()
+    await db_manager.flush()
+    db_manager.close()
 
 # Initialize the FastAPI application
 app = FastAPI(
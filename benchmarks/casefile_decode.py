@@ -0,0 +1,77 @@
+# benchmarks/casefile_decode.py
+"""
+Measures how long it takes to turn a stored casefile document into a
+Casefile model, reported per KB of document JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.casefile_decode
+"""
+
+import datetime
+import json
+
+from MDSAPP.CasefileManagement.models.casefile import Casefile, Event
+from MDSAPP.WorkFlowManagement.models.results import WorkflowExecutionResult, StepResult
+from benchmarks.timing import time_per_call
+
+
+def _stored_document(results: int, steps: int, events: int) -> dict:
+    """Builds a document shaped like a Firestore read: timestamps come back as datetimes."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    casefile = Casefile(
+        name="Benchmark casefile",
+        execution_results=[
+            WorkflowExecutionResult(
+                workflow_id=f"wf-{i}",
+                status="completed",
+                started_at=now,
+                ended_at=now,
+                steps=[
+                    StepResult(element_id=f"el-{j}", status="completed", output={"text": "output " * 25, "index": j},
+                               started_at=now, ended_at=now)
+                    for j in range(steps)
+                ],
+            )
+            for i in range(results)
+        ],
+        event_log=[Event(source="USER", content="message " * 20) for _ in range(events)],
+    )
+    document = casefile.model_dump(exclude_none=True)
+    document["modified_at"] = now  # written with SERVER_TIMESTAMP
+    return document
+
+
+def _legacy_decode(doc_id: str, document: dict) -> Casefile:
+    """The previous path: convert every datetime to ISO in Python, then validate."""
+    def convert(value):
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [convert(v) for v in value]
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return value
+
+    data = convert(document)
+    data["id"] = doc_id
+    return Casefile(**data)
+
+
+def _decode(doc_id: str, document: dict) -> Casefile:
+    """The path of DatabaseManager._casefile_from_document."""
+    return Casefile.model_validate({**document, "id": doc_id})
+
+
+def main():
+    print(f"{'document':>12} {'legacy us/KB':>14} {'decode us/KB':>14} {'speedup':>8}")
+    for results, steps, events in [(1, 5, 10), (10, 10, 50), (50, 10, 50), (200, 10, 50)]:
+        document = _stored_document(results, steps, events)
+        size_kb = len(json.dumps(document, default=str)) / 1024
+        legacy = time_per_call(_legacy_decode, "case-bench", document)
+        decode = time_per_call(_decode, "case-bench", document)
+        print(f"{size_kb:>9.1f} KB {legacy * 1e6 / size_kb:>14.1f} {decode * 1e6 / size_kb:>14.1f} {legacy / decode:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
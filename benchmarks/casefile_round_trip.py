@@ -0,0 +1,40 @@
+# benchmarks/casefile_round_trip.py
+"""
+Measures what a CasefileManager call saved by using `get_casefile`
+instead of the JSON-returning `load_casefile`: the previous internal
+path serialized the loaded Casefile to JSON and validated it back.
+
+Run from the repository root:
+
+    python -m benchmarks.casefile_round_trip
+"""
+
+from MDSAPP.CasefileManagement.models.casefile import Casefile, Event
+from MDSAPP.core.models.ontology import Role
+from benchmarks.timing import time_per_call
+
+
+def _casefile(events: int) -> Casefile:
+    return Casefile(
+        name="Benchmark casefile",
+        acl={"user-1": Role.ADMIN},
+        event_log=[Event(source="USER", content="message " * 20, metadata={"index": i}) for i in range(events)],
+    )
+
+
+def _json_round_trip(casefile: Casefile) -> Casefile:
+    """The previous path: load_casefile returned JSON, and the caller validated it again."""
+    return Casefile.model_validate_json(casefile.model_dump_json())
+
+
+def main():
+    print(f"{'events':>8} {'json size':>10} {'saved ms/call':>14} {'saved us/KB':>12}")
+    for events in [10, 100, 1000, 5000]:
+        casefile = _casefile(events)
+        size_kb = len(casefile.model_dump_json()) / 1024
+        round_trip = time_per_call(_json_round_trip, casefile)
+        print(f"{events:>8} {size_kb:>7.0f} KB {round_trip * 1e3:>14.2f} {round_trip * 1e6 / size_kb:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# benchmarks/timing.py
+"""Timing helpers shared by the benchmarks."""
+
+import time
+
+REPEATS = 20
+
+
+def time_per_call(fn, *args, repeats: int = REPEATS) -> float:
+    """Seconds per call of `fn(*args)`, averaged over `repeats` calls after one warm-up call."""
+    fn(*args)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - started) / repeats
@@ -2,10 +2,15 @@ import pytest
 import asyncio
 from unittest.mock import MagicMock, AsyncMock
 
+from MDSAPP.CasefileManagement import manager as manager_module
 from MDSAPP.CasefileManagement.manager import CasefileManager
-from MDSAPP.CasefileManagement.models.casefile import Casefile
+from MDSAPP.CasefileManagement.models.casefile import Casefile, CasefileSummary, SubCasefileSpec, CASEFILE_SUMMARY_FIELDS
 from MDSAPP.core.managers.database_manager import DatabaseManager
+from MDSAPP.core.managers.tool_registry import ToolRegistry
 from MDSAPP.core.models.ontology import Role
+from MDSAPP.core.storage.base import DELETE_FIELD, SERVER_TIMESTAMP
+from MDSAPP.core.storage.sqlite_backend import SqliteBackend
+from MDSAPP.WorkFlowManagement.models.results import WorkflowExecutionResult
 
 @pytest.fixture
 def mock_db_manager():
@@ -13,6 +18,7 @@ def mock_db_manager():
     mock = MagicMock(spec=DatabaseManager)
     mock.load_casefile = AsyncMock()
     mock.save_casefile = AsyncMock()
+    mock.update_casefile_fields = AsyncMock(return_value=True)
     return mock
 
 @pytest.mark.asyncio
@@ -60,7 +66,13 @@ async def test_grant_access(mock_db_manager):
         owner_id=admin_user_id,
         acl={admin_user_id: Role.ADMIN}
     )
-    mock_db_manager.load_casefile.return_value = mock_casefile
+    written_updates = []
+
+    async def mock_modify_casefile(casefile_id, mutate):
+        written_updates.append(mutate(mock_casefile))
+        return mock_casefile
+
+    mock_db_manager.modify_casefile = AsyncMock(side_effect=mock_modify_casefile)
 
     # Act
     updated_casefile = await casefile_manager.grant_access(
@@ -71,9 +83,15 @@ async def test_grant_access(mock_db_manager):
     )
 
     # Assert
-    mock_db_manager.load_casefile.assert_called_once_with(casefile_id)
     assert updated_casefile.acl[user_to_grant] == role_to_grant
-    mock_db_manager.save_casefile.assert_called_once_with(updated_casefile)
+    # Only the ACL entry, its index and the timestamp are written, not the whole casefile.
+    assert written_updates == [{
+        ("acl", user_to_grant): role_to_grant.value,
+        "acl_members": [admin_user_id, user_to_grant],
+        "acl_roles": [f"{admin_user_id}:admin", f"{user_to_grant}:writer"],
+        "modified_at": SERVER_TIMESTAMP,
+    }]
+    mock_db_manager.save_casefile.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_grant_access_permission_denied(mock_db_manager):
@@ -95,7 +113,7 @@ async def test_grant_access_permission_denied(mock_db_manager):
         owner_id=owner_user_id,
         acl={owner_user_id: Role.ADMIN, non_admin_user_id: Role.READER}
     )
-    mock_db_manager.load_casefile.return_value = mock_casefile
+    mock_db_manager.modify_casefile = AsyncMock(side_effect=lambda casefile_id, mutate: mutate(mock_casefile))
 
     # Act & Assert
     with pytest.raises(PermissionError):
@@ -105,4 +123,513 @@ async def test_grant_access_permission_denied(mock_db_manager):
             role=role_to_grant,
             current_user_id=non_admin_user_id
         )
-    mock_db_manager.save_casefile.assert_not_called()
\ No newline at end of file
+    mock_db_manager.save_casefile.assert_not_called()
+    mock_db_manager.update_casefile_fields.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_list_casefiles_for_user_queries_acl_index(mock_db_manager):
+    """
+    Tests that casefiles are listed per user through the ACL membership index.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    mock_db_manager.query_casefiles = AsyncMock(return_value=[CasefileSummary(id="case-1", name="Test Case")])
+
+    # Act
+    all_casefiles = await casefile_manager.list_casefiles_for_user("user-1")
+    admin_casefiles = await casefile_manager.list_casefiles_for_user("user-1", role="admin")
+
+    # Assert
+    assert [summary.id for summary in all_casefiles] == ["case-1"]
+    assert admin_casefiles == all_casefiles
+    filters = [call.args[0] for call in mock_db_manager.query_casefiles.call_args_list]
+    assert filters == [[("acl_members", "array_contains", "user-1")], [("acl_roles", "array_contains", "user-1:admin")]]
+    with pytest.raises(ValueError):
+        await casefile_manager.list_casefiles_for_user("user-1", role="owner")
+
+@pytest.mark.asyncio
+async def test_log_event_appends_to_event_history(mock_db_manager):
+    """
+    Tests that logging an event appends it to the event history instead of
+    rewriting the casefile.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    mock_db_manager.append_casefile_event = AsyncMock(return_value=True)
+    mock_db_manager.load_casefile.return_value = Casefile(
+        id="case-123",
+        name="Test Case",
+        owner_id="user-1",
+        acl={"user-1": Role.ADMIN}
+    )
+
+    # Act
+    await casefile_manager.log_event(
+        casefile_id="case-123",
+        user_id="user-1",
+        source="USER",
+        event_type="USER_MESSAGE",
+        content="Hello"
+    )
+
+    # Assert
+    casefile_id, event = mock_db_manager.append_casefile_event.call_args.args
+    assert casefile_id == "case-123"
+    assert event.content == "Hello"
+    mock_db_manager.save_casefile.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_list_all_casefiles_with_status_uses_projection(mock_db_manager):
+    """
+    Tests that the status list is one projection query on the stored status.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    mock_db_manager.query_casefiles = AsyncMock(return_value=[
+        CasefileSummary(id="case-2", name="Planned", description="Mission", workflow_count=1, status="PLANNING_COMPLETE"),
+        # Stored before the status was persisted: derived from the counts.
+        CasefileSummary(id="case-3", name="Analyzed", workflow_count=1, execution_result_count=1, engineered_workflow_count=1),
+    ])
+
+    # Act
+    status_list = await casefile_manager.list_all_casefiles_with_status(status="PLANNING_COMPLETE")
+
+    # Assert
+    mock_db_manager.query_casefiles.assert_awaited_once_with(
+        [("status", "==", "PLANNING_COMPLETE")], fields=CASEFILE_SUMMARY_FIELDS
+    )
+    assert [item["status"] for item in status_list] == ["PLANNING_COMPLETE", "ANALYSIS_COMPLETE"]
+    with pytest.raises(ValueError):
+        await casefile_manager.list_all_casefiles_with_status(status="DONE")
+
+@pytest.mark.asyncio
+async def test_load_subtree_reads_one_batch_per_level(mock_db_manager):
+    """
+    Tests that a casefile tree is loaded with one batched read per level.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    root = Casefile(id="root", name="Root", sub_casefile_ids=["a", "b"])
+    level_1 = {
+        "a": Casefile(id="a", name="A", parent_id="root", sub_casefile_ids=["c"]),
+        "b": Casefile(id="b", name="B", parent_id="root"),
+    }
+    level_2 = {"c": Casefile(id="c", name="C", parent_id="a")}
+    mock_db_manager.load_casefile.return_value = root
+    mock_db_manager.load_casefiles = AsyncMock(side_effect=[level_1, level_2])
+
+    # Act
+    subtree = await casefile_manager.load_subtree("root")
+
+    # Assert
+    assert set(subtree) == {"root", "a", "b", "c"}
+    assert [call.args[0] for call in mock_db_manager.load_casefiles.call_args_list] == [["a", "b"], ["c"]]
+
+@pytest.mark.asyncio
+async def test_update_casefile_reapplies_updates_after_write_conflict(mock_db_manager):
+    """
+    Tests that update_casefile recomputes its patch on the re-read casefile
+    when an optimistic write has to be retried.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    user_id = "test_user"
+    stale = Casefile(id="case-1", name="Case", acl={user_id: Role.WRITER})
+    current = Casefile(id="case-1", name="Case", acl={user_id: Role.WRITER}, sub_casefile_ids=["other"])
+    patches = []
+
+    async def _modify_casefile(casefile_id, mutate):
+        # The first attempt conflicts; the second one runs on the current document.
+        mutate(stale)
+        patches.append(mutate(current))
+        return current
+
+    mock_db_manager.modify_casefile = AsyncMock(side_effect=_modify_casefile)
+
+    # Act
+    await casefile_manager.update_casefile("case-1", user_id, {"sub_casefile_ids": ["new"]})
+
+    # Assert
+    assert patches[0]["sub_casefile_count"] == 2
+    assert current.sub_casefile_ids == ["other", "new"]
+
+@pytest.mark.asyncio
+async def test_create_sub_casefiles_writes_parent_once(mock_db_manager, tmp_path):
+    """
+    Tests that sub-casefiles are created in one transaction that inherits the
+    parent's ACL and writes the parent once.
+    """
+    # Arrange
+    backend = SqliteBackend(path=str(tmp_path / "mds_test.db"))
+    parent = Casefile(id="root", name="Root", acl={"owner": Role.ADMIN, "writer": Role.WRITER}, sub_casefile_ids=["old"])
+    backend.set("casefiles", "root", parent.model_dump(exclude_none=True))
+    mock_db_manager.casefiles_collection_name = "casefiles"
+    mock_db_manager.run_transaction = AsyncMock(side_effect=lambda fn: backend.run_transaction(fn))
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+
+    # Act
+    child_ids = await casefile_manager.create_sub_casefiles(
+        "root", [{"name": "A"}, SubCasefileSpec(id="case-b", name="B", casefile_type="erban")], "writer"
+    )
+
+    # Assert
+    assert mock_db_manager.run_transaction.await_count == 1
+    assert child_ids[1] == "case-b"
+    stored_parent = backend.get("casefiles", "root")
+    assert stored_parent["sub_casefile_ids"] == ["old", *child_ids]
+    assert stored_parent["sub_casefile_count"] == 3
+    children = backend.get_many("casefiles", child_ids)
+    assert [children[child_id]["parent_id"] for child_id in child_ids] == ["root", "root"]
+    assert children["case-b"]["acl"] == {"owner": "admin", "writer": "admin"}
+    assert children["case-b"]["casefile_type"] == "erban"
+    with pytest.raises(PermissionError):
+        await casefile_manager.create_sub_casefiles("root", [{"name": "C"}], "stranger")
+    backend.close()
+
+@pytest.mark.asyncio
+async def test_hierarchy_index_is_maintained_on_create_and_delete(tmp_path, monkeypatch):
+    """
+    Tests that subtrees and ancestors are read from the materialized
+    `ancestor_ids`, and that deleting a casefile splices it out of the tree.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="root", name="Root", acl={"owner": Role.ADMIN}))
+    await casefile_manager.create_sub_casefiles("root", [SubCasefileSpec(id="a", name="A")], "owner")
+    await casefile_manager.create_sub_casefiles("a", [SubCasefileSpec(id="b", name="B"), SubCasefileSpec(id="c", name="C")], "owner")
+    await casefile_manager.create_sub_casefiles("b", [SubCasefileSpec(id="d", name="D")], "owner")
+
+    # Act / Assert
+    assert [summary.id for summary in await casefile_manager.get_descendants("root")] == ["a", "b", "c", "d"]
+    assert [summary.id for summary in await casefile_manager.get_ancestors("d")] == ["root", "a", "b"]
+    assert [summary.id for summary in await casefile_manager.get_tree("a", max_depth=1)] == ["a", "b", "c"]
+    assert (await casefile_manager.get_casefile("d")).depth == 3
+
+    assert await casefile_manager.delete_casefile("a", "owner")
+
+    assert (await casefile_manager.get_casefile("root")).sub_casefile_ids == ["b", "c"]
+    b = await casefile_manager.get_casefile("b")
+    assert (b.parent_id, b.ancestor_ids, b.depth) == ("root", ["root"], 1)
+    assert b.modified_at > (await casefile_manager.get_casefile("c")).created_at
+    assert [summary.id for summary in await casefile_manager.get_ancestors("d")] == ["root", "b"]
+
+    # Casefiles stored before the index existed.
+    db_manager.backend.update("casefiles", "d", {"ancestor_ids": [], "depth": 0})
+    assert await casefile_manager.rebuild_hierarchy_index() == 4
+    assert [summary.id for summary in await casefile_manager.get_tree("root")] == ["root", "b", "c", "d"]
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_update_casefile_keeps_stored_status_in_sync(tmp_path, monkeypatch):
+    """
+    Tests that the status is written together with the fields it derives
+    from, and that it can be queried.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="case-1", name="A", acl={"owner": Role.ADMIN}))
+    await db_manager.save_casefile(Casefile(id="case-2", name="B", acl={"owner": Role.ADMIN}))
+    assert db_manager.backend.get("casefiles", "case-1")["status"] == "NEW"
+
+    # Act
+    await casefile_manager.update_casefile("case-1", "owner", {"description": "Mission"})
+
+    # Assert
+    assert db_manager.backend.get("casefiles", "case-1")["status"] == "MISSION_DEFINED"
+    defined = await casefile_manager.list_all_casefiles_with_status(status="MISSION_DEFINED")
+    assert [item["id"] for item in defined] == ["case-1"]
+
+    # Casefiles stored before the status was persisted.
+    db_manager.backend.update("casefiles", "case-2", {"description": "Other", "status": DELETE_FIELD})
+    # Stored before the counts too: the status needs the lists themselves.
+    db_manager.backend.set("casefiles", "legacy", {
+        "name": "Legacy",
+        "description": "Mission",
+        "execution_results": [{
+            "workflow_id": "wf-1", "status": "completed", "steps": [],
+            "started_at": "2025-01-01T00:00:00+00:00", "ended_at": "2025-01-01T00:00:00+00:00",
+        }],
+    })
+    listed = {item["id"]: item for item in await casefile_manager.list_all_casefiles_with_status()}
+    assert listed["legacy"]["status"] == "EXECUTION_COMPLETE"
+    assert listed["legacy"]["execution_result_count"] == 1
+
+    assert await casefile_manager.rebuild_status_index() == 3
+    assert db_manager.backend.get("casefiles", "case-2")["status"] == "MISSION_DEFINED"
+    legacy = db_manager.backend.get("casefiles", "legacy")
+    assert (legacy["status"], legacy["execution_result_count"]) == ("EXECUTION_COMPLETE", 1)
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_update_casefile_writes_appended_lists_whole(tmp_path, monkeypatch):
+    """
+    Tests that appending an item equal to a stored one keeps the stored list
+    and the stored counts in step.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="case-1", name="A", acl={"owner": Role.ADMIN}))
+    result = WorkflowExecutionResult(
+        workflow_id="wf-1", status="completed", steps=[],
+        started_at="2025-01-01T00:00:00+00:00", ended_at="2025-01-01T00:00:00+00:00",
+    )
+
+    # Act
+    await casefile_manager.update_casefile("case-1", "owner", {"execution_results": [result]})
+    await casefile_manager.update_casefile("case-1", "owner", {"execution_results": [result.model_copy()]})
+
+    # Assert
+    stored = db_manager.backend.get("casefiles", "case-1")
+    assert (len(stored["execution_results"]), stored["execution_result_count"]) == (2, 2)
+    db_manager.casefile_cache.clear()
+    assert len((await casefile_manager.get_casefile("case-1")).execution_results) == 2
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_list_top_level_casefile_summaries_queries_roots_only(tmp_path, monkeypatch):
+    """
+    Tests that only casefiles without a parent are listed, read by a query
+    instead of filtering all casefiles.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="root-1", name="Root 1", acl={"owner": Role.ADMIN}))
+    await db_manager.save_casefile(Casefile(id="root-2", name="Root 2", acl={"owner": Role.ADMIN}))
+    await casefile_manager.create_sub_casefiles("root-1", [SubCasefileSpec(id="child", name="Child")], "owner")
+
+    # Act
+    roots = await casefile_manager.list_top_level_casefile_summaries()
+
+    # Assert
+    assert [summary.id for summary in roots] == ["root-1", "root-2"]
+    assert all(summary.parent_id is None for summary in roots)
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_apply_batch_reports_per_item_results(tmp_path, monkeypatch):
+    """
+    Tests that a batch reads its casefiles once, applies its operations in
+    order, and reports failed operations without stopping the others.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="root", name="Root", owner_id="owner", acl={"owner": Role.ADMIN}))
+    await db_manager.save_casefile(Casefile(id="old", name="Old", acl={"owner": Role.ADMIN}))
+    await db_manager.save_casefile(Casefile(id="other", name="Other", acl={"stranger": Role.ADMIN}))
+    load_casefiles_versioned = db_manager.load_casefiles_versioned
+    db_manager.load_casefiles_versioned = AsyncMock(side_effect=load_casefiles_versioned)
+
+    # Act
+    results = await casefile_manager.apply_batch([
+        {"op": "create", "casefile_id": "child", "name": "Child", "parent_id": "root"},
+        {"op": "update", "casefile_id": "child", "updates": {"description": "Mission", "tags": ["a"]}},
+        {"op": "grant_access", "casefile_id": "root", "member_id": "reader", "role": "reader"},
+        {"op": "revoke_access", "casefile_id": "root", "member_id": "owner"},
+        {"op": "update", "casefile_id": "other", "updates": {"name": "Mine"}},
+        {"op": "delete", "casefile_id": "old"},
+        {"op": "update", "casefile_id": "missing", "updates": {"name": "X"}},
+    ], "owner")
+
+    # Assert
+    assert db_manager.load_casefiles_versioned.await_count == 1
+    assert [result.success for result in results] == [True, True, True, False, False, True, False]
+    assert "owner" in results[3].error
+    child = await db_manager.load_casefile("child")
+    assert (child.parent_id, child.ancestor_ids, child.status) == ("root", ["root"], "MISSION_DEFINED")
+    assert child.tags == ["a"] and child.acl == {"owner": Role.ADMIN}
+    root = await db_manager.load_casefile("root")
+    assert root.sub_casefile_ids == ["child"]
+    assert root.acl == {"owner": Role.ADMIN, "reader": Role.READER}
+    assert (await db_manager.load_casefile("other")).name == "Other"
+    assert await db_manager.load_casefile("old") is None
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_apply_batch_writes_are_conditional(tmp_path, monkeypatch):
+    """
+    Tests that batch writes are re-applied to casefiles changed since the
+    batch read them, instead of overwriting the other change, and that an
+    operation that no longer applies or names a read-only field fails alone.
+    A child created under a changed parent inherits the parent's new ACL.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    for casefile_id in ("case-1", "case-2", "parent"):
+        await db_manager.save_casefile(Casefile(id=casefile_id, name=casefile_id, acl={"owner": Role.ADMIN}))
+    load_casefiles_versioned = db_manager.load_casefiles_versioned
+    reads = []
+
+    async def _load_then_change_concurrently(*args, **kwargs):
+        loaded = await load_casefiles_versioned(*args, **kwargs)
+        reads.append(args)
+        if len(reads) == 1:
+            await casefile_manager.update_casefile("case-1", "owner", {"tags": ["theirs"]})
+            await casefile_manager.grant_access("case-2", "owner-2", Role.ADMIN, "owner")
+            await casefile_manager.revoke_access("case-2", "owner", "owner-2")
+            await casefile_manager.grant_access("parent", "reader", Role.READER, "owner")
+        return loaded
+    db_manager.load_casefiles_versioned = _load_then_change_concurrently
+
+    # Act
+    results = await casefile_manager.apply_batch([
+        {"op": "update", "casefile_id": "case-1", "updates": {"tags": ["mine"], "description": "Mission"}},
+        {"op": "update", "casefile_id": "case-1", "updates": {"status": "ANALYSIS_COMPLETE"}},
+        {"op": "update", "casefile_id": "case-2", "updates": {"name": "Mine"}},
+        {"op": "create", "casefile_id": "child", "name": "Child", "parent_id": "parent"},
+        {"op": "create", "casefile_id": "case-3", "name": "Case 3"},
+    ], "owner")
+
+    # Assert
+    assert len(reads) == 2
+    assert [result.success for result in results] == [True, False, False, True, True]
+    assert "read-only" in results[1].error and "permission" in results[2].error
+    case_1 = await db_manager.load_casefile("case-1")
+    assert (case_1.tags, case_1.status) == (["theirs", "mine"], "MISSION_DEFINED")
+    assert (await db_manager.load_casefile("case-2")).name == "case-2"
+    child = await db_manager.load_casefile("child")
+    assert child.acl == {"owner": Role.ADMIN, "reader": Role.READER}
+    assert (await db_manager.load_casefile("parent")).sub_casefile_ids == ["child"]
+    assert (await db_manager.load_casefile("case-3")).acl == {"owner": Role.ADMIN}
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_apply_batch_commits_in_batched_round_trips(tmp_path, monkeypatch):
+    """
+    Tests that a mixed batch costs a batched read and one conditional commit
+    per chunk, instead of a read and a write per casefile, and that a delete
+    splices the deleted casefile out of the tree in the same commit.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    monkeypatch.setattr(manager_module, "MAX_WRITES_PER_TRANSACTION", 10)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    await db_manager.save_casefile(Casefile(id="root", name="Root", acl={"owner": Role.ADMIN}))
+    await casefile_manager.create_sub_casefiles("root", [SubCasefileSpec(id="mid", name="Mid")], "owner")
+    await casefile_manager.create_sub_casefiles("mid", [SubCasefileSpec(id="leaf", name="Leaf")], "owner")
+    for index in range(12):
+        await db_manager.save_casefile(Casefile(id=f"case-{index}", name=f"Case {index}", acl={"owner": Role.ADMIN}))
+    backend = db_manager.backend
+    for method in ("get_versioned", "get_many_versioned", "update", "delete", "write_conditional"):
+        monkeypatch.setattr(backend, method, MagicMock(side_effect=getattr(backend, method)))
+
+    # Act
+    results = await casefile_manager.apply_batch(
+        [{"op": "update", "casefile_id": f"case-{index}", "updates": {"tags": ["bulk"]}} for index in range(12)]
+        + [{"op": "grant_access", "casefile_id": "case-0", "member_id": "reader", "role": "reader"}]
+        + [{"op": "create", "casefile_id": f"new-{index}", "name": f"New {index}"} for index in range(4)]
+        + [{"op": "delete", "casefile_id": "mid"}],
+        "owner",
+    )
+
+    # Assert
+    assert all(result.success for result in results)
+    # The referenced casefiles, then the parent and subtree of the delete.
+    assert backend.get_many_versioned.call_count == 2
+    assert backend.write_conditional.call_count == 2
+    assert backend.get_versioned.call_count == backend.update.call_count == backend.delete.call_count == 0
+    assert (await db_manager.load_casefile("case-0")).acl == {"owner": Role.ADMIN, "reader": Role.READER}
+    assert (await db_manager.load_casefile("case-11")).tags == ["bulk"]
+    assert (await db_manager.load_casefile("new-3")).name == "New 3"
+    assert await db_manager.load_casefile("mid") is None
+    assert (await db_manager.load_casefile("root")).sub_casefile_ids == ["leaf"]
+    leaf = await db_manager.load_casefile("leaf")
+    assert (leaf.parent_id, leaf.ancestor_ids) == ("root", ["root"])
+    db_manager.close()
+
+@pytest.mark.asyncio
+async def test_tools_return_json_and_internal_callers_get_casefiles(mock_db_manager):
+    """
+    Tests that JSON is produced only at the tool boundary: the registered
+    tools return JSON strings, the manager methods return Casefile objects.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    stored = Casefile(id="case-1", name="A", acl={"owner": Role.ADMIN})
+    mock_db_manager.load_casefile.side_effect = lambda casefile_id: stored.model_copy(deep=True)
+
+    async def _modify_casefile(casefile_id, mutate):
+        casefile = stored.model_copy(deep=True)
+        mutate(casefile)
+        return casefile
+
+    mock_db_manager.modify_casefile = AsyncMock(side_effect=_modify_casefile)
+    tool_registry = ToolRegistry()
+    casefile_manager.register_tools(tool_registry)
+
+    # Act
+    internal = await casefile_manager.get_casefile("case-1")
+    updated = await casefile_manager.update_casefile("case-1", "owner", {"description": "Mission"})
+    tool_result = await tool_registry.get_tool_handler("get_casefile")(casefile_id="case-1")
+    tool_update = await tool_registry.get_tool_handler("update_casefile")(
+        casefile_id="case-1", user_id="owner", updates={"description": "Mission"}
+    )
+
+    # Assert
+    assert isinstance(internal, Casefile) and isinstance(updated, Casefile)
+    assert updated.description == "Mission"
+    assert isinstance(tool_result, str) and Casefile.model_validate_json(tool_result).id == "case-1"
+    assert isinstance(tool_update, str) and Casefile.model_validate_json(tool_update).description == "Mission"
+
+@pytest.mark.asyncio
+async def test_update_casefile_ignores_computed_fields(mock_db_manager):
+    """
+    Tests that an update naming a computed field (status, counts, depth)
+    skips it instead of failing, and still applies the other fields.
+    """
+    # Arrange
+    casefile_manager = CasefileManager(db_manager=mock_db_manager)
+    patches = []
+
+    async def _modify_casefile(casefile_id, mutate):
+        casefile = Casefile(id=casefile_id, name="A", acl={"owner": Role.ADMIN})
+        patches.append(mutate(casefile))
+        return casefile
+
+    mock_db_manager.modify_casefile = AsyncMock(side_effect=_modify_casefile)
+
+    # Act
+    updated = await casefile_manager.update_casefile(
+        "case-1", "owner", {"status": "ANALYSIS_COMPLETE", "depth": 3, "workflow_count": 9, "name": "B"}
+    )
+
+    # Assert
+    assert updated.name == "B"
+    assert (updated.status, updated.depth, updated.workflow_count) == ("NEW", 0, 0)
+    assert patches[0]["status"] == "NEW" and patches[0]["workflow_count"] == 0
+    assert "depth" not in patches[0]
+
+@pytest.mark.asyncio
+async def test_rebuild_indexes_makes_legacy_roots_listable(tmp_path, monkeypatch):
+    """
+    Tests that a casefile stored before the derived indexes existed is
+    listed, found by member and given its status after rebuild_indexes.
+    """
+    # Arrange
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    db_manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    casefile_manager = CasefileManager(db_manager=db_manager)
+    db_manager.backend.set("casefiles", "legacy", {"name": "Legacy", "acl": {"owner": "admin"}})
+    assert await casefile_manager.list_top_level_casefile_summaries() == []
+
+    # Act
+    indexed = await casefile_manager.rebuild_indexes()
+
+    # Assert
+    assert indexed == {"hierarchy": 1, "acl": 1, "status": 1}
+    assert [summary.id for summary in await casefile_manager.list_top_level_casefile_summaries()] == ["legacy"]
+    assert [summary.id for summary in await casefile_manager.list_casefiles_for_user("owner")] == ["legacy"]
+    assert db_manager.backend.get("casefiles", "legacy")["status"] == "NEW"
+    db_manager.close()
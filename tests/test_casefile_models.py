@@ -0,0 +1,27 @@
+import datetime
+
+from MDSAPP.CasefileManagement.models.casefile import Casefile, CasefileSummary
+
+
+def test_casefile_validates_stored_timestamps_without_conversion():
+    stored_at = datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    document = {
+        "id": "case-1",
+        "name": "Case",
+        "modified_at": stored_at,
+        "event_log": [{"source": "USER", "content": "hi", "timestamp": stored_at}],
+        "execution_results": [{
+            "workflow_id": "wf-1",
+            "status": "completed",
+            "steps": [],
+            "started_at": stored_at,
+            "ended_at": stored_at,
+        }],
+    }
+
+    casefile = Casefile.model_validate(document)
+
+    assert casefile.modified_at == "2025-01-02T03:04:05+00:00"
+    assert casefile.event_log[0].timestamp == "2025-01-02T03:04:05+00:00"
+    assert casefile.execution_results[0].started_at == stored_at
+    assert CasefileSummary.model_validate(document).modified_at == "2025-01-02T03:04:05+00:00"
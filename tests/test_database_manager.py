@@ -0,0 +1,278 @@
+import asyncio
+import threading
+
+import pytest
+
+from MDSAPP.CasefileManagement.models.casefile import Casefile, DriveFileReference, Event
+from MDSAPP.core.managers.database_manager import DatabaseExecutor, DatabaseManager
+from MDSAPP.core.models.ontology import Role
+from MDSAPP.core.models.conversation_session import ConversationSession, Message
+from MDSAPP.core.storage.shared_cache import InMemoryRedis, SharedCache
+from MDSAPP.core.storage.sqlite_backend import SqliteBackend
+
+
+@pytest.fixture
+def db_manager(tmp_path, monkeypatch):
+    """Fixture for a DatabaseManager on an embedded SQLite backend, without the embedding model."""
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    manager = DatabaseManager(backend=SqliteBackend(path=str(tmp_path / "mds_test.db")))
+    yield manager
+    manager.close()
+
+
+@pytest.mark.asyncio
+async def test_save_conversation_session_writes_only_new_messages(db_manager):
+    session = ConversationSession(id="conv-1", history=[Message(role="user", content="Hi")], metadata={"user_id": "u"})
+    await db_manager.save_conversation_session(session)
+
+    session.history.append(Message(role="model", content="Hello"))
+    await db_manager.save_conversation_session(session)
+
+    messages = db_manager.backend.query(db_manager._messages_collection("conv-1"), order_by="seq")
+    assert [doc_id for doc_id, _ in messages] == ["0000000000", "0000000001"]
+    assert db_manager.backend.get("conversation_sessions", "conv-1") == {"id": "conv-1", "metadata": {"user_id": "u"}, "message_count": 2}
+
+    loaded = await db_manager.load_conversation_session("conv-1")
+    assert loaded == session
+
+
+@pytest.mark.asyncio
+async def test_append_messages_and_load_recent_include_inline_history(db_manager):
+    # A session saved before messages were stored in their own subcollection.
+    db_manager.backend.set("conversation_sessions", "conv-1", {
+        "id": "conv-1",
+        "history": [{"role": "user", "content": "m0"}, {"role": "model", "content": "m1"}],
+    })
+
+    count = await db_manager.append_messages("conv-1", [Message(role="user", content="m2"), Message(role="model", content="m3")])
+
+    assert count == 4
+    assert [m.content for m in await db_manager.load_recent("conv-1", 2)] == ["m2", "m3"]
+    assert [m.content for m in await db_manager.load_recent("conv-1", 3)] == ["m1", "m2", "m3"]
+    assert [m.content for m in (await db_manager.load_conversation_session("conv-1")).history] == ["m0", "m1", "m2", "m3"]
+    assert await db_manager.append_messages("conv-2", [Message(role="user", content="new")]) == 1
+
+
+@pytest.mark.asyncio
+async def test_query_casefiles_uses_acl_membership_index(db_manager):
+    await db_manager.save_casefile(Casefile(id="case-1", name="A", acl={"alice": Role.ADMIN, "bob": Role.READER}))
+    await db_manager.save_casefile(Casefile(id="case-2", name="B", acl={"bob": Role.ADMIN}))
+
+    bob_casefiles = await db_manager.query_casefiles([("acl_members", "array_contains", "bob")], fields=["name"])
+    bob_admin = await db_manager.query_casefiles([("acl_roles", "array_contains", "bob:admin")])
+
+    assert [summary.id for summary in bob_casefiles] == ["case-1", "case-2"]
+    assert [casefile.id for casefile in bob_admin] == ["case-2"]
+
+
+@pytest.mark.asyncio
+async def test_change_feed_invalidates_cache_and_notifies_listeners(db_manager):
+    await db_manager.save_casefile(Casefile(id="case-1", name="A"))
+    await db_manager.load_casefile("case-1")
+    prompt_changes = []
+    db_manager.add_change_listener("prompts", prompt_changes.append)
+
+    # Another replica rewrote the casefile behind this process's back.
+    db_manager.backend.update("casefiles", "case-1", {"name": "B"})
+    assert (await db_manager.load_casefile("case-1")).name == "A"
+
+    db_manager._dispatch_change("casefiles", "case-1")
+    db_manager._dispatch_change("prompts", None)
+
+    assert (await db_manager.load_casefile("case-1")).name == "B"
+    assert prompt_changes == [None]
+    assert db_manager.change_feed_stats() == {"running": 0, "changes_received": 2}
+
+
+@pytest.mark.asyncio
+async def test_load_during_a_write_does_not_cache_the_old_version(db_manager):
+    await db_manager.save_casefile(Casefile(id="case-1", name="A"))
+    await db_manager.load_casefile("case-1")
+    started, release = threading.Event(), threading.Event()
+    update = db_manager.backend.update
+
+    def _slow_update(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return update(*args, **kwargs)
+    db_manager.backend.update = _slow_update
+
+    write = asyncio.create_task(db_manager.update_casefile_fields("case-1", {"name": "B"}))
+    await asyncio.to_thread(started.wait, 5)
+    assert (await db_manager.load_casefile("case-1")).name == "A"  # the write has not landed yet
+    release.set()
+    assert await write
+
+    assert (await db_manager.load_casefile("case-1")).name == "B"
+
+
+@pytest.mark.asyncio
+async def test_shared_cache_serves_casefiles_written_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseManager, "_initialize_embedding_model", lambda self: None)
+    monkeypatch.setenv("MDS_CASEFILE_CACHE_SIZE", "0")
+    path = str(tmp_path / "mds_test.db")
+    api = DatabaseManager(backend=SqliteBackend(path=path))
+    worker = DatabaseManager(backend=SqliteBackend(path=path))
+    shared_cache = SharedCache(InMemoryRedis(), ttl_seconds=60)  # one Redis for both
+    api.shared_cache = worker.shared_cache = shared_cache
+
+    await api.save_casefile(Casefile(id="case-1", name="A"))
+    assert (await worker.load_casefile("case-1")).name == "A"
+    assert shared_cache.stats()["hits"] == 1
+
+    await api.update_casefile_fields("case-1", {"name": "B"})
+    assert (await worker.load_casefile("case-1")).name == "B"  # read from storage after the patch
+    assert (await worker.load_casefile("case-1")).name == "B"
+    assert shared_cache.stats()["hits"] == 2
+    api.close()
+    worker.close()
+
+
+@pytest.mark.asyncio
+async def test_archive_cold_casefiles_leaves_stub_and_rehydrates_on_load(db_manager, tmp_path):
+    db_manager.cold_store.directory = str(tmp_path / "archive")
+    db_manager.casefile_compressor.min_bytes = 1
+    db_manager.casefile_compressor.chunk_bytes = 64  # force chunks
+    old = Casefile(id="case-1", name="Old", modified_at="2020-01-01T00:00:00+00:00", embedding=[0.1, 0.2])
+    old.file_references = [
+        DriveFileReference(id=f"file-{i}", name=f"File {i}", mime_type="text/plain", web_view_link="", icon_link="", path=f"/docs/{i}")
+        for i in range(5)
+    ]
+    await db_manager.save_casefile(old)
+    await db_manager.save_casefile(Casefile(id="case-2", name="New"))
+
+    assert await db_manager.archive_cold_casefiles(older_than_days=30) == 1
+    assert await db_manager.archive_cold_casefiles(older_than_days=30) == 0
+
+    stub = db_manager.backend.get("casefiles", "case-1")
+    assert "file_references" not in stub and "embedding" not in stub
+    assert stub["name"] == "Old" and stub["archived_at"]
+    assert db_manager.backend.query("casefiles/case-1/chunks") == []
+    listed = {casefile.id: casefile for casefile in await db_manager.load_all_casefiles()}
+    assert listed["case-1"].file_references == [] and listed["case-1"].archived_at is not None
+    with pytest.raises(ValueError):
+        await db_manager.save_casefile(listed["case-1"])
+
+    db_manager.casefile_cache.clear()
+    loaded = await db_manager.load_casefile("case-1")
+    assert loaded.archived_at is None
+    assert [reference.id for reference in loaded.file_references] == [f"file-{i}" for i in range(5)]
+    assert loaded.embedding == [0.1, 0.2]
+    assert "archived_at" not in db_manager.backend.get("casefiles", "case-1")
+    assert db_manager.archive_stats()["rehydrated"] == 1
+    assert list((tmp_path / "archive").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_metrics_text_reports_operations_and_storage_calls(db_manager):
+    db_manager.backend.size_sample_rate = 1.0
+    await db_manager.save_casefile(Casefile(id="case-1", name="A"))
+    await db_manager.load_casefile("case-1", fields=["name"])
+
+    text = db_manager.metrics_text()
+
+    assert 'mds_db_operation_seconds_count{collection="casefiles",operation="load_casefile"} 1' in text
+    assert 'mds_storage_documents_total{collection="casefiles",operation="set"} 1' in text
+    assert 'mds_storage_field_bytes_count{collection="casefiles",field="name",operation="set"} 1' in text
+    assert "mds_db_executor_completed " in text
+
+
+@pytest.mark.asyncio
+async def test_database_executor_bounds_concurrency_and_reports_stats():
+    executor = DatabaseExecutor(max_workers=2)
+    release = threading.Event()
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def _blocking_call(i):
+        with lock:
+            running.append(i)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(i)
+        return i
+
+    calls = [asyncio.ensure_future(executor.run(_blocking_call, i)) for i in range(5)]
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if executor.stats()["active"] == 2:
+            break
+
+    saturated = executor.stats()
+    assert saturated["active"] == 2 and saturated["queued"] == 3 and saturated["in_flight"] == 5
+
+    release.set()
+    assert await asyncio.gather(*calls) == [0, 1, 2, 3, 4]
+    assert max(peak) == 2
+    assert executor.stats() == {
+        "max_workers": 2, "active": 0, "queued": 0, "in_flight": 0, "peak_in_flight": 5, "completed": 5,
+    }
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_iter_casefiles_pages_with_a_cursor(db_manager):
+    assert [casefile async for casefile in db_manager.iter_casefiles(page_size=3)] == []
+
+    for i in range(8):
+        await db_manager.save_casefile(Casefile(id=f"case-{i}", name=f"Case {i}"))
+    pages = []
+    load_casefile_page = db_manager.load_casefile_page
+
+    async def _recording_page(**kwargs):
+        page = await load_casefile_page(**kwargs)
+        pages.append((kwargs["start_after"], [casefile.id for casefile in page]))
+        return page
+
+    db_manager.load_casefile_page = _recording_page
+    listed = [summary.id async for summary in db_manager.iter_casefiles(page_size=3, fields=["name"])]
+
+    assert listed == [f"case-{i}" for i in range(8)]
+    assert pages == [
+        (None, ["case-0", "case-1", "case-2"]),
+        ("case-2", ["case-3", "case-4", "case-5"]),
+        ("case-5", ["case-6", "case-7"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_events_pages_through_equal_timestamps(db_manager):
+    await db_manager.save_casefile(Casefile(id="case-1", name="A"))
+    for i in range(5):
+        event = Event(id=f"evt-{i}", source="USER", content=str(i), timestamp="2025-01-01T00:00:00+00:00")
+        await db_manager.append_casefile_event("case-1", event)
+
+    pages = [await db_manager.get_events("case-1", limit=2)]
+    while pages[-1]:
+        last = pages[-1][-1]
+        pages.append(await db_manager.get_events("case-1", after=last.timestamp, after_id=last.id, limit=2))
+
+    assert [[event.id for event in page] for page in pages] == [["evt-0", "evt-1"], ["evt-2", "evt-3"], ["evt-4"], []]
+
+
+@pytest.mark.asyncio
+async def test_append_casefile_event_stores_the_event_before_the_tail(db_manager):
+    await db_manager.save_casefile(Casefile(id="case-1", name="A"))
+    event = Event(id="evt-1", source="USER", content="hello", timestamp="2025-01-01T00:00:00+00:00")
+    set_document = db_manager.backend.set
+
+    def _failing_set(collection, doc_id, data):
+        if collection.endswith("/events"):
+            raise ConnectionError("write failed")
+        return set_document(collection, doc_id, data)
+    db_manager.backend.set = _failing_set
+
+    with pytest.raises(ConnectionError):
+        await db_manager.append_casefile_event("case-1", event)
+    assert (await db_manager.load_casefile("case-1")).event_log == []
+
+    db_manager.backend.set = set_document
+    assert await db_manager.append_casefile_event("case-1", event)
+    assert await db_manager.append_casefile_event("case-1", event)  # a retry after the tail was written
+    assert [e.id for e in (await db_manager.load_casefile("case-1")).event_log] == ["evt-1"]
+    assert [e.id for e in await db_manager.get_events("case-1")] == ["evt-1"]
+
+    assert not await db_manager.append_casefile_event("missing", event)
+    assert await db_manager.get_events("missing") == []
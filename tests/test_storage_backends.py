@@ -0,0 +1,426 @@
+import asyncio
+import queue
+from unittest.mock import MagicMock
+
+import pytest
+
+from MDSAPP.core.storage.base import ArrayUnion, DELETE_FIELD, SERVER_TIMESTAMP, WriteConflict
+from MDSAPP.core.storage.cache import LRUCache
+from MDSAPP.core.storage.cold_store import CollectionColdStore, FileColdStore
+from MDSAPP.core.storage.compression import FieldCompressor, MissingChunksError
+from MDSAPP.core.storage.instrumented import InstrumentedBackend
+from MDSAPP.core.storage.metrics import InMemoryMetricsSink, PrometheusTextExporter
+from MDSAPP.core.storage.shared_cache import InMemoryRedis, SharedCache
+from MDSAPP.core.storage.sqlite_backend import SqliteBackend
+from MDSAPP.core.storage.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    """Fixture for an embedded SQLite backend in a temporary directory."""
+    backend = SqliteBackend(path=str(tmp_path / "mds_test.db"))
+    yield backend
+    backend.close()
+
+
+def test_sqlite_set_get_delete(sqlite_backend):
+    sqlite_backend.set("casefiles", "case-1", {"name": "Test Case", "acl": {"user-1": "admin"}})
+
+    assert sqlite_backend.get("casefiles", "case-1") == {"name": "Test Case", "acl": {"user-1": "admin"}}
+    assert sqlite_backend.get("casefiles", "missing") is None
+
+    assert sqlite_backend.delete("casefiles", "case-1") is True
+    assert sqlite_backend.delete("casefiles", "case-1") is False
+    assert sqlite_backend.get("casefiles", "case-1") is None
+
+
+def test_sqlite_stream_is_scoped_to_collection(sqlite_backend):
+    sqlite_backend.set("casefiles", "case-2", {"name": "B"})
+    sqlite_backend.set("casefiles", "case-1", {"name": "A"})
+    sqlite_backend.set("prompts", "prompt-1", {"name": "P"})
+
+    assert list(sqlite_backend.stream("casefiles")) == [("case-1", {"name": "A"}), ("case-2", {"name": "B"})]
+
+
+def test_sqlite_transaction_rolls_back_on_error(sqlite_backend):
+    sqlite_backend.set("casefiles", "parent", {"sub_casefile_ids": []})
+
+    def _failing(transaction):
+        parent = transaction.get("casefiles", "parent")
+        parent["sub_casefile_ids"].append("child")
+        transaction.set("casefiles", "child", {"name": "Child"})
+        transaction.set("casefiles", "parent", parent)
+        raise PermissionError("denied")
+
+    with pytest.raises(PermissionError):
+        sqlite_backend.run_transaction(_failing)
+
+    assert sqlite_backend.get("casefiles", "child") is None
+    assert sqlite_backend.get("casefiles", "parent") == {"sub_casefile_ids": []}
+
+
+@pytest.mark.asyncio
+async def test_write_behind_coalesces_saves_of_the_same_document():
+    writes = []
+
+    async def _write(doc_id, data):
+        writes.append((doc_id, data))
+
+    buffer = WriteBehindBuffer(_write, window_seconds=60)
+    buffer.attach()
+    buffer.put("case-1", {"event_log": ["a"]})
+    buffer.put("case-1", {"event_log": ["a", "b"]})
+    buffer.put("case-2", {"event_log": []})
+
+    assert buffer.get("case-1") == {"event_log": ["a", "b"]}
+    assert writes == []
+
+    await buffer.flush("case-1")
+    assert writes == [("case-1", {"event_log": ["a", "b"]})]
+
+    await buffer.flush()
+    assert writes[-1] == ("case-2", {"event_log": []})
+    assert buffer.stats() == {"buffered": 3, "written": 2, "coalesced": 1, "pending": 0}
+
+
+@pytest.mark.asyncio
+async def test_write_behind_discard_drops_pending_write():
+    writes = []
+
+    async def _write(doc_id, data):
+        writes.append(doc_id)
+
+    buffer = WriteBehindBuffer(_write, window_seconds=60)
+    buffer.attach()
+    buffer.put("case-1", {"name": "A"})
+    await buffer.discard("case-1")
+    await buffer.flush()
+
+    assert writes == []
+    assert not buffer.has_pending("case-1")
+
+
+def test_write_behind_does_not_buffer_on_short_lived_loops():
+    writes = []
+
+    async def _write(doc_id, data):
+        writes.append(doc_id)
+
+    buffer = WriteBehindBuffer(_write, window_seconds=0.01)
+
+    async def _api_loop():
+        buffer.attach()
+        assert buffer.put("case-1", {"name": "A"})
+        timer = buffer._timers["case-1"]
+        timer.cancel()  # as when a loop closes
+        await asyncio.gather(timer, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert "case-1" not in buffer._timers
+        assert buffer.put("case-1", {"name": "B"})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(_api_loop())
+    assert writes == ["case-1"]
+
+    async def _task_loop():
+        return buffer.put("case-2", {"name": "C"})
+
+    # Like a Celery task: the caller writes the document itself.
+    assert asyncio.run(_task_loop()) is False
+    assert not buffer.has_pending("case-2")
+
+
+def test_sqlite_update_patches_only_given_fields(sqlite_backend):
+    sqlite_backend.set("casefiles", "case-1", {
+        "name": "A",
+        "acl": {"owner": "admin", "old.user@example.com": "reader"},
+        "event_log": [{"id": "evt-1"}],
+    })
+
+    updated = sqlite_backend.update("casefiles", "case-1", {
+        ("acl", "new.user@example.com"): "writer",
+        ("acl", "old.user@example.com"): DELETE_FIELD,
+        "event_log": ArrayUnion([{"id": "evt-1"}, {"id": "evt-2"}]),
+        "modified_at": SERVER_TIMESTAMP,
+    })
+
+    data = sqlite_backend.get("casefiles", "case-1")
+    assert updated is True
+    assert data["name"] == "A"
+    assert data["acl"] == {"owner": "admin", "new.user@example.com": "writer"}
+    assert data["event_log"] == [{"id": "evt-1"}, {"id": "evt-2"}]
+    assert "modified_at" in data
+    assert sqlite_backend.update("casefiles", "missing", {"name": "B"}) is False
+
+
+def test_sqlite_query_filters_orders_and_paginates(sqlite_backend):
+    events = "casefiles/case-1/events"
+    for i in range(5):
+        sqlite_backend.set(events, f"evt-{i}", {"timestamp": f"2025-01-0{i + 1}T00:00:00+00:00", "source": "USER" if i % 2 else "SYSTEM"})
+    sqlite_backend.set("casefiles/case-2/events", "evt-x", {"timestamp": "2025-01-01T00:00:00+00:00", "source": "USER"})
+
+    first_page = sqlite_backend.query(events, order_by="timestamp", limit=2)
+    assert [doc_id for doc_id, _ in first_page] == ["evt-0", "evt-1"]
+
+    next_page = sqlite_backend.query(events, order_by="timestamp", start_after=first_page[-1][1]["timestamp"], limit=2)
+    assert [doc_id for doc_id, _ in next_page] == ["evt-2", "evt-3"]
+
+    latest = sqlite_backend.query(events, order_by="timestamp", descending=True, limit=1)
+    assert [doc_id for doc_id, _ in latest] == ["evt-4"]
+
+    # Equal timestamps at a page boundary: resume after the exact document.
+    sqlite_backend.set(events, "evt-2b", {"timestamp": "2025-01-03T00:00:00+00:00", "source": "USER"})
+    tie = sqlite_backend.query(events, order_by="timestamp", start_after=("2025-01-03T00:00:00+00:00", "evt-2"), limit=2)
+    assert [doc_id for doc_id, _ in tie] == ["evt-2b", "evt-3"]
+    sqlite_backend.delete(events, "evt-2b")
+
+    user_events = sqlite_backend.query(events, filters=[("source", "==", "USER")], select=["source"])
+    assert user_events == [("evt-1", {"source": "USER"}), ("evt-3", {"source": "USER"})]
+
+    assert sqlite_backend.delete_collection(events) == 5
+    assert sqlite_backend.query(events) == []
+
+
+def test_sqlite_query_array_contains_and_null(sqlite_backend):
+    sqlite_backend.set("casefiles", "root", {"parent_id": None, "tags": ["a", "b"]})
+    sqlite_backend.set("casefiles", "child", {"parent_id": "root", "tags": ["b"]})
+
+    assert [doc_id for doc_id, _ in sqlite_backend.query("casefiles", filters=[("parent_id", "==", None)])] == ["root"]
+    assert [doc_id for doc_id, _ in sqlite_backend.query("casefiles", filters=[("tags", "array_contains", "b")])] == ["child", "root"]
+    assert [doc_id for doc_id, _ in sqlite_backend.query("casefiles", filters=[("parent_id", "in", ["root", "x"])])] == ["child"]
+
+
+def test_sqlite_get_many_skips_missing_documents(sqlite_backend):
+    for i in range(3):
+        sqlite_backend.set("casefiles", f"case-{i}", {"name": f"Case {i}", "workflows": []})
+
+    docs = sqlite_backend.get_many("casefiles", ["case-2", "case-0", "missing", "case-0"], fields=["name"])
+
+    assert docs == {"case-2": {"name": "Case 2"}, "case-0": {"name": "Case 0"}}
+    assert sqlite_backend.get_many("casefiles", []) == {}
+
+
+def test_lru_cache_evicts_by_entries_and_bytes():
+    cache = LRUCache(max_entries=2, max_bytes=100, ttl_seconds=60)
+    cache.put("a", "A", version=1, size=10)
+    cache.put("b", "B", version=1, size=10)
+    assert cache.get("a") == "A"
+
+    cache.put("c", "C", version=1, size=10)
+    assert cache.get("b") is None  # least recently used
+    cache.put("d", "D", version=1, size=85)
+    assert cache.get("a") is None
+
+    assert cache.get("c") == "C"
+    assert cache.get("d") == "D"
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] == 95
+
+
+def test_lru_cache_revalidates_expired_entries_by_version(monkeypatch):
+    cache = LRUCache(max_entries=10, max_bytes=1000, ttl_seconds=30)
+    now = [1000.0]
+    monkeypatch.setattr("MDSAPP.core.storage.cache.time.monotonic", lambda: now[0])
+    cache.put("case-1", "v1", version="2025-01-01T00:00:00Z", size=10)
+
+    now[0] += 31
+    assert cache.needs_revalidation("case-1")
+    assert cache.revalidate("case-1", "2025-01-01T00:00:00Z") is True
+    assert cache.get("case-1") == "v1"
+
+    now[0] += 31
+    assert cache.revalidate("case-1", "2025-02-01T00:00:00Z") is False
+    assert cache.get("case-1") is None
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_lru_cache_skips_put_after_concurrent_invalidation():
+    cache = LRUCache(max_entries=10, max_bytes=1000, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate("case-1")  # a write landed while the read was in flight
+    cache.put("case-1", "stale", version=1, size=10, generation=generation)
+
+    assert cache.get("case-1") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_conditional_update_detects_concurrent_writes(sqlite_backend):
+    sqlite_backend.set("casefiles", "case-1", {"workflow_count": 0})
+    _, version = sqlite_backend.get_versioned("casefiles", "case-1")
+
+    # Another writer gets in between the read and the write.
+    sqlite_backend.update("casefiles", "case-1", {"workflow_count": 1})
+
+    with pytest.raises(WriteConflict):
+        sqlite_backend.update("casefiles", "case-1", {"workflow_count": 1}, if_version=version)
+
+    data, current_version = sqlite_backend.get_versioned("casefiles", "case-1")
+    assert sqlite_backend.update("casefiles", "case-1", {"workflow_count": 2}, if_version=current_version) is True
+    assert sqlite_backend.get("casefiles", "case-1") == {"workflow_count": 2}
+    assert sqlite_backend.get_versioned("missing", "case-1") is None
+
+
+def test_field_compressor_compresses_and_chunks_large_fields():
+    compressor = FieldCompressor(["execution_results", "event_log"], min_bytes=1024, chunk_bytes=512)
+    results = [{"step": i, "output": {"text": f"result {i} " * 20}} for i in range(200)]
+    document = {"name": "Case", "execution_results": results, "event_log": [{"id": "evt-1"}]}
+
+    stored, chunks = compressor.encode(document, token="t1")
+
+    assert stored["name"] == "Case"
+    assert stored["event_log"] == [{"id": "evt-1"}]  # below min_bytes
+    assert stored["execution_results"]["chunks"] == len(chunks) > 1
+    assert compressor.chunk_ids(stored) == sorted(chunks)
+    assert compressor.decode(stored, chunks) == document
+    assert compressor.stats()["compression_ratio"] > 1
+
+    missing_one = dict(chunks)
+    missing_one.popitem()
+    with pytest.raises(MissingChunksError):
+        compressor.decode(stored, missing_one)
+
+
+def test_field_compressor_leaves_plain_documents_untouched():
+    compressor = FieldCompressor(["workflows"], min_bytes=0)
+    document = {"name": "Case", "workflows": [{"id": "wf-1"}] * 1000}
+
+    stored, chunks = compressor.encode(document, token="t1")
+
+    assert stored == document and chunks == {}
+    assert compressor.decode(stored) is stored
+
+
+def test_sqlite_set_many_writes_in_batches(sqlite_backend):
+    sqlite_backend.set("document_chunks", "chunk-0", {"chunk_text": "old"})
+    documents = [(f"chunk-{i}", {"chunk_index": i, "chunk_text": f"text {i}"}) for i in range(7)]
+
+    assert sqlite_backend.set_many("document_chunks", documents, batch_size=3) == 7
+
+    assert len(list(sqlite_backend.stream("document_chunks"))) == 7
+    assert sqlite_backend.get("document_chunks", "chunk-0") == {"chunk_index": 0, "chunk_text": "text 0"}
+
+
+def test_sqlite_watch_reports_writes_from_other_connections(tmp_path):
+    path = str(tmp_path / "mds_test.db")
+    watcher = SqliteBackend(path=path, change_poll_seconds=0.01)
+    writer = SqliteBackend(path=path)  # e.g. another replica
+    changes = queue.Queue()
+    stop = watcher.watch(["casefiles", "prompts"], lambda collection, doc_id: changes.put((collection, doc_id)))
+
+    writer.set("casefiles", "case-1", {"name": "A"})
+    writer.set("casefiles/case-1/events", "evt-1", {"content": "not watched"})
+    writer.set("sessions", "conv-1", {"history": []})
+    writer.update("casefiles", "case-1", {"name": "B"})
+    writer.delete("prompts", "prompt-1")  # nothing to delete, so no change
+    writer.set("prompts", "prompt-1", {"name": "P"})
+    writer.delete("casefiles", "case-1")
+
+    received = [changes.get(timeout=5) for _ in range(4)]
+    stop()
+    assert received == [("casefiles", "case-1"), ("casefiles", "case-1"), ("prompts", "prompt-1"), ("casefiles", "case-1")]
+    assert changes.empty()
+    writer.close()
+    watcher.close()
+
+
+def test_firestore_change_feed_reads_markers_not_documents():
+    firestore_backend = pytest.importorskip("MDSAPP.core.storage.firestore_backend")
+    backend = firestore_backend.FirestoreBackend()
+    backend._db = client = MagicMock()
+    batch = client.batch.return_value
+    backend.log_changes(["casefiles"])
+
+    backend.update("casefiles", "case-1", {"name": "B"})
+    backend.update("document_chunks", "chunk-1", {"text": "not logged"})
+
+    # One marker, in the same commit as the write of the logged collection only.
+    markers = [call.args[1] for call in batch.set.call_args_list]
+    assert [marker["documents"] for marker in markers] == [[{"collection": "casefiles", "id": "case-1"}]]
+    assert batch.commit.call_count == 2
+
+    changes = []
+    backend.watch(["casefiles"], lambda collection, doc_id: changes.append((collection, doc_id)))
+    client.collection.assert_called_with(firestore_backend.CHANGE_LOG_COLLECTION)
+    on_snapshot = client.collection.return_value.where.return_value.on_snapshot.call_args.args[0]
+    added = MagicMock()
+    added.type.name = "ADDED"
+    added.document.to_dict.return_value = {"documents": [
+        {"collection": "casefiles", "id": "case-1"}, {"collection": "prompts", "id": "prompt-1"},
+    ]}
+    on_snapshot([], [added], None)
+    assert changes == [("casefiles", "case-1")]
+
+
+def test_shared_cache_ignores_fills_that_raced_with_a_write():
+    cache = SharedCache(InMemoryRedis(), ttl_seconds=60)
+    value, version = cache.lookup("casefiles", "case-1")
+    assert value is None
+
+    cache.invalidate("casefiles", "case-1")  # a write landed while the read was in flight
+    cache.fill("casefiles", "case-1", {"name": "stale"}, version)
+    assert cache.lookup("casefiles", "case-1")[0] is None
+
+    cache.store("casefiles", "case-1", {"name": "fresh", "tags": ["a"]})
+    assert cache.lookup("casefiles", "case-1")[0] == {"name": "fresh", "tags": ["a"]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 2)
+
+
+def test_shared_cache_falls_back_when_redis_is_unavailable():
+    class _DownRedis:
+        def __getattr__(self, name):
+            raise ConnectionError("redis is down")
+
+    cache = SharedCache(_DownRedis(), ttl_seconds=60)
+
+    assert cache.lookup("casefiles", "case-1") == (None, None)
+    cache.fill("casefiles", "case-1", {"name": "A"}, None)
+    assert cache.invalidate("casefiles", "case-1") is None
+    assert cache.stats()["errors"] == 2
+
+
+@pytest.mark.parametrize("store_type", ["collection", "files"])
+def test_cold_store_round_trip(sqlite_backend, tmp_path, store_type):
+    if store_type == "collection":
+        store = CollectionColdStore(sqlite_backend)
+        store._compressor.chunk_bytes = 64  # force chunking
+    else:
+        store = FileColdStore(str(tmp_path / "archive"))
+    data = {"workflows": [{"id": f"wf-{i}", "steps": ["x" * 20]} for i in range(20)], "embedding": [0.5, 1.0]}
+    key = "case-1@2026-01-01T00:00:00+00:00"
+
+    assert store.get(key) is None
+    store.put(key, data)
+    assert store.get(key) == data
+    store.put(key, {"workflows": []})
+    assert store.get(key) == {"workflows": []}
+    store.delete(key)
+    store.delete(key)
+    assert store.get(key) is None
+
+
+def test_instrumented_backend_records_latency_counts_and_sizes(sqlite_backend):
+    metrics = InMemoryMetricsSink()
+    backend = InstrumentedBackend(sqlite_backend, metrics)
+    backend.set("casefiles/case-1/events", "e1", {"type": "note", "payload": "x" * 100})
+    backend.get_versioned("casefiles/case-1/events", "e1")
+    backend.get_versioned("casefiles/case-1/events", "e1")
+    version = backend.get_versioned("casefiles/case-1/events", "e1")[1]
+    backend.update("casefiles/case-1/events", "e1", {"type": "edited"}, version)
+    with pytest.raises(WriteConflict):
+        backend.update("casefiles/case-1/events", "e1", {"type": "stale"}, version)
+
+    read = {"collection": "casefiles/events", "operation": "get"}
+    assert metrics.histogram("mds_storage_operation_seconds", read)[0] == 3
+    assert metrics.counter("mds_storage_documents_total", read) == 3
+    assert metrics.histogram("mds_storage_field_bytes", {"collection": "casefiles/events", "operation": "set", "field": "payload"}) == (1, 102)
+    assert metrics.counter("mds_storage_write_conflicts_total", {"collection": "casefiles/events"}) == 1
+
+    exporter = PrometheusTextExporter(metrics)
+    exporter.add_collector("db_executor", lambda: {"active": 2, "name": "ignored"})
+    text = exporter.render()
+    assert "# TYPE mds_storage_operation_seconds histogram" in text
+    assert 'mds_storage_operation_seconds_count{collection="casefiles/events",operation="get"} 3' in text
+    assert 'mds_storage_document_bytes_bucket{collection="casefiles/events",operation="set",le="+Inf"} 1' in text
+    assert "# TYPE mds_storage_write_conflicts_total counter" in text
+    assert "mds_db_executor_active 2" in text and "ignored" not in text